@@ -6,10 +6,14 @@ from .visualization import heatslices # Function.
 
 from .io import save, load # Functions.
 
+from .utilities import set_default_dtype, get_default_dtype # Functions.
+
 from . import preprocessing # Subpackage.
 from .preprocessing import preprocess # Function.
+from .preprocessing import PreprocessingPipeline # Class.
 
 from . import presets # Subpackage.
 from .presets import basic_preprocessing # Function.
+from .presets import batch_preprocess # Function.
 from .presets import get_registration_presets # Function.
 from .presets import get_registration_preset # Function.
\ No newline at end of file
@@ -2,6 +2,18 @@ import numpy as np
 import SimpleITK as sitk
 from pathlib import Path
 import pickle
+import struct
+import zipfile
+import zlib
+import json
+import itertools
+import glob
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from .utilities import _validate_scalar_to_multi
+from .utilities import _validate_ndarray
+from .preprocessing.resampling import downsample_image
 
 def _validate_inputs(**kwargs):
     """Accepts arbitrary kwargs. If recognized, they are validated.
@@ -43,8 +55,10 @@ def _validate_inputs(**kwargs):
     return kwargs
 
 
-def save(data, file_path):
-    """Save data to file_path. Accepts a np.ndarray or a dictionary mapping to np.ndarrays."""
+def save(data, file_path, compress=False):
+    """Save data to file_path. Accepts a np.ndarray or a dictionary mapping to np.ndarrays.
+    If data is a dictionary it is saved as a .npz file, compressed if compress is True. 
+    Only uncompressed .npz files can be memory-mapped by load."""
     # Validate inputs.
     inputs = {'data':data, 'file_path':file_path}
     validated_inputs = _validate_inputs(**inputs)
@@ -53,7 +67,9 @@ def save(data, file_path):
 
     # data is either a single np.ndarray or a list of np.ndarrays.
 
-    if isinstance(data, np.ndarray):
+    if isinstance(data, np.ndarray) and file_path.suffix == '.npy':
+        np.save(file_path, data)
+    elif isinstance(data, np.ndarray):
         # Convert data to sitk.Image.
         # Take the transpose of data to premptively correct for the f-ordering of SimpleITK Images.
         data = data.T
@@ -62,25 +78,58 @@ def save(data, file_path):
         sitk.WriteImage(data_Image, str(file_path))
     # If data is a dictionary it must map to np.ndarray objects.
     elif isinstance(data, dict):
-        np.savez(file_path.with_suffix(''), **data) # '.npz' is appended.
+        if compress:
+            np.savez_compressed(file_path.with_suffix(''), **data) # '.npz' is appended.
+        else:
+            np.savez(file_path.with_suffix(''), **data) # '.npz' is appended.
     else:
         # _validate_inputs has failed.
         raise Exception(f"_validate_inputs has failed to prevent an improper type for data.\n"
             f"type(data): {type(data)}.")
 
 
-def load(file_path):
-    """Load data from file_path. Expects a np.ndarray or a dictionary mapping to np.ndarrays."""
+def load(file_path, mmap_mode=None, order=None, shape=None, dtype=None):
+    """Load data from file_path. Expects a np.ndarray or a dictionary mapping to np.ndarrays.
+
+    If mmap_mode is provided for a .npy or .raw file, the array is memory-mapped with mmap_mode rather than read.
+    If mmap_mode is provided for a .npz file, a dictionary is returned in which each array 
+    stored without compression is memory-mapped with mmap_mode rather than read.
+
+    A .raw file holds the bare contents of an array, so its shape and dtype must be provided. 
+    Its memory layout is taken to be order, or 'C' if order is None. 
+    For other formats holding a single array, if dtype is provided the array is cast to it, copying only if necessary, 
+    so that for example 16-bit data can be read directly as float32 without passing through float64.
+
+    If order is 'C' or 'F', a np.ndarray is returned with that memory layout, copying only if necessary. 
+    Otherwise it is returned in whatever layout it is read in, which for SimpleITK formats is 
+    a transposed, 'F'-contiguous view of SimpleITK's 'C'-ordered zyx array."""
 
     # Validate inputs.
     inputs = {'file_path':file_path}
     validated_inputs = _validate_inputs(**inputs)
     file_path = validated_inputs['file_path']
 
+    if order not in [None, 'C', 'F']:
+        raise ValueError(f"order must be one of None, 'C', or 'F'.\n"
+            f"order: {order}.")
+
     if file_path.suffix == '.npz':
+        if mmap_mode is not None:
+            return _memmap_npz(file_path, mmap_mode)
         data = np.load(file_path)
         # data is a dictionary.
         return data
+    elif file_path.suffix == '.npy':
+        data = np.load(file_path, mmap_mode=mmap_mode)
+    elif file_path.suffix == '.raw':
+        if shape is None or dtype is None:
+            raise ValueError(f"shape and dtype must be provided to load a .raw file.\n"
+                f"shape: {shape}, dtype: {dtype}.")
+        raw_order = 'C' if order is None else order
+        if mmap_mode is not None:
+            data = np.memmap(file_path, dtype=dtype, mode=mmap_mode, shape=tuple(shape), order=raw_order)
+        else:
+            data = np.fromfile(file_path, dtype=dtype).reshape(shape, order=raw_order)
     else:
         # Read in data as sitk.Image.
         data_Image = sitk.ReadImage(str(file_path))
@@ -88,8 +137,44 @@ def load(file_path):
         data = sitk.GetArrayFromImage(data_Image)
         # Take the transpose of data to correct for the f-ordering of SimpleITK Images.
         data = data.T
-        # data is a np.ndarray.
-        return data
+
+    # Impose the requested dtype and memory layout. This is a no-op if data already complies.
+    if dtype is not None and file_path.suffix != '.raw':
+        data = np.asanyarray(data, dtype=dtype)
+    if order is not None:
+        data = np.asarray(data, order=order)
+    # data is a np.ndarray.
+    return data
+
+
+def _memmap_npz(file_path, mmap_mode='r'):
+    """Returns a dictionary mapping the name of each array in the .npz file at file_path 
+    to a np.memmap if it was stored without compression, or to a np.ndarray otherwise."""
+
+    data = {}
+    with zipfile.ZipFile(file_path) as archive, open(file_path, 'rb') as file:
+        for info in archive.infolist():
+            key = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if info.compress_type == zipfile.ZIP_STORED:
+                # Locate the .npy data past the fixed 30-byte local file header and its variable-length fields.
+                file.seek(info.header_offset)
+                local_header = file.read(30)
+                name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+                file.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(file)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+                # Empty, 0-dimensional, and object arrays cannot be memory-mapped and are read below.
+                if not dtype.hasobject and len(shape) > 0 and np.prod(shape) > 0:
+                    data[key] = np.memmap(file_path, dtype=dtype, mode=mmap_mode, offset=file.tell(), 
+                        shape=shape, order='F' if fortran_order else 'C')
+                    continue
+            with archive.open(info) as member:
+                data[key] = np.lib.format.read_array(member)
+
+    return data
 
 
 def save_pickled(obj, file_path):
@@ -110,4 +195,462 @@ def load_pickled(file_path):
 
     # TODO: verify behavior of suffixes.
     with open(file_path, 'rb') as file:
-        return pickle.load(file)
\ No newline at end of file
+        return pickle.load(file)
+
+"""
+Chunked and multiscale images.
+"""
+
+# The version of the on-disk format of ChunkedImage and MultiscaleImage directories.
+_chunked_format_version = 1
+
+class ChunkedImage():
+    """A chunked, optionally compressed image stored in a directory, in the manner of zarr or N5. 
+    Each chunk is a separate file, so that indexing a ChunkedImage reads only the chunks overlapping the region requested. 
+    Chunks that have never been written read as 0.
+
+    The directory contains a 'chunked.json' file of metadata and one file per chunk, 
+    named by its per-axis chunk indices joined by '.', holding the bytes of the chunk in 'C' order, 
+    compressed with zlib if compression is 'zlib'."""
+
+    def __init__(self, dir_path):
+        """Open the ChunkedImage stored at dir_path, as created with the create classmethod."""
+
+        self.dir_path = Path(dir_path).expanduser().resolve()
+
+        with open(self.dir_path / 'chunked.json', 'r') as file:
+            metadata = json.load(file)
+        if metadata['format_version'] > _chunked_format_version:
+            raise ValueError(f"dir_path was saved in a newer format than is supported.\n"
+                f"format_version: {metadata['format_version']}, supported format_version: {_chunked_format_version}.")
+
+        self.shape = tuple(metadata['shape'])
+        self.dtype = np.dtype(metadata['dtype'])
+        self.chunks = tuple(metadata['chunks'])
+        self.xyz_resolution = np.array(metadata['xyz_resolution'], float)
+        self.compression = metadata['compression']
+
+    @classmethod
+    def create(cls, dir_path, shape, dtype, chunks=64, xyz_resolution=1, compression='zlib'):
+        """
+        Create an empty ChunkedImage at dir_path.
+        
+        Arguments:
+            dir_path {str, Path} -- The directory to store the image in. It is created if it does not exist.
+            shape {sequence} -- The shape of the image.
+            dtype {type, str} -- The dtype of the image.
+        
+        Keyword Arguments:
+            chunks {int, sequence} -- The per-axis shape of each chunk. (default: {64})
+            xyz_resolution {float, sequence} -- The per-axis resolution of the image. (default: {1})
+            compression {str, NoneType} -- Either 'zlib' or None. (default: {'zlib'})
+        
+        Raises:
+            ValueError: Raised if compression is not recognized.
+        
+        Returns:
+            ChunkedImage -- The newly created image.
+        """
+
+        shape = _validate_ndarray(shape, dtype=int, required_ndim=1)
+        chunks = _validate_scalar_to_multi(chunks, size=len(shape), dtype=int)
+        if np.any(chunks < 1):
+            raise ValueError(f"All elements of chunks must be at least 1.\n"
+                f"chunks: {chunks}.")
+        xyz_resolution = _validate_scalar_to_multi(xyz_resolution, size=len(shape), dtype=float)
+        if compression not in [None, 'zlib']:
+            raise ValueError(f"compression must be either 'zlib' or None.\n"
+                f"compression: {compression}.")
+
+        dir_path = Path(dir_path).expanduser().resolve()
+        dir_path.mkdir(parents=True, exist_ok=True)
+        metadata = dict(
+            format_version=_chunked_format_version, 
+            shape=shape.tolist(), 
+            dtype=np.dtype(dtype).str, 
+            chunks=chunks.tolist(), 
+            xyz_resolution=xyz_resolution.tolist(), 
+            compression=compression, 
+        )
+        with open(dir_path / 'chunked.json', 'w') as file:
+            json.dump(metadata, file)
+
+        return cls(dir_path)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        return self[...] if dtype is None else self[...].astype(dtype)
+
+    def _normalize_key(self, key):
+        """Returns a tuple of (start, stop, step) for each axis and the axes indexed by integers, 
+        which are removed from the result."""
+
+        if not isinstance(key, tuple):
+            key = (key,)
+        # Expand an Ellipsis to the full slices it stands for.
+        if any(element is Ellipsis for element in key):
+            ellipsis_index = [element is Ellipsis for element in key].index(True)
+            n_missing = self.ndim - (len(key) - 1)
+            key = key[:ellipsis_index] + (slice(None),) * n_missing + key[ellipsis_index + 1:]
+        if len(key) > self.ndim:
+            raise IndexError(f"Too many indices for a ChunkedImage with {self.ndim} dimensions.\n"
+                f"len(key): {len(key)}.")
+        key = key + (slice(None),) * (self.ndim - len(key))
+
+        ranges = []
+        integer_axes = []
+        for axis, (element, axis_length) in enumerate(zip(key, self.shape)):
+            if isinstance(element, slice):
+                start, stop, step = element.indices(axis_length)
+                if step < 1:
+                    raise ValueError(f"Only positive slice steps are supported.\n"
+                        f"step: {step}.")
+                ranges.append((start, max(start, stop), step))
+            else:
+                index = int(element)
+                if index < -axis_length or index >= axis_length:
+                    raise IndexError(f"Index {index} is out of bounds for axis {axis} with size {axis_length}.")
+                index %= axis_length
+                ranges.append((index, index + 1, 1))
+                integer_axes.append(axis)
+        return ranges, integer_axes
+
+    def _chunk_path(self, chunk_index):
+        return self.dir_path / '.'.join(map(str, chunk_index))
+
+    def _chunk_shape(self, chunk_index):
+        return tuple(min(chunk, axis_length - index * chunk) 
+            for index, chunk, axis_length in zip(chunk_index, self.chunks, self.shape))
+
+    def _read_chunk(self, chunk_index):
+        """Returns the chunk at chunk_index, or zeros if it has not been written."""
+
+        chunk_path = self._chunk_path(chunk_index)
+        chunk_shape = self._chunk_shape(chunk_index)
+        if not chunk_path.is_file():
+            return np.zeros(chunk_shape, self.dtype)
+        with open(chunk_path, 'rb') as file:
+            buffer = file.read()
+        if self.compression == 'zlib':
+            buffer = zlib.decompress(buffer)
+        return np.frombuffer(buffer, dtype=self.dtype).reshape(chunk_shape)
+
+    def _write_chunk(self, chunk_index, chunk):
+        """Write chunk to the file for chunk_index."""
+
+        buffer = np.ascontiguousarray(chunk, dtype=self.dtype).tobytes()
+        if self.compression == 'zlib':
+            buffer = zlib.compress(buffer)
+        with open(self._chunk_path(chunk_index), 'wb') as file:
+            file.write(buffer)
+
+    def _overlapping_chunks(self, bounds):
+        """Yields the index of each chunk overlapping the region [start, stop) along each axis of bounds."""
+
+        chunk_ranges = [range(start // chunk, -(-stop // chunk)) for (start, stop), chunk in zip(bounds, self.chunks)]
+        return itertools.product(*chunk_ranges)
+
+    def __getitem__(self, key):
+        """Read the region indexed by key, which may contain integers, slices with positive steps, and an Ellipsis. 
+        Only the chunks overlapping that region are read."""
+
+        ranges, integer_axes = self._normalize_key(key)
+        bounds = [(start, stop) for start, stop, _ in ranges]
+        region = np.zeros([stop - start for start, stop in bounds], self.dtype)
+
+        if region.size > 0:
+            for chunk_index in self._overlapping_chunks(bounds):
+                chunk_start = [index * chunk for index, chunk in zip(chunk_index, self.chunks)]
+                chunk = self._read_chunk(chunk_index)
+                # The intersection of this chunk with the region, relative to the chunk and to the region.
+                in_chunk = []
+                in_region = []
+                for (start, stop), offset, chunk_length in zip(bounds, chunk_start, chunk.shape):
+                    low = max(start, offset)
+                    high = min(stop, offset + chunk_length)
+                    in_chunk.append(slice(low - offset, high - offset))
+                    in_region.append(slice(low - start, high - start))
+                region[tuple(in_region)] = chunk[tuple(in_chunk)]
+
+        # Apply steps and remove integer-indexed axes.
+        region = region[tuple(slice(None, None, step) for _, _, step in ranges)]
+        return region.reshape([length for axis, length in enumerate(region.shape) if axis not in integer_axes])
+
+    def __setitem__(self, key, value):
+        """Write value into the region indexed by key, which may contain integers, slices with unit steps, and an Ellipsis. 
+        Chunks only partially covered by the region are read, updated, and rewritten."""
+
+        ranges, integer_axes = self._normalize_key(key)
+        if any(step != 1 for _, _, step in ranges):
+            raise ValueError(f"Only unit slice steps are supported for writing.")
+        bounds = [(start, stop) for start, stop, _ in ranges]
+        region_shape = [stop - start for start, stop in bounds]
+        value = np.broadcast_to(np.asarray(value, dtype=self.dtype), 
+            [length for axis, length in enumerate(region_shape) if axis not in integer_axes]).reshape(region_shape)
+
+        if value.size == 0:
+            return
+        for chunk_index in self._overlapping_chunks(bounds):
+            chunk_start = [index * chunk for index, chunk in zip(chunk_index, self.chunks)]
+            chunk_shape = self._chunk_shape(chunk_index)
+            in_chunk = []
+            in_region = []
+            for (start, stop), offset, chunk_length in zip(bounds, chunk_start, chunk_shape):
+                low = max(start, offset)
+                high = min(stop, offset + chunk_length)
+                in_chunk.append(slice(low - offset, high - offset))
+                in_region.append(slice(low - start, high - start))
+            if all(this_slice.stop - this_slice.start == chunk_length for this_slice, chunk_length in zip(in_chunk, chunk_shape)):
+                # The chunk is entirely overwritten.
+                chunk = value[tuple(in_region)]
+            else:
+                chunk = np.array(self._read_chunk(chunk_index))
+                chunk[tuple(in_chunk)] = value[tuple(in_region)]
+            self._write_chunk(chunk_index, chunk)
+
+
+class MultiscaleImage():
+    """A sequence of ChunkedImage objects at successively lower resolutions, stored as numbered subdirectories 
+    of a directory alongside a 'multiscale.json' file of metadata. 
+    Level 0 is the full-resolution image. Indexing a MultiscaleImage by level returns the ChunkedImage for that level, 
+    which can in turn be read lazily by region."""
+
+    def __init__(self, dir_path):
+        """Open the MultiscaleImage stored at dir_path, as created with save_multiscale."""
+
+        self.dir_path = Path(dir_path).expanduser().resolve()
+
+        with open(self.dir_path / 'multiscale.json', 'r') as file:
+            metadata = json.load(file)
+        if metadata['format_version'] > _chunked_format_version:
+            raise ValueError(f"dir_path was saved in a newer format than is supported.\n"
+                f"format_version: {metadata['format_version']}, supported format_version: {_chunked_format_version}.")
+
+        self.levels = [ChunkedImage(self.dir_path / level) for level in metadata['levels']]
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, level):
+        return self.levels[level]
+
+    @property
+    def xyz_resolutions(self):
+        """The per-axis resolution of each level."""
+        return [level.xyz_resolution for level in self.levels]
+
+    def level_nearest(self, xyz_resolution):
+        """Returns the index of the lowest-resolution level whose resolution is no coarser than xyz_resolution along any axis, 
+        or 0 if there is none."""
+
+        xyz_resolution = _validate_scalar_to_multi(xyz_resolution, size=self.levels[0].ndim, dtype=float)
+        suitable_levels = [index for index, level in enumerate(self.levels) if np.all(level.xyz_resolution <= xyz_resolution)]
+        return max(suitable_levels) if suitable_levels else 0
+
+
+def save_multiscale(image, dir_path, xyz_resolution=1, scale_factors=2, n_levels=4, chunks=64, compression='zlib'):
+    """
+    Save image as a MultiscaleImage at dir_path, with each level after the first produced 
+    by applying downsample_image with scale_factors to the previous level.
+    
+    Arguments:
+        image {np.ndarray} -- The full-resolution image.
+        dir_path {str, Path} -- The directory to save to. It is created if it does not exist.
+    
+    Keyword Arguments:
+        xyz_resolution {float, sequence} -- The per-axis resolution of image. (default: {1})
+        scale_factors {int, sequence} -- The per-axis factors by which each level is downsampled from the previous level. (default: {2})
+        n_levels {int} -- The number of levels, including the full-resolution image. 
+            Fewer levels are created if a level becomes smaller than scale_factors along an axis being downsampled. (default: {4})
+        chunks {int, sequence} -- The per-axis shape of each chunk. (default: {64})
+        compression {str, NoneType} -- Either 'zlib' or None. (default: {'zlib'})
+    
+    Returns:
+        MultiscaleImage -- The saved image.
+    """
+
+    # Validate inputs.
+    image = _validate_inputs(data=image)['data']
+    xyz_resolution = _validate_scalar_to_multi(xyz_resolution, size=image.ndim, dtype=float)
+    scale_factors = _validate_scalar_to_multi(scale_factors, size=image.ndim, dtype=int)
+    if n_levels < 1:
+        raise ValueError(f"n_levels must be at least 1.\n"
+            f"n_levels: {n_levels}.")
+
+    dir_path = Path(dir_path).expanduser().resolve()
+    dir_path.mkdir(parents=True, exist_ok=True)
+
+    levels = []
+    level_image = image
+    level_resolution = xyz_resolution
+    for level in range(n_levels):
+        if level > 0:
+            # Stop once the previous level is smaller than scale_factors along an axis being downsampled.
+            if np.all(scale_factors == 1) or np.any((scale_factors > 1) & (np.array(level_image.shape) < scale_factors)):
+                break
+            level_image = downsample_image(level_image, scale_factors)
+            level_resolution = level_resolution * scale_factors
+        chunked_image = ChunkedImage.create(dir_path / str(level), shape=level_image.shape, dtype=level_image.dtype, 
+            chunks=chunks, xyz_resolution=level_resolution, compression=compression)
+        chunked_image[...] = level_image
+        levels.append(str(level))
+
+    with open(dir_path / 'multiscale.json', 'w') as file:
+        json.dump(dict(format_version=_chunked_format_version, levels=levels), file)
+
+    return MultiscaleImage(dir_path)
+
+
+def load_multiscale(dir_path, level=None, xyz_resolution=None):
+    """
+    Open the MultiscaleImage at dir_path. If level or xyz_resolution is provided, 
+    read and return a single level as a np.ndarray instead, along with its resolution.
+    
+    Arguments:
+        dir_path {str, Path} -- The directory a MultiscaleImage was saved to.
+    
+    Keyword Arguments:
+        level {int, NoneType} -- The index of the level to read. (default: {None})
+        xyz_resolution {float, sequence, NoneType} -- If provided and level is None, the level read is 
+            the lowest-resolution level no coarser than xyz_resolution. (default: {None})
+    
+    Returns:
+        MultiscaleImage, tuple -- The MultiscaleImage, or a tuple of the np.ndarray of the chosen level and its resolution.
+    """
+
+    multiscale_image = MultiscaleImage(dir_path)
+
+    if level is None and xyz_resolution is None:
+        return multiscale_image
+    if level is None:
+        level = multiscale_image.level_nearest(xyz_resolution)
+
+    chunked_image = multiscale_image[level]
+    return chunked_image[...], chunked_image.xyz_resolution
+
+
+"""
+Stacks of 2D images.
+"""
+
+def _natural_sort_key(file_path):
+    """Returns a key sorting file names by their embedded integers numerically, e.g. plane_2 before plane_10."""
+    return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', Path(file_path).name)]
+
+
+def _list_stack_file_paths(file_paths):
+    """Returns the naturally sorted list of file paths indicated by file_paths, 
+    which may be a directory of .tif or .tiff files, a glob pattern, or a sequence of paths."""
+
+    if isinstance(file_paths, (str, Path)):
+        file_paths = Path(file_paths).expanduser()
+        if file_paths.is_dir():
+            file_paths = [file_path for file_path in file_paths.iterdir() if file_path.suffix.lower() in ['.tif', '.tiff']]
+        else:
+            file_paths = [Path(file_path) for file_path in glob.glob(str(file_paths))]
+        file_paths = sorted(file_paths, key=_natural_sort_key)
+    else:
+        file_paths = [Path(file_path).expanduser() for file_path in file_paths]
+
+    if not file_paths:
+        raise FileNotFoundError(f"No files were found for file_paths.")
+
+    return file_paths
+
+
+def _read_plane(file_path):
+    """Read the 2D image at file_path as a np.ndarray, transposed to match load."""
+    return sitk.GetArrayFromImage(sitk.ReadImage(str(file_path))).T
+
+
+def load_stack(file_paths, scale_factors=1, dtype=None, mmap_path=None, n_workers=None):
+    """
+    Load a stack of 2D images, such as a directory of TIFF planes, as a 3D np.ndarray with the planes along the last axis. 
+    Planes are read in parallel by a pool of threads and written into a preallocated array, 
+    optionally a memory-mapped .npy file, downsampling them on the fly so that the full-resolution stack is never held in memory.
+    The result matches downsample_image applied to the full-resolution stack.
+    
+    Arguments:
+        file_paths {str, Path, sequence} -- A directory of .tif or .tiff files, a glob pattern, or a sequence of file paths. 
+            Directories and glob patterns are sorted by name, with embedded integers compared numerically.
+    
+    Keyword Arguments:
+        scale_factors {int, sequence} -- The per-axis factors by which to downsample the stack, including along the stacking axis. (default: {1})
+        dtype {type, NoneType} -- The dtype of the result. If None, the dtype of the planes is used 
+            if there is no downsampling, and float otherwise. (default: {None})
+        mmap_path {str, Path, NoneType} -- If provided, the result is written to a memory-mapped .npy file at this path. (default: {None})
+        n_workers {int, NoneType} -- The number of threads reading planes. If None, the ThreadPoolExecutor default is used. (default: {None})
+    
+    Raises:
+        ValueError: Raised if any of scale_factors is less than 1.
+    
+    Returns:
+        np.ndarray -- The loaded stack, a np.memmap if mmap_path was provided.
+    """
+
+    file_paths = _list_stack_file_paths(file_paths)
+
+    scale_factors = _validate_scalar_to_multi(scale_factors, size=3, dtype=int)
+    if np.any(scale_factors < 1):
+        raise ValueError(f"Every element of scale_factors must be at least 1.\n"
+            f"np.min(scale_factors): {np.min(scale_factors)}.")
+    downsample = np.any(scale_factors > 1)
+
+    # Read the first plane to determine the shape and dtype of the result.
+    first_plane = _read_plane(file_paths[0])
+    if first_plane.ndim != 2:
+        raise ValueError(f"Each file must contain a 2D image.\n"
+            f"first_plane.ndim: {first_plane.ndim}.")
+    if downsample:
+        plane_shape = downsample_image(first_plane, scale_factors[:2]).shape
+    else:
+        plane_shape = first_plane.shape
+    if dtype is None:
+        dtype = float if downsample else first_plane.dtype
+
+    # Group the planes as downsample_image does along the stacking axis: 
+    # it pads the stack evenly up to a multiple of scale_factors[2] with the mean of the nearest planes, 
+    # so each group's average is the average of the real planes it contains.
+    n_planes = len(file_paths)
+    padding_before = (-n_planes % scale_factors[2]) // 2
+    n_groups = -(-n_planes // scale_factors[2])
+    groups = [range(max(0, group * scale_factors[2] - padding_before), min(n_planes, (group + 1) * scale_factors[2] - padding_before)) 
+        for group in range(n_groups)]
+
+    # Preallocate the result.
+    shape = (*plane_shape, n_groups)
+    if mmap_path is not None:
+        stack = np.lib.format.open_memmap(Path(mmap_path).expanduser().with_suffix('.npy'), mode='w+', dtype=dtype, shape=shape)
+    else:
+        stack = np.empty(shape, dtype=dtype)
+
+    def _load_group(group_index):
+        """Read, downsample, and average the planes in groups[group_index] into stack."""
+
+        group_sum = None
+        for plane_index in groups[group_index]:
+            plane = _read_plane(file_paths[plane_index])
+            if plane.shape != first_plane.shape:
+                raise ValueError(f"All planes must have the same shape.\n"
+                    f"{file_paths[plane_index]}.shape: {plane.shape}, {file_paths[0]}.shape: {first_plane.shape}.")
+            if downsample:
+                plane = downsample_image(plane, scale_factors[:2])
+            group_sum = plane if group_sum is None else group_sum + plane
+        if len(groups[group_index]) > 1:
+            group_sum = group_sum / len(groups[group_index])
+        stack[..., group_index] = group_sum
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        # Consume the results to propagate any exceptions.
+        list(executor.map(_load_group, range(n_groups)))
+
+    if mmap_path is not None:
+        stack.flush()
+
+    return stack
@@ -4,7 +4,48 @@
 
 import numpy as np
 import torch
+import warnings
 from matplotlib import pyplot as plt
+from ..utilities import _LRUCache
+
+# Coordinates, meshgrids, and smoothing kernels shared by all Transformer objects with the same geometry.
+# They are never modified in place.
+_geometry_cache = _LRUCache(max_bytes=2**30)
+
+# The number of voxels of J over which the EM weights are evaluated at once, bounding the temporaries of Transformer.weights.
+_weights_slab_size = 2**18
+
+
+def torch_as_tensor(array, dtype, device):
+    '''Convert array to a tensor with the given dtype and device.
+    When array is already compatible with them, as for a float64 np.ndarray on the cpu,
+    the tensor shares its memory rather than copying it.
+    The result must not be modified in place unless a copy is intended.'''
+    if isinstance(array, np.ndarray):
+        # torch cannot share memory with non-native byte orders or negative strides.
+        if not array.dtype.isnative:
+            array = array.astype(array.dtype.newbyteorder('='))
+        if any(stride < 0 for stride in array.strides):
+            array = np.ascontiguousarray(array)
+        with warnings.catch_warnings():
+            # Read-only arrays such as memory-mapped files are shared as well, and are never written to.
+            warnings.simplefilter('ignore', UserWarning)
+            return torch.as_tensor(array, dtype=dtype, device=device)
+    return torch.as_tensor(array, dtype=dtype, device=device)
+
+
+def _get_grid(shape, resolution, dtype, device):
+    '''Returns the centered per-axis coordinates of a grid and their meshgrid, from _geometry_cache if possible.'''
+    key = ('grid', tuple(shape), tuple(float(dxyz_i) for dxyz_i in resolution), dtype, str(device))
+    grid = _geometry_cache.get(key)
+    if grid is None:
+        x = torch_compute_axes(shape, resolution, dtype=dtype, device=device)
+        grid = (x, torch.stack(torch.meshgrid(x)))
+        _geometry_cache.put(key, grid)
+    x, X = grid
+    # copy the list so that the cached one cannot be altered
+    return list(x), X
+
 
 class Transformer:
     def __init__(self,I,J, Ires, Jres,
@@ -13,11 +54,12 @@ class Transformer:
                  order=2,
                  sigmaA=None,
                  transformer=None, 
-                 A=None, v=None):
+                 A=None, v=None,
+                 CA=None):
         '''
         Specify polynomial intensity mapping order with order parameters
         2 corresponds to linear, nothing less than 2 is supported
-        input sigmaA for weights
+        input sigmaA for weights, and optionally CA, as described in set_artifact_classes
         
         assume input images are and gridpoints are torch tensors already
 
@@ -31,42 +73,36 @@ class Transformer:
             self.device = 'cpu'
         self.dtype = torch.float64
         
-        self.I = torch.tensor(I, dtype=self.dtype, device=self.device)
-        self.J = torch.tensor(J, dtype=self.dtype, device=self.device)
+        # I and J are never modified in place, so they may share memory with the inputs.
+        self.I = torch_as_tensor(I, dtype=self.dtype, device=self.device)
+        self.J = torch_as_tensor(J, dtype=self.dtype, device=self.device)
         self.Ires = Ires
         self.Jres = Jres
         
-        # self.I = torch.tensor(I, dtype=self.dtype, device=self.device)
-        xI = [np.arange(nxyz_i)*dxyz_i - np.mean(np.arange(nxyz_i)*dxyz_i) for nxyz_i, dxyz_i in zip(I.shape, Ires)] # Create coords as a list of numpy arrays.
-        xI = [torch.tensor(xI_i, dtype=self.dtype, device=self.device) for xI_i in xI] # Convert to lists of tensors.
+        # coordinates and meshgrids are shared with other Transformers on the same grids, and never modified in place
+        xI, self.XI = _get_grid(I.shape, Ires, self.dtype, self.device)
         self.xI = xI
         self.nxI = I.shape
         self.dxI = torch.tensor([xI[0][1]-xI[0][0], xI[1][1]-xI[1][0], xI[2][1]-xI[2][0]],
                                 dtype=self.dtype,device=self.device)
-        self.XI = torch.stack(torch.meshgrid(xI))
         
-        # self.J = torch.tensor(J, dtype=self.dtype, device=self.device)
-        xJ = [np.arange(nxyz_i)*dxyz_i - np.mean(np.arange(nxyz_i)*dxyz_i) for nxyz_i, dxyz_i in zip(J.shape, Jres)] # Create coords as a list of numpy arrays.
-        xJ = [torch.tensor(xJ_i, dtype=self.dtype, device=self.device) for xJ_i in xJ] # Convert to lists of tensors.
+        xJ, self.XJ = _get_grid(J.shape, Jres, self.dtype, self.device)
         self.xJ = xJ
         self.nxJ = J.shape
         self.dxJ = torch.tensor([xJ[0][1]-xJ[0][0], xJ[1][1]-xJ[1][0], xJ[2][1]-xJ[2][0]],
                                 dtype=self.dtype,device=self.device)
-        self.XJ = torch.stack(torch.meshgrid(xJ))
         
         # a weight, may be updated via EM
         self.WM = torch.ones(self.nxJ,dtype=self.dtype,device=self.device)
+        self.sigmaA = None
         if sigmaA is not None:
-            self.WM *= 0.9
-            self.WA = torch.ones(self.nxJ,dtype=self.dtype,device=self.device)*0.1
-            self.CA = torch.max(J) # constant value for artifact
+            self.set_artifact_classes(sigmaA, CA)
         
         self.nt = nt
         self.dt = 1.0/nt
         
         self.sigmaM = sigmaM
         self.sigmaR = sigmaR
-        self.sigmaA = sigmaA
         
         self.order = order
         
@@ -101,19 +137,112 @@ class Transformer:
         else:
             self.A = torch.eye(4,dtype=self.dtype,device=self.device, requires_grad=usegrad)
 
+        # the start and stop along each axis of I of the template working grid, if it has been cropped with crop_template
+        self.template_crop_box = None
+
         # smoothing
+        self.a = a
+        self.p = p
+        self.compute_smoothing_kernels()
+
+    def set_artifact_classes(self, sigmaA, CA=None):
+        '''Model the voxels of J that are not matched by the deformed template as artifacts of constant intensity CA, 
+        with standard deviation sigmaA, weighted against matching by weights.
+        sigmaA and CA may be sequences of the same length to model several artifact classes, such as bright blobs and dark tears, 
+        or sigmaA may be a scalar shared by every class in CA.
+        If CA is None, sigmaA must be a scalar and there is one class, whose constant is updated to the mean of J times the weight of not matching, 
+        otherwise the constant of each class is updated to the mean of J weighted by that class.
+        The matching weights WM are reset to 0.9.'''
+        sigmaA = torch.as_tensor(sigmaA, dtype=self.dtype, device=self.device).reshape(-1)
+        if CA is None:
+            if sigmaA.numel() != 1:
+                raise ValueError(f"If CA is None, sigmaA must be a scalar.\n"
+                    f"sigmaA: {sigmaA.tolist()}.")
+            CA_by_class = False
+            # the mean of J*(1-WM) at the reset WM
+            CA = (torch.mean(self.J)*0.1).reshape(1)
+        else:
+            CA_by_class = True
+            CA = torch.as_tensor(CA, dtype=self.dtype, device=self.device).reshape(-1)
+            if sigmaA.numel() not in (1, CA.numel()):
+                raise ValueError(f"sigmaA must be a scalar or have the same length as CA.\n"
+                    f"sigmaA: {sigmaA.tolist()}, CA: {CA.tolist()}.")
+        self.WM.fill_(0.9)
+        self.CA_by_class = CA_by_class
+        self.CA = CA
+        self.sigmaA = sigmaA.expand(CA.shape)
+
+    def compute_smoothing_kernels(self):
+        '''Compute the Fourier domain regularization operator Lhat, LLhat, and the smoothing kernel Khat for the template grid, 
+        or take them from _geometry_cache if they were computed for the same grid, a, and p.'''
+        key = ('kernels', tuple(self.nxI), tuple(float(dxyz_i) for dxyz_i in self.Ires), float(self.a), float(self.p), self.dtype, str(self.device))
+        kernels = _geometry_cache.get(key)
+        if kernels is not None:
+            self.Lhat, self.LLhat, self.Khat = kernels
+            return
         f0I = torch.arange(self.nxI[0],dtype=self.dtype,device=self.device)/self.dxI[0]/self.nxI[0]
         f1I = torch.arange(self.nxI[1],dtype=self.dtype,device=self.device)/self.dxI[1]/self.nxI[1]
         f2I = torch.arange(self.nxI[2],dtype=self.dtype,device=self.device)/self.dxI[2]/self.nxI[2]
         F0I,F1I,F2I = torch.meshgrid(f0I, f1I, f2I)
-        self.a = a
-        self.p = p
         Lhat = (1.0 - self.a**2*( (-2.0 + 2.0*torch.cos(2.0*np.pi*self.dxI[0]*F0I))/self.dxI[0]**2 
                 + (-2.0 + 2.0*torch.cos(2.0*np.pi*self.dxI[1]*F1I))/self.dxI[1]**2
                 + (-2.0 + 2.0*torch.cos(2.0*np.pi*self.dxI[2]*F2I))/self.dxI[2]**2 ) )**self.p
         self.Lhat = Lhat
         self.LLhat = self.Lhat**2
         self.Khat = 1.0/self.LLhat
+        _geometry_cache.put(key, (self.Lhat, self.LLhat, self.Khat))
+
+    @staticmethod
+    def set_cache_limit(max_bytes=None, max_entries=None):
+        '''Set the limits on the cache of coordinates, meshgrids, and smoothing kernels shared by all Transformer objects, 
+        evicting the least recently used entries as necessary. Limits that are None are unchanged.'''
+        _geometry_cache.resize(max_bytes=max_bytes, max_entries=max_entries)
+
+    @staticmethod
+    def clear_cache():
+        '''Remove all entries from the cache of coordinates, meshgrids, and smoothing kernels shared by all Transformer objects.'''
+        _geometry_cache.clear()
+
+    def crop_template(self, padding=10):
+        '''Crop the template working grid to the footprint of the target under the current affine A, 
+        expanded by padding voxels on each side and clipped to the template, 
+        so that the velocity field and kernels only span the region that is matched to the target.
+        The template coordinates are recentered on the crop and A is updated to match, 
+        as though this Transformer had been constructed with the cropped template.
+        Velocity outside the crop is discarded.
+        The crop is accumulated in template_crop_box, relative to the template this Transformer was constructed with.
+        Returns whether the template was cropped.'''
+        # the footprint of the target box is bounded by the images of its corners under the inverse affine
+        corners = torch.stack(torch.meshgrid([torch.stack([x[0], x[-1]]) for x in self.xJ])).reshape(3,-1)
+        Ai = torch.inverse(self.A)
+        footprint = torch.matmul(Ai[:3,:3], corners) + Ai[:3,3:]
+        xI0 = torch.stack([x[0] for x in self.xI])
+        lower = ((torch.min(footprint,1)[0] - xI0)/self.dxI).cpu().numpy()
+        upper = ((torch.max(footprint,1)[0] - xI0)/self.dxI).cpu().numpy()
+        start = np.clip(np.floor(lower).astype(int) - padding, 0, self.nxI)
+        stop = np.clip(np.ceil(upper).astype(int) + 1 + padding, 0, self.nxI)
+        # keep the grid if it would not shrink, or would be too small to take gradients on
+        if np.all(start == 0) and np.all(stop == self.nxI) or np.any(stop - start < 2):
+            return False
+        crop = tuple(slice(start_i, stop_i) for start_i, stop_i in zip(start, stop))
+
+        # the center of the crop in the current coordinates, which becomes their origin
+        offset = torch.stack([torch.mean(x[crop_i]) for x, crop_i in zip(self.xI, crop)])
+        self.I = self.I[crop]
+        self.nxI = tuple(self.I.shape)
+        self.xI, self.XI = _get_grid(self.nxI, self.Ires, self.dtype, self.device)
+        self.v = self.v[(slice(None),slice(None))+crop].contiguous()
+        self.vhat = torch.rfft(self.v,3,onesided=False)
+        # positions in the old coordinates are positions in the new ones plus offset
+        self.A = self.A.clone()
+        self.A[:3,3] += torch.matmul(self.A[:3,:3], offset)
+        self.compute_smoothing_kernels()
+
+        crop_box = np.stack([start, stop], -1)
+        if self.template_crop_box is not None:
+            crop_box += self.template_crop_box[:,:1]
+        self.template_crop_box = crop_box
+        return True
         
     def forward(self):        
         ################################################################################
@@ -147,18 +276,42 @@ class Transformer:
         BTB = torch.matmul( BT*WMflat, B)        
         BTJ = torch.matmul( BT*WMflat, Jflat )              
         self.coeffs,_ = torch.solve(BTJ[:,None],BTB) 
-        self.CA = torch.mean(self.J*(1.0-self.WM))
         # torch.solve(B,A) solves AX=B (note order is opposite what I'd expect)        
         self.fAphiI = torch.matmul(B,self.coeffs).reshape(self.nxJ)
         # for convenience set this error to a member
         self.err = self.fAphiI - self.J
         
     def weights(self):
-        '''Calculate image matching and artifact weights in simple Gaussian mixture model'''
-        fM = torch.exp( (self.fAphiI - self.J)**2*(-1.0/2.0/self.sigmaM**2) ) / np.sqrt(2.0*np.pi*self.sigmaM**2)
-        fA = torch.exp( (self.CA     - self.J)**2*(-1.0/2.0/self.sigmaA**2) ) / np.sqrt(2.0*np.pi*self.sigmaA**2)
-        fsum = fM + fA
-        self.WM = fM/fsum        
+        '''Calculate image matching and artifact weights in a Gaussian mixture model, and update the artifact constants CA.
+        The matching weights are written into WM in place, slab by slab with a log-sum-exp over the classes, 
+        so no full volume is allocated for any class.'''
+        # log normalized densities, with the matching class first and the artifact classes along the first axis
+        sigmaA = self.sigmaA.reshape(-1,1,1,1)
+        CA = self.CA.reshape(-1,1,1,1)
+        lognormM = 0.5*np.log(2.0*np.pi*self.sigmaM**2)
+        lognormA = 0.5*torch.log(2.0*np.pi*sigmaA**2)
+        JWsum = torch.zeros(self.CA.shape, dtype=self.dtype, device=self.device)
+        Wsum = torch.zeros(self.CA.shape, dtype=self.dtype, device=self.device)
+        nslab = max(1, _weights_slab_size//(self.nxJ[1]*self.nxJ[2]))
+        for start in range(0, self.nxJ[0], nslab):
+            J = self.J[start:start+nslab]
+            logfM = (self.fAphiI[start:start+nslab] - J)**2*(-1.0/2.0/self.sigmaM**2) - lognormM
+            logfA = (CA - J)**2*(-1.0/2.0/sigmaA**2) - lognormA
+            # torch.logsumexp rather than torch.logaddexp, which requires torch>=1.6
+            logfsum = torch.logsumexp(torch.cat([logfM[None], logfA]), 0)
+            WM = torch.exp(logfM - logfsum, out=self.WM[start:start+nslab])
+            # accumulate the sums that update CA
+            if self.CA_by_class:
+                WA = torch.exp(logfA - logfsum)
+                JWsum += torch.sum(WA*J, (1,2,3))
+                Wsum += torch.sum(WA, (1,2,3))
+            else:
+                JWsum += torch.sum(J) - torch.sum(WM*J)
+        if self.CA_by_class:
+            # keep the constants of classes with no weight
+            self.CA = torch.where(Wsum > 0, JWsum/Wsum, self.CA)
+        else:
+            self.CA = JWsum/self.J.numel()
         
     def cost(self):                
         # get matching cost
@@ -235,7 +388,9 @@ class Transformer:
         
     # to interpolate, use this
     # https://pytorch.org/docs/0.3.0/nn.html#torch.nn.functional.grid_sample
-    def interp3(self,x,I,phii):
+    # static so that it can be used without an instance, e.g. when composing transforms
+    @staticmethod
+    def interp3(x,I,phii):
         '''Interpolate image I,
         sampled at points x (1d array), 
         at the new points phii (dense grid)     
@@ -346,6 +501,11 @@ def torch_register(template, target, transformer, sigmaR, eV, eL=0, eT=0, **kwar
     sigmaR -> deformation allowance
     do_affine [0]-> enable affine transformation (0 or 1)
     outdir -> ['.'] output directory path
+    sigmaA [None] -> artifact standard deviation, enabling EM weights, may be a sequence as described in Transformer.set_artifact_classes
+    CA [None] -> initial artifact constants, one per artifact class, as described in Transformer.set_artifact_classes
+    nEM [1] -> iterations between updates of the EM weights
+    crop_template [False] -> crop the template working grid to the footprint of the target after naffine iterations
+    crop_template_padding [10] -> voxels by which the cropped template grid extends beyond the footprint of the target
    """
     # Set defaults.
     arguments = {
@@ -359,10 +519,14 @@ def torch_register(template, target, transformer, sigmaR, eV, eL=0, eT=0, **kwar
         'sigmaM':1.0, # sigmaM
         'sigmaR':sigmaR, # sigmaR
         'sigmaA':None, # for EM algorithm
+        'CA':None, # artifact constants, for EM algorithm
+        'nEM':1, # iterations between EM weight updates
         'nt':3, # number of time steps in velocity field           
         'order':2, # polynomial order
         'draw':False,
         'tune':False,
+        'crop_template':False,
+        'crop_template_padding':10,
     }
     # Update parameters with kwargs.
     arguments.update(kwargs)
@@ -379,10 +543,15 @@ def torch_register(template, target, transformer, sigmaR, eV, eL=0, eT=0, **kwar
     vmaxsave = [] # for visualization, maximum velocity
     Lsave = [] # for visualization, linear transform
     Tsave = [] # for visualizatoin, translation
+    if arguments['sigmaA'] is not None and transformer.sigmaA is None:
+        transformer.set_artifact_classes(arguments['sigmaA'], arguments['CA'])
     for it in range(arguments['niter']):
+        if arguments['crop_template'] and it == arguments['naffine']:
+            # the deformable phase only needs the template where the target lands
+            transformer.crop_template(padding=arguments['crop_template_padding'])
         transformer.forward()
         transformer.cost()
-        if arguments['sigmaA'] is not None:
+        if arguments['sigmaA'] is not None and not it % arguments['nEM']:
             transformer.weights()
         if it >= arguments['naffine'] and arguments['eV']>-1.0:
             transformer.step_v(eV=arguments['eV'])
@@ -424,6 +593,16 @@ def torch_register(template, target, transformer, sigmaR, eV, eL=0, eT=0, **kwar
         if not it % 10:
             print(f'Completed iteration {it}, E={transformer.Esave[-1]}, EM={transformer.EMsave[-1]}, ER={transformer.ERsave[-1]}')
         
+    # The last iteration updated A and v after computing the deformation from them, so bring it up to date, 
+    # exactly as torch_compute_deformation derives it for lean Transform objects.
+    transformer.forward()
+    identity = torch.eye(4, dtype=dtype, device=device)
+    transformer.phi = torch_compute_deformation(identity, transformer.v, transformer.xI, transformer.xJ, deform_to='template')
+    Aphi0 = transformer.A[0,0]*transformer.phi[0] + transformer.A[0,1]*transformer.phi[1] + transformer.A[0,2]*transformer.phi[2] + transformer.A[0,3]
+    Aphi1 = transformer.A[1,0]*transformer.phi[0] + transformer.A[1,1]*transformer.phi[1] + transformer.A[1,2]*transformer.phi[2] + transformer.A[1,3]
+    Aphi2 = transformer.A[2,0]*transformer.phi[0] + transformer.A[2,1]*transformer.phi[1] + transformer.A[2,2]*transformer.phi[2] + transformer.A[2,3]
+    transformer.Aphi = torch.stack([Aphi0,Aphi1,Aphi2])
+
     # Display final images.
     if arguments['tune']:
         f, axs = plt.subplots(2,2)
@@ -448,8 +627,8 @@ def torch_register(template, target, transformer, sigmaR, eV, eL=0, eT=0, **kwar
         
     
     return {
-        'Aphis':transformer.Aphi.cpu().numpy() if hasattr(transformer, 'Aphi') else None, 
-        'phis':transformer.phi.cpu().numpy() if hasattr(transformer, 'Aphi') else None, 
+        'Aphis':transformer.Aphi.cpu().numpy(), 
+        'phis':transformer.phi.cpu().numpy(), 
         'phiinvs':transformer.phii.cpu().numpy(), 
         'phiinvAinvs':transformer.phiiAi.cpu().numpy(), 
         'A':transformer.A.cpu().numpy(), 
@@ -467,11 +646,53 @@ def torch_apply_transform(image:np.ndarray, deform_to='template', transformer=No
         raise RuntimeError("transformer must be provided with present implementation.")
 
     if deform_to == 'template':
-        out = transformer.interp3(transformer.xJ,torch.tensor(image,dtype=transformer.dtype,device=transformer.device),transformer.Aphi)
+        out = transformer.interp3(transformer.xJ,torch_as_tensor(image,dtype=transformer.dtype,device=transformer.device),transformer.Aphi)
     elif deform_to == 'target':
-        out = transformer.interp3(transformer.xI,torch.tensor(image,dtype=transformer.dtype,device=transformer.device),transformer.phiiAi)
+        out = transformer.interp3(transformer.xI,torch_as_tensor(image,dtype=transformer.dtype,device=transformer.device),transformer.phiiAi)
     elif deform_to == 'template-identity': # deform to template with identity
-        out = transformer.interp3(transformer.xJ,torch.tensor(image,dtype=transformer.dtype,device=transformer.device),transformer.XI)
+        out = transformer.interp3(transformer.xJ,torch_as_tensor(image,dtype=transformer.dtype,device=transformer.device),transformer.XI)
     elif deform_to == 'target-identity':
-        out = transformer.interp3(transformer.xI,torch.tensor(image,dtype=transformer.dtype,device=transformer.device),transformer.XJ)
-    return out.cpu().numpy()
\ No newline at end of file
+        out = transformer.interp3(transformer.xI,torch_as_tensor(image,dtype=transformer.dtype,device=transformer.device),transformer.XJ)
+    return out.cpu().numpy()
+
+def torch_compute_axes(shape, resolution, dtype=torch.float64, device='cpu'):
+    """Compute the centered per-axis coordinates of a grid, matching those used by Transformer."""
+    x = [np.arange(nxyz_i)*dxyz_i - np.mean(np.arange(nxyz_i)*dxyz_i) for nxyz_i, dxyz_i in zip(shape, resolution)]
+    return [torch.tensor(x_i, dtype=dtype, device=device) for x_i in x]
+
+
+def torch_compute_deformation(A, v, xI, xJ, deform_to='template'):
+    """Integrate the velocity field v and apply the affine A to compute the position field 
+    for deforming to the template (Aphi, on the template grid xI) 
+    or to the target (phiiAi, on the target grid xJ), 
+    exactly as Transformer computes them during registration, but without the images.
+    A and v must be tensors with the same dtype and device as xI and xJ."""
+    nt = v.shape[0]
+    dt = 1.0/nt
+    XI = torch.stack(torch.meshgrid(xI))
+    if deform_to == 'template':
+        # flow backwards, as in Transformer.step_v
+        phi = XI.clone().detach()
+        for t in range(nt-1,-1,-1):
+            Xs = XI + dt*v[t]
+            phi = Transformer.interp3(xI,phi-XI,Xs) + Xs
+        Aphi0 = A[0,0]*phi[0] + A[0,1]*phi[1] + A[0,2]*phi[2] + A[0,3]
+        Aphi1 = A[1,0]*phi[0] + A[1,1]*phi[1] + A[1,2]*phi[2] + A[1,3]
+        Aphi2 = A[2,0]*phi[0] + A[2,1]*phi[1] + A[2,2]*phi[2] + A[2,3]
+        return torch.stack([Aphi0,Aphi1,Aphi2])
+    elif deform_to == 'target':
+        # flow forwards, as in Transformer.forward
+        phii = XI.clone().detach()
+        for t in range(nt):
+            Xs = XI - dt*v[t]
+            phii = Transformer.interp3(xI,phii-XI,Xs) + Xs
+        XJ = torch.stack(torch.meshgrid(xJ))
+        Ai = torch.inverse(A)
+        X0s = Ai[0,0]*XJ[0] + Ai[0,1]*XJ[1] + Ai[0,2]*XJ[2] + Ai[0,3]
+        X1s = Ai[1,0]*XJ[0] + Ai[1,1]*XJ[1] + Ai[1,2]*XJ[2] + Ai[1,3]
+        X2s = Ai[2,0]*XJ[0] + Ai[2,1]*XJ[1] + Ai[2,2]*XJ[2] + Ai[2,3]
+        AiX = torch.stack([X0s,X1s,X2s])
+        return Transformer.interp3(xI,phii-XI,AiX) + AiX
+    else:
+        raise ValueError(f"deform_to must be either 'template' or 'target'.\n"
+            f"deform_to: {deform_to}.")
@@ -4,8 +4,17 @@ from .normalization import center_to_mean
 from .normalization import pad
 
 from .resampling import downsample_image
+from .resampling import downsample_image_blockwise
 from .resampling import change_resolution_to
 from .resampling import change_resolution_by
+from .resampling import ResamplingPlan
+from .resampling import fourier_resample
+
+from .pyramid import ImagePyramid
+
+from .foreground import detect_foreground
+from .foreground import compute_foreground_bounding_box
+from .foreground import crop_to_foreground
 
 # TODO: update preprocessing_functions.
 preprocessing_functions = [
@@ -25,21 +34,24 @@ Preprocessing Pipeline
 
 import numpy as np
 
-# TODO: incorporate arguments.
+from .pipeline import PreprocessingPipeline
+
 def preprocess(data:(np.ndarray, list), processes:list):
     """
     Perform each preprocessing function in <processes>, in the order listed, 
     on the np.ndarray <data>, or on each np.ndarray in <data> if <data> is a list.
+    The processes are validated once and performed by a PreprocessingPipeline.
     
     Arguments:
         data {np.ndarray, list} -- The array or list of arrays to be preprocessed.
-        processes {list} -- A list of strings, each of which must be the name of a function imported in this module.
+        processes {list} -- A list of steps, each the name of a function in preprocessing_functions, a callable, 
+            or a tuple of either and a dict of keyword arguments, e.g. ('pad', dict(pad_width=10)).
     
     Raises:
         TypeError: If <data> is a list, each element must be of type np.ndarray.
         TypeError: <data> must be of type np.ndarray or of type list.
-        ValueError: <processes> must be castable as a string-type np.ndarray.
-        ValueError: Each element of <processes> must be the name of a function imported in this module.
+        ValueError: Each named element of <processes> must be the name of a function imported in this module.
+        TypeError: The keyword arguments of each element of <processes> must be accepted by its function.
     
     Returns:
         np.ndarray, list -- The result of applying each function listed in <processes>
@@ -48,7 +60,7 @@ def preprocess(data:(np.ndarray, list), processes:list):
 
     # Verify data.
     if isinstance(data, list):
-        if not all(isinstance(datam, np.ndarray) for datum in data):
+        if not all(isinstance(datum, np.ndarray) for datum in data):
             raise TypeError(f"If data is a list, all elements must be np.ndarrays.\n"
                 f"type(data[0]): {type(data[0])}.")
     elif isinstance(data, np.ndarray):
@@ -58,23 +70,13 @@ def preprocess(data:(np.ndarray, list), processes:list):
         raise TypeError(f"data must be a np.ndarray or a list of np.ndarrays.")
     
     # Validate processes.
-    try:
-        processes = np.array(processes, str)
-    except ValueError:
-        raise ValueError(f"processes could not be cast to a string-type np.ndarray.\n"
-            f"processes: {processes}.")
+    pipeline = PreprocessingPipeline(processes)
     
     # Process each np.ndarray.
     # If data was passed in as a single np.ndarray, 
     # then data is now a 1-element list containing that np.ndarray: [data].
-    for data_index, datum in enumerate(data):
-        for process in processes:
-            if process in preprocessing_functions:
-                data[data_index] = eval(f"{process}(datum)")
-            else:
-                raise ValueError(f"Process {process} not recognized.\n"
-                    f"Recognized processes: {preprocessing_functions}.")
+    data = [pipeline.apply(datum) for datum in data]
 
     # Return in a form appropriate to what was passed in, 
     # i.e. list in, list out, np.ndarray in, np.ndarray out.
-    return data[0] if isinstance(data, list) and len(data) == 1 else data
\ No newline at end of file
+    return data[0] if isinstance(data, list) and len(data) == 1 else data
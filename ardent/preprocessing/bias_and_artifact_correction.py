@@ -1,7 +1,23 @@
 import numpy as np
+import json
+import torch
 import SimpleITK as sitk
+from contextlib import contextmanager
 from scipy.ndimage.filters import gaussian_filter
-from ardent.preprocessing import change_resolution_by
+from ardent.preprocessing import downsample_image
+from ardent.preprocessing.normalization import _validate_out
+from ardent.preprocessing.statistics import compute_otsu_threshold
+from ardent.preprocessing.statistics import _slab_bytes
+from ardent.preprocessing.resampling import _compute_block_boundaries
+from ardent.preprocessing.resampling import _compute_linear_interpolation_table
+from ardent.preprocessing.resampling import _apply_interpolation_tables
+from ardent.lddmm.transformer import torch_as_tensor
+from ardent.utilities import _resolve_float_dtype
+from ardent.utilities import _compute_content_hash
+from ardent.utilities import _LRUCache
+
+# The parameters of BiasField objects estimated by estimate_bias_field, keyed by the content hash of their image and mask and their parameters.
+_bias_field_cache = _LRUCache(max_bytes=2**28)
 
 def correct_bias_field(img, mask=None, scale=0.25, niters=[50, 50, 50, 50]):
     """Correct bias field in image using the N4ITK algorithm (http://bit.ly/2oFwAun)
@@ -51,7 +67,7 @@ def correct_bias_field(img, mask=None, scale=0.25, niters=[50, 50, 50, 50]):
 def scale_array(array):
     """Scale array to the range [1,2]."""
 
-    array = np.copy(array)
+    array = np.array(array, dtype=_resolve_float_dtype(np.asarray(array).dtype))
 
     array -= np.min(array)
     array /= np.max(array)
@@ -60,19 +76,207 @@ def scale_array(array):
     return array
 
 
-def correct_bias_field(image, xyz_resolution, scale=0.25, **kwargs):
-    '''Who cares if the image has 0 intensities?'''
+def correct_bias_field(image, xyz_resolution, scale=0.25, method='N4', n_threads=None, return_bias_field=False, **kwargs):
+    '''Who cares if the image has 0 intensities?
+    The bias field is estimated by estimate_bias_field, with kwargs, on <image> scaled to the interval [1,2], and applied to it. 
+    If method is 'polynomial', correct_bias_field_polynomial is used instead, to which kwargs are passed, and <image> is not scaled.
+    If return_bias_field, the BiasField is returned as well, so that it can be applied to other channels of the same acquisition.'''
+
+    if method == 'polynomial':
+        return correct_bias_field_polynomial(image, scale=scale, n_threads=n_threads, return_bias_field=return_bias_field, **kwargs)
 
     # Scale image to the interval [1,2].
     image = scale_array(image)
 
-    # Downsample image according to <scale>.
-    downsampled_image, downsampled_resolution = change_resolution_by(image, scale, return_true_resolution=True)
+    bias_field = estimate_bias_field(image, scale=scale, method=method, n_threads=n_threads, **kwargs)
+
+    # Apply the bias correction to the scaled copy of image in place.
+    bias_corrected_image = bias_field.apply(image, out=image)
+
+    if return_bias_field:
+        return bias_corrected_image, bias_field
+    else:
+        return bias_corrected_image
+
+
+def _compute_legendre_basis(coords, order):
+    """Returns the Legendre polynomials of degree 0 through order evaluated at coords, a torch.Tensor of values in [-1, 1], 
+    as a torch.Tensor of shape (len(coords), order + 1)."""
+
+    basis = [torch.ones_like(coords), coords]
+    for degree in range(1, order):
+        basis.append(((2 * degree + 1) * coords * basis[degree] - degree * basis[degree - 1]) / (degree + 1))
+    return torch.stack(basis[:order + 1], dim=1)
+
+
+def _normalize_coords(positions, axis_length):
+    """Returns positions along an axis of length axis_length mapped linearly from [0, axis_length - 1] to [-1, 1]."""
+
+    return 2 * positions / max(axis_length - 1, 1) - 1
+
+
+def _compute_block_coords(axis_length, scale_factor):
+    """Returns the centers of the blocks of length scale_factor averaged over by downsample_image along an axis of length axis_length, 
+    each the center of its real voxels, mapped as by _normalize_coords."""
+
+    block_boundaries = _compute_block_boundaries(axis_length, scale_factor)
+    return _normalize_coords((block_boundaries[:-1] + block_boundaries[1:] - 1) / 2, axis_length)
+
+
+def _evaluate_term(term, axis_bases):
+    """Returns the product of the Legendre polynomials of degree term[axis] along each axis, 
+    evaluated on the grid whose per-axis Legendre bases are axis_bases, flattened."""
+
+    values = axis_bases[0][:, term[0]]
+    for axis_basis, degree in zip(axis_bases[1:], term[1:]):
+        values = (values[:, None] * axis_basis[None, :, degree]).flatten()
+    return values
+
+
+def _evaluate_separable_polynomial(coefficients, axis_bases):
+    """Returns the polynomial with coefficients, a torch.Tensor with one axis of length order + 1 per dimension, 
+    evaluated on the grid whose per-axis Legendre bases are axis_bases, contracting one axis at a time 
+    so that no intermediate is larger than the result."""
+
+    values = coefficients
+    for axis_basis in axis_bases:
+        # Contract the leading degree axis, appending the spatial axis last.
+        values = torch.tensordot(values, axis_basis, dims=([0], [1]))
+    return values
+
+
+def _solve(matrix, right_hand_side):
+    """Returns the solution X of matrix @ X = right_hand_side, using torch.linalg.solve where available (torch>=1.8) 
+    and torch.solve otherwise, which takes its arguments in the opposite order."""
+
+    if hasattr(torch, 'linalg') and hasattr(torch.linalg, 'solve'):
+        return torch.linalg.solve(matrix, right_hand_side)
+    return torch.solve(right_hand_side, matrix)[0]
+
+
+@contextmanager
+def _limit_threads(n_threads):
+    """Limits torch and SimpleITK to n_threads threads within this context, restoring their thread counts after, 
+    unless n_threads is None."""
+
+    if n_threads is None:
+        yield
+        return
+
+    torch_n_threads = torch.get_num_threads()
+    sitk_n_threads = sitk.ProcessObject.GetGlobalDefaultNumberOfThreads()
+    torch.set_num_threads(n_threads)
+    sitk.ProcessObject.SetGlobalDefaultNumberOfThreads(n_threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(torch_n_threads)
+        sitk.ProcessObject.SetGlobalDefaultNumberOfThreads(sitk_n_threads)
+
+
+class BiasField():
+    """
+    A multiplicative bias correction estimated at low resolution by estimate_bias_field from an image of shape <shape>, 
+    which has been downsampled by averaging over blocks of shape <scale_factors>.
+    It is evaluated lazily at the shape of any image spanning the same extent, 
+    such as another channel of the same acquisition or the same image at another resolution, 
+    either from the coefficients of a Legendre polynomial or by linear interpolation between the centers of the blocks.
+    """
+
+    def __init__(self, shape, scale_factors, log_correction=None, coefficients=None):
+        """
+        Arguments:
+            shape {sequence} -- The shape of the image the bias correction was estimated from.
+            scale_factors {sequence} -- The per-axis factors by which that image was downsampled.
+
+        Keyword Arguments:
+            log_correction {np.ndarray, NoneType} -- The log of the bias correction at each block of the downsampled image. (default: {None})
+            coefficients {torch.Tensor, NoneType} -- The coefficients of the Legendre polynomial modeling the log of the bias correction, 
+                with one axis of length order + 1 per dimension. Exactly one of <log_correction> and <coefficients> must be provided. (default: {None})
+
+        Raises:
+            ValueError: Raised unless exactly one of log_correction and coefficients is provided.
+        """
+
+        if (log_correction is None) == (coefficients is None):
+            raise ValueError(f"Exactly one of log_correction and coefficients must be provided.\n"
+                f"type(log_correction): {type(log_correction)}, type(coefficients): {type(coefficients)}.")
+
+        self.shape = tuple(int(axis_length) for axis_length in shape)
+        self.scale_factors = tuple(int(scale_factor) for scale_factor in scale_factors)
+        self.log_correction = log_correction
+        self.coefficients = coefficients
+
+
+    def evaluate(self, shape=None, backend='numpy', dtype=None):
+        """
+        Evaluate the bias correction at <shape>, for an image spanning the same extent as the image it was estimated from.
+        
+        Keyword Arguments:
+            shape {sequence, NoneType} -- The shape at which the bias correction is evaluated. If None, <shape> is used. (default: {None})
+            backend {str} -- Either 'numpy' or 'torch'. If 'torch', a torch.Tensor is returned, 
+                on the device of the coefficients if this bias field is polynomial and on the cpu otherwise. (default: {'numpy'})
+            dtype {np.dtype, torch.dtype, NoneType} -- The dtype of the result. If None, the default dtype set by set_default_dtype is used. (default: {None})
+        
+        Raises:
+            ValueError: Raised if shape does not have the dimensions of <shape>.
+        
+        Returns:
+            np.ndarray, torch.Tensor -- The multiplicative bias correction at <shape>.
+        """
+
+        shape = self.shape if shape is None else tuple(int(axis_length) for axis_length in shape)
+        if len(shape) != len(self.shape):
+            raise ValueError(f"shape must have as many dimensions as the image the bias field was estimated from.\n"
+                f"shape: {shape}, self.shape: {self.shape}.")
+        if not isinstance(dtype, torch.dtype):
+            dtype = getattr(torch, _resolve_float_dtype(None, dtype).name)
+
+        if self.coefficients is not None:
+            coefficients = self.coefficients.to(dtype)
+            order = coefficients.shape[0] - 1
+            axis_bases = [_compute_legendre_basis(_normalize_coords(torch.arange(axis_length, dtype=dtype, device=coefficients.device), axis_length), order) 
+                for axis_length in shape]
+            log_correction = _evaluate_separable_polynomial(coefficients, axis_bases)
+        else:
+            # Interpolate linearly between the centers of the blocks, holding the edge values beyond them.
+            interpolation_tables = [_compute_linear_interpolation_table(_compute_block_coords(axis_length, scale_factor), 
+                _normalize_coords(np.arange(new_axis_length), new_axis_length)) 
+                for axis_length, scale_factor, new_axis_length in zip(self.shape, self.scale_factors, shape)]
+            log_correction = _apply_interpolation_tables(torch_as_tensor(self.log_correction, dtype=dtype, device='cpu'), interpolation_tables)
+
+        correction = torch.exp(log_correction, out=log_correction)
+
+        if backend == 'torch':
+            return correction
+        else:
+            return correction.cpu().numpy()
+
+
+    def apply(self, image, out=None):
+        """
+        Returns <image> multiplied by the bias correction evaluated at its shape, written into <out> if it is provided. 
+        <image> may be a np.ndarray, or a torch.Tensor, in which case the work is done on its device and a torch.Tensor is returned. 
+        Floating point images keep their dtype and other images produce the default dtype set by set_default_dtype.
+        """
+
+        if isinstance(image, torch.Tensor):
+            dtype = image.dtype if image.is_floating_point() else getattr(torch, _resolve_float_dtype(None).name)
+            correction = self.evaluate(image.shape, backend='torch', dtype=dtype).to(image.device)
+            return torch.mul(image, correction, out=out)
+        else:
+            dtype = _resolve_float_dtype(image.dtype)
+            correction = self.evaluate(image.shape, dtype=dtype)
+            return np.multiply(image, correction, out=out, dtype=dtype)
+
+
+def _estimate_log_correction_N4(image, scale_factors, mask=None, **kwargs):
+    """Returns the log of the bias correction of image downsampled by scale_factors, 
+    estimated by N4BiasFieldCorrectionImageFilter with parameters kwargs, named as the arguments of sitk.N4BiasFieldCorrection."""
+
+    downsampled_image = downsample_image(np.asarray(image), scale_factors)
 
-    # Bias-correct downsampled_image.
     N4BiasFieldCorrection_kwargs = dict(
-        image=downsampled_image, 
-        maskImage=None, 
         convergenceThreshold=0.001, 
         maximumNumberOfIterations=[50, 50, 50, 50], 
         biasFieldFullWidthAtHalfMaximum=0.15, 
@@ -84,68 +288,312 @@ def correct_bias_field(image, xyz_resolution, scale=0.25, **kwargs):
         maskLabel=1, 
     )
     N4BiasFieldCorrection_kwargs.update(kwargs)
-    bias_corrected_downsampled_image = sitk.N4BiasFieldCorrection(**N4BiasFieldCorrection_kwargs)
-    bias_corrected_downsampled_image = sitk.GetArrayFromImage(bias_corrected_downsampled_image)
-
-    # Compute bias from bias_corrected_downsampled_image.
-    downsample_computed_bias = bias_corrected_downsampled_image / downsampled_image
-
-    # Upsample bias.
-    upsampled_bias = change_resolution_by(downsample_computed_bias, downsampled_resolution)
-
-    # Apply upsampled bias to original image.
-    bias_corrected_image = image * upsampled_bias
-
-    return bias_corrected_image
+    bias_corrector = sitk.N4BiasFieldCorrectionImageFilter()
+    for name, value in N4BiasFieldCorrection_kwargs.items():
+        setter_name = 'Set' + name[0].upper() + name[1:]
+        if not hasattr(bias_corrector, setter_name):
+            raise TypeError(f"{name} is not a parameter of N4BiasFieldCorrection.\n"
+                f"name: {name}.")
+        getattr(bias_corrector, setter_name)(value)
+
+    # Bias-correct downsampled_image, within the blocks mostly in mask if it is provided.
+    inputs = [sitk.GetImageFromArray(downsampled_image)]
+    if mask is not None:
+        downsampled_mask = downsample_image(np.asarray(mask) != 0, scale_factors) >= 0.5
+        inputs.append(sitk.GetImageFromArray(downsampled_mask.astype(np.uint8)))
+    bias_corrected_downsampled_image = sitk.GetArrayFromImage(bias_corrector.Execute(*inputs))
+
+    return np.log(bias_corrected_downsampled_image / downsampled_image)
+
+
+def _fit_log_correction_polynomial(image, scale_factors, order=3, n_classes=3, n_iterations=20, mask=None, device=None, dtype=None):
+    """Returns the coefficients of the Legendre polynomial modeling the log of the bias correction of image, 
+    fit as described in correct_bias_field_polynomial, as a torch.Tensor with one axis of length order + 1 per dimension."""
+
+    # Validate arguments.
+    if order < 1:
+        raise ValueError(f"order must be at least 1.\n"
+            f"order: {order}.")
+    if n_classes < 1:
+        raise ValueError(f"n_classes must be at least 1.\n"
+            f"n_classes: {n_classes}.")
+    if n_iterations < 1:
+        raise ValueError(f"n_iterations must be at least 1.\n"
+            f"n_iterations: {n_iterations}.")
+
+    if device is None:
+        if isinstance(image, torch.Tensor):
+            device = image.device
+        else:
+            device = 'cuda:0' if torch.cuda.is_available() else 'cpu'
+    if dtype is None:
+        if isinstance(image, torch.Tensor):
+            dtype = image.dtype if image.is_floating_point() else getattr(torch, _resolve_float_dtype(None).name)
+        else:
+            dtype = getattr(torch, _resolve_float_dtype(np.asarray(image).dtype).name)
+
+    image = torch_as_tensor(image, dtype=dtype, device=device)
+
+    # Downsample image according to scale_factors.
+    downsampled_image = downsample_image(image, scale_factors, backend='torch')
+    downsampled_bases = [_compute_legendre_basis(torch.as_tensor(_compute_block_coords(axis_length, scale_factor), dtype=dtype, device=device), order) 
+        for axis_length, scale_factor in zip(image.shape, scale_factors)]
+
+    # Construct the design matrix of the terms of total degree at most order, other than the constant term, 
+    # which is left out so as to preserve the intensity scale.
+    degrees = [term for term in np.ndindex(*(order + 1,) * image.ndim) if 0 < sum(term) <= order]
+    design_matrix = torch.stack([_evaluate_term(term, downsampled_bases) for term in degrees], dim=1)
+
+    # Blocks are weighted by the fraction of their voxels in mask, and excluded if their average is not positive.
+    if mask is None:
+        mask_weights = torch.ones_like(downsampled_image)
+    else:
+        mask = torch_as_tensor(mask, dtype=dtype, device=device) != 0
+        mask_weights = downsample_image(mask.to(dtype), scale_factors, backend='torch')
+    mask_weights = torch.where(downsampled_image > 0, mask_weights, torch.zeros_like(mask_weights)).flatten()
+    log_values = torch.log(torch.clamp(downsampled_image, min=torch.finfo(dtype).tiny)).flatten()
+
+    # Fit the log of the bias field by iteratively reweighted least squares, alternating with fitting a Gaussian mixture 
+    # of n_classes classes to the corrected log-intensities, as in expectation-maximization segmentation with bias correction.
+    # The class means take the place of the constant term.
+    fitted_values = mask_weights > 0
+    # The quantiles are computed with numpy, as torch.quantile requires torch>=1.7.
+    class_means = torch.as_tensor(np.quantile(log_values[fitted_values].cpu().numpy(), np.linspace(0, 1, 2 * n_classes + 1)[1::2]), dtype=dtype, device=device)
+    class_variances = torch.full_like(class_means, torch.var(log_values[fitted_values]) / n_classes ** 2)
+    class_proportions = torch.full_like(class_means, 1 / n_classes)
+    corrected_log_values = log_values
+    for iteration in range(n_iterations):
+        # Compute the probability of each class for each block, in the log domain for stability.
+        log_likelihoods = -(corrected_log_values[:, None] - class_means) ** 2 / (2 * class_variances) \
+            - torch.log(class_variances) / 2 + torch.log(class_proportions)
+        probabilities = torch.softmax(log_likelihoods, dim=1) * mask_weights[:, None]
+        # Update the class parameters.
+        class_totals = probabilities.sum(0) + torch.finfo(dtype).eps
+        class_means = (probabilities * corrected_log_values[:, None]).sum(0) / class_totals
+        class_variances = (probabilities * (corrected_log_values[:, None] - class_means) ** 2).sum(0) / class_totals + torch.finfo(dtype).eps
+        class_proportions = class_totals / class_totals.sum()
+        # Fit the deviations of the log-intensities from their expected class means, each block weighted by its expected precision.
+        class_precisions = probabilities / class_variances
+        weights = class_precisions.sum(1)
+        targets = log_values - (class_precisions @ class_means) / (weights + torch.finfo(dtype).tiny)
+        weighted_design_matrix = design_matrix * weights[:, None]
+        coefficients = _solve(weighted_design_matrix.t() @ design_matrix, weighted_design_matrix.t() @ targets[:, None])
+        corrected_log_values = log_values - (design_matrix @ coefficients).flatten()
+
+    # The log of the bias correction is the negative of the log of the bias field.
+    coefficient_grid = torch.zeros((order + 1,) * image.ndim, dtype=dtype, device=device)
+    for term, coefficient in zip(degrees, coefficients.flatten()):
+        coefficient_grid[term] = -coefficient
+
+    return coefficient_grid
+
+
+def estimate_bias_field(image, scale=0.25, method='N4', mask=None, n_threads=None, **kwargs):
+    """
+    Estimate the bias field of <image> at low resolution, as a BiasField that can be applied to <image> 
+    or to any image spanning the same extent, such as another channel of the same acquisition.
+    Estimates are memoized in a least-recently-used cache keyed by a hash of the contents of <image> and <mask> and the other arguments, 
+    so the bias field of the same image is not estimated again.
+    
+    Arguments:
+        image {np.ndarray, torch.Tensor} -- The image whose bias field is estimated. Its intensities must be positive where they inform the estimate.
+    
+    Keyword Arguments:
+        scale {float, sequence} -- The per-axis factor by which the resolution is reduced to estimate the bias field, 
+            realized by averaging over blocks of round(1 / <scale>) voxels. (default: {0.25})
+        method {str} -- Either 'N4', in which case N4BiasFieldCorrection is performed on the downsampled image, 
+            or 'polynomial', in which case a polynomial is fit in torch as by correct_bias_field_polynomial. (default: {'N4'})
+        mask {np.ndarray, torch.Tensor, NoneType} -- If provided, only voxels where <mask> is nonzero inform the estimate. (default: {None})
+        n_threads {int, NoneType} -- If provided, the number of threads used by SimpleITK and torch during the estimation, 
+            so that estimates run in parallel do not oversubscribe cores. (default: {None})
+        kwargs -- If method is 'N4', parameters of N4BiasFieldCorrection named as its arguments, e.g. maximumNumberOfIterations. 
+            If method is 'polynomial', keyword arguments of correct_bias_field_polynomial, e.g. order.
+    
+    Raises:
+        ValueError: Raised if method is not one of the supported methods.
+        ValueError: Raised if n_threads is less than 1.
+    
+    Returns:
+        BiasField -- The estimated bias field.
+    """
 
+    # Validate arguments.
+    methods = ['N4', 'polynomial']
+    if method not in methods:
+        raise ValueError(f"method must be one of {methods}.\n"
+            f"method: {method}.")
+    if n_threads is not None and n_threads < 1:
+        raise ValueError(f"n_threads must be at least 1.\n"
+            f"n_threads: {n_threads}.")
+
+    scale_factors = tuple(np.maximum(1, np.round(1 / np.broadcast_to(scale, (image.ndim,)))).astype(int).tolist())
+
+    # The thread count does not affect the estimate, so it is not part of the key.
+    hashed_arrays = [array.detach().cpu().numpy() if isinstance(array, torch.Tensor) else array for array in (image, mask)]
+    parameters = dict(method=method, scale_factors=scale_factors, kwargs=kwargs)
+    key = tuple(None if array is None else _compute_content_hash(array) for array in hashed_arrays) \
+        + (json.dumps(parameters, sort_keys=True, default=str),)
+
+    bias_field_kwargs = _bias_field_cache.get(key)
+    if bias_field_kwargs is None:
+        with _limit_threads(n_threads):
+            if method == 'N4':
+                bias_field_kwargs = dict(log_correction=_estimate_log_correction_N4(image, scale_factors, mask=mask, **kwargs))
+            else:
+                bias_field_kwargs = dict(coefficients=_fit_log_correction_polynomial(image, scale_factors, mask=mask, **kwargs))
+        bias_field_kwargs.update(shape=tuple(image.shape), scale_factors=scale_factors)
+        _bias_field_cache.put(key, bias_field_kwargs)
+
+    return BiasField(**bias_field_kwargs)
+
+
+def correct_bias_field_polynomial(image, scale=0.25, order=3, n_classes=3, n_iterations=20, mask=None, 
+device=None, dtype=None, n_threads=None, return_bias_field=False):
+    """
+    Correct the bias field of <image> by fitting a smooth polynomial to its log-intensity at low resolution, in torch.
+
+    <image> is averaged over blocks to a resolution of about <scale>.
+    The log of the bias field is modeled as a sum of products of Legendre polynomials along each axis, of total degree at most <order>, 
+    and fit to the log of the downsampled image by weighted least squares, ignoring blocks whose average is not positive. 
+    Each iteration fits a Gaussian mixture of <n_classes> classes to the corrected log-intensities of the blocks, 
+    and refits the deviations of the log-intensities from their expected class means, each weighted by its expected precision. 
+    The bias field is then evaluated at full resolution one axis at a time, without upsampling, and divided out of <image>. 
+    Its constant term is left out, so the intensity scale of <image> is preserved, and unlike correct_bias_field, <image> is not rescaled.
+    The fit is performed by estimate_bias_field, so it is memoized.
+    
+    Arguments:
+        image {np.ndarray, torch.Tensor} -- The image to be bias-corrected, allowing arbitrary dimensions.
+    
+    Keyword Arguments:
+        scale {float, sequence} -- The per-axis factor by which the resolution is reduced to estimate the bias field, 
+            realized by averaging over blocks of round(1 / <scale>) voxels. (default: {0.25})
+        order {int} -- The maximum total degree of the polynomial modeling the log of the bias field. (default: {3})
+        n_classes {int} -- The number of classes of tissue, each of roughly constant intensity once corrected. (default: {3})
+        n_iterations {int} -- The number of reweighted least squares fits. (default: {20})
+        mask {np.ndarray, torch.Tensor, NoneType} -- If provided, only voxels where <mask> is nonzero inform the fit. (default: {None})
+        device {str, torch.device, NoneType} -- The device on which the fit is done. 
+            If None, the device of <image> if it is a torch.Tensor, otherwise 'cuda:0' if it is available and 'cpu' if not, as chosen by Transformer. (default: {None})
+        dtype {torch.dtype, NoneType} -- The dtype in which the fit is done. If None, the dtype of <image> if it is floating point, 
+            otherwise the default dtype set by set_default_dtype. Pass the device and dtype of a Transformer to match it. (default: {None})
+        n_threads {int, NoneType} -- If provided, the number of threads used by torch during the fit. (default: {None})
+        return_bias_field {bool} -- If True, also returns the BiasField, which can be applied to other images spanning the same extent. (default: {False})
+    
+    Raises:
+        ValueError: Raised if order is less than 1.
+        ValueError: Raised if n_classes is less than 1.
+        ValueError: Raised if n_iterations is less than 1.
+    
+    Returns:
+        np.ndarray, torch.Tensor, tuple -- The bias-corrected image, as a torch.Tensor on the device of <image> if it is a torch.Tensor and a np.ndarray otherwise, 
+            or if <return_bias_field>, a tuple of it and the BiasField.
+    """
 
-def remove_grid_artifact(image, z_axis=1, sigma=10, mask=None):
-    """Remove the grid artifact from tiled data."""
+    bias_field = estimate_bias_field(image, scale=scale, method='polynomial', mask=mask, n_threads=n_threads, 
+        order=order, n_classes=n_classes, n_iterations=n_iterations, device=device, dtype=dtype)
 
-    if mask is None:
-        mask = np.ones_like(image)
-    elif mask == 'Otsu':
-        sitk_Image_mask = sitk.OtsuThreshold(sitk.GetImageFromArray(image))
-        mask = sitk.GetArrayFromImage(sitk_Image_mask)
-        
-    masked_image = image * mask
+    bias_corrected_image = bias_field.apply(image)
 
-    # Shift masked_image above 1.
-#     min_value = np.min(masked_image)
-#     masked_image = masked_image - min_value + 1
+    if return_bias_field:
+        return bias_corrected_image, bias_field
+    else:
+        return bias_corrected_image
 
-    print(np.any(np.isnan(masked_image)))
 
-    # Compute masked average.
-    mean_across_z = np.average(masked_image, axis=z_axis)
-    # Correct for the zero-valued elements included in the above average.
-    z_mask_sum = np.sum(mask, axis=z_axis)
-    mean_across_z *= masked_image.shape[z_axis] / np.where(z_mask_sum != 0, z_mask_sum, 1)
-    np.nan_to_num(mean_across_z, copy=False, nan=0)
-    
-    print(np.any(np.isnan(mean_across_z)))
+def remove_grid_artifact(image, z_axis=1, sigma=10, mask=None, out=None):
+    """
+    Remove the grid artifact from tiled data, by multiplying <image> by the ratio of its mean along <z_axis> within <mask>, 
+    smoothed by a Gaussian, to that mean.
 
-    bias_z_projection = gaussian_filter(mean_across_z, sigma) / mean_across_z
-    bias_z_projection[ np.isinf(bias_z_projection) ] = 1.0
+    <image> is read in slabs along an axis other than <z_axis>, so it may be a np.memmap, 
+    and temporaries are bounded by the size of a slab and of the projection along <z_axis>.
     
-#     print(np.any(np.isnan(bias_z_projection)))
-    print(np.any(np.isinf(bias_z_projection)))
+    Arguments:
+        image {np.ndarray} -- The tiled image, with at least 2 dimensions.
     
-    bias_z_image = np.expand_dims(bias_z_projection, z_axis)
+    Keyword Arguments:
+        z_axis {int} -- The axis along which the mean is projected. (default: {1})
+        sigma {float, sequence} -- The standard deviation of the Gaussian with which the projection is smoothed, passed to gaussian_filter. (default: {10})
+        mask {np.ndarray, str, NoneType} -- If provided, voxels where <mask> is zero are excluded from the mean and set to 0 in the result. 
+            If 'Otsu', the mask is the voxels at or below the Otsu threshold of <image>, as produced by sitk.OtsuThreshold. (default: {None})
+        out {np.ndarray, NoneType} -- If provided, the result is written into <out>, which may be <image> itself or a np.memmap, 
+            and it is returned. (default: {None})
     
-#     print(np.any(np.isnan(bias_z_image)))
-#     print(np.any(np.isnan(masked_image)))
-#     print(masked_image.shape, bias_z_image.shape)
+    Raises:
+        ValueError: Raised if <image> has fewer than 2 dimensions.
+        ValueError: Raised if <mask> is a str other than 'Otsu'.
+        ValueError: Raised if <mask> does not have the shape of <image>.
+        ValueError: Raised if <out> does not have the shape of <image>.
     
-#     print(masked_image)
-#     print(bias_z_image)
-
-    corrected_masked_image = masked_image * bias_z_image
-    
-    print(corrected_masked_image.shape)
-    print(np.any(np.isnan(corrected_masked_image)))
-
-    # Shift corrected_masked_image to account for the initial shift.
-#     corrected_masked_image = corrected_masked_image + min_value - 1
+    Returns:
+        np.ndarray -- The corrected image, or <out>. It has the dtype of <image> if it is floating point, 
+            and otherwise the default dtype set by set_default_dtype.
+    """
 
-    return corrected_masked_image
\ No newline at end of file
+    # Validate arguments.
+    if image.ndim < 2:
+        raise ValueError(f"image must have at least 2 dimensions.\n"
+            f"image.ndim: {image.ndim}.")
+    z_axis = z_axis % image.ndim
+    threshold = None
+    if isinstance(mask, str):
+        if mask != 'Otsu':
+            raise ValueError(f"If mask is a str, it must be 'Otsu'.\n"
+                f"mask: {mask}.")
+        threshold = compute_otsu_threshold(image)
+        mask = None
+    elif mask is not None and np.shape(mask) != image.shape:
+        raise ValueError(f"mask must have the shape of image.\n"
+            f"mask.shape: {np.shape(mask)}, image.shape: {image.shape}.")
+    dtype = _resolve_float_dtype(image.dtype)
+    out = _validate_out(out, image.shape, dtype)
+
+    # Read slabs along the first axis other than z_axis, moved to the front.
+    slab_axis = 1 if z_axis == 0 else 0
+    moved_z_axis = z_axis + 1 if z_axis < slab_axis else z_axis
+    moved_image = np.moveaxis(image, slab_axis, 0)
+    moved_mask = None if mask is None else np.moveaxis(mask, slab_axis, 0)
+    moved_out = np.moveaxis(out, slab_axis, 0)
+    slab_length = max(1, _slab_bytes // max(1, moved_image[:1].size * max(np.dtype(dtype).itemsize, 8)))
+    slabs = [slice(start, start + slab_length) for start in range(0, moved_image.shape[0], slab_length)]
+
+    def _compute_mask_slab(image_slab, slab):
+        """Returns the mask of image_slab, or None if there is no mask."""
+        if threshold is not None:
+            return image_slab <= threshold
+        if moved_mask is not None:
+            return np.asarray(moved_mask[slab]) != 0
+        return None
+
+    # Compute the mean along z_axis within mask, slab by slab.
+    projection_shape = moved_image.shape[:moved_z_axis] + moved_image.shape[moved_z_axis + 1:]
+    masked_sums = np.zeros(projection_shape, np.float64)
+    mask_counts = np.full(projection_shape, moved_image.shape[moved_z_axis], np.float64)
+    for slab in slabs:
+        image_slab = np.asarray(moved_image[slab])
+        mask_slab = _compute_mask_slab(image_slab, slab)
+        if mask_slab is None:
+            masked_sums[slab] = np.sum(image_slab, axis=moved_z_axis, dtype=np.float64)
+        else:
+            masked_sums[slab] = np.sum(image_slab, axis=moved_z_axis, dtype=np.float64, where=mask_slab)
+            mask_counts[slab] = np.count_nonzero(mask_slab, axis=moved_z_axis)
+    # Where no voxels are in mask, the mean is 0.
+    mean_across_z = np.divide(masked_sums, mask_counts, out=np.zeros_like(masked_sums), where=mask_counts != 0)
+
+    # Compute the correction from the smoothed mean, leaving voxels whose mean is 0 unchanged.
+    correction = np.divide(gaussian_filter(mean_across_z, sigma), mean_across_z, out=np.ones_like(mean_across_z), where=mean_across_z != 0)
+    correction[~np.isfinite(correction)] = 1
+    correction = np.expand_dims(correction.astype(dtype), moved_z_axis)
+
+    # Apply the correction, slab by slab.
+    for slab in slabs:
+        image_slab = np.asarray(moved_image[slab])
+        mask_slab = _compute_mask_slab(image_slab, slab)
+        out_slab = moved_out[slab]
+        np.multiply(image_slab, correction[slab], out=out_slab)
+        if mask_slab is not None:
+            out_slab[~mask_slab] = 0
+
+    if isinstance(out, np.memmap):
+        out.flush()
+
+    return out
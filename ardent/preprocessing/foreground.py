@@ -0,0 +1,103 @@
+import numpy as np
+
+from ardent.utilities import _validate_scalar_to_multi
+from ardent.preprocessing.resampling import downsample_image
+from ardent.preprocessing.resampling import _compute_block_boundaries
+from ardent.preprocessing.statistics import compute_otsu_threshold
+
+"""
+Detection of the foreground of an image, and cropping to it, so that empty background is not registered.
+"""
+
+def detect_foreground(image, scale_factors=4, threshold=None):
+    """
+    Detect the foreground of <image> at low resolution, as the blocks of <image> whose average exceeds <threshold>.
+    
+    Arguments:
+        image {np.ndarray} -- The image whose foreground is detected, which may be a np.memmap.
+    
+    Keyword Arguments:
+        scale_factors {int, sequence} -- The per-axis factors by which <image> is downsampled by downsample_image before thresholding. (default: {4})
+        threshold {float, NoneType} -- The intensity above which blocks are foreground. 
+            If None, the Otsu threshold of the downsampled image is used. (default: {None})
+    
+    Returns:
+        np.ndarray -- A boolean mask of the foreground of the downsampled image.
+    """
+
+    scale_factors = _validate_scalar_to_multi(scale_factors, size=image.ndim, dtype=int)
+
+    downsampled_image = downsample_image(image, scale_factors)
+    if threshold is None:
+        threshold = compute_otsu_threshold(downsampled_image)
+
+    return downsampled_image > threshold
+
+
+def compute_foreground_bounding_box(image, scale_factors=4, padding=10, threshold=None):
+    """
+    Compute the bounding box of the foreground of <image>, as detected by detect_foreground, padded by <padding> voxels.
+    
+    Arguments:
+        image {np.ndarray} -- The image whose foreground is bounded, which may be a np.memmap.
+    
+    Keyword Arguments:
+        scale_factors {int, sequence} -- Passed to detect_foreground. (default: {4})
+        padding {int, sequence} -- The per-axis number of voxels by which the bounding box is expanded on each side, 
+            within the bounds of <image>. (default: {10})
+        threshold {float, NoneType} -- Passed to detect_foreground. (default: {None})
+    
+    Raises:
+        ValueError: Raised if any of padding is negative.
+    
+    Returns:
+        np.ndarray -- An integer array of shape (image.ndim, 2) holding the start and stop of the bounding box along each axis. 
+            If no foreground is detected, the bounding box spans all of <image>.
+    """
+
+    padding = _validate_scalar_to_multi(padding, size=image.ndim, dtype=int)
+    if np.any(padding < 0):
+        raise ValueError(f"Every element of padding must be non-negative.\n"
+            f"padding: {padding}.")
+    scale_factors = _validate_scalar_to_multi(scale_factors, size=image.ndim, dtype=int)
+
+    foreground = detect_foreground(image, scale_factors=scale_factors, threshold=threshold)
+
+    bounding_box = np.array([[0, axis_length] for axis_length in image.shape], int)
+    if not np.any(foreground):
+        return bounding_box
+
+    for axis, (axis_length, scale_factor) in enumerate(zip(image.shape, scale_factors)):
+        # Find the first and last blocks along axis containing foreground, and map them to the voxels they average.
+        foreground_blocks = np.flatnonzero(np.any(foreground, axis=tuple(other_axis for other_axis in range(image.ndim) if other_axis != axis)))
+        block_boundaries = _compute_block_boundaries(axis_length, scale_factor)
+        bounding_box[axis] = [
+            max(0, block_boundaries[foreground_blocks[0]] - padding[axis]), 
+            min(axis_length, block_boundaries[foreground_blocks[-1] + 1] + padding[axis]), 
+        ]
+
+    return bounding_box
+
+
+def crop_to_foreground(image, scale_factors=4, padding=10, threshold=None):
+    """
+    Crop <image> to the bounding box of its foreground, as computed by compute_foreground_bounding_box, without copying it.
+    
+    Arguments:
+        image {np.ndarray} -- The image to crop, which may be a np.memmap.
+    
+    Keyword Arguments:
+        scale_factors {int, sequence} -- Passed to compute_foreground_bounding_box. (default: {4})
+        padding {int, sequence} -- Passed to compute_foreground_bounding_box. (default: {10})
+        threshold {float, NoneType} -- Passed to compute_foreground_bounding_box. (default: {None})
+    
+    Returns:
+        tuple -- A view of <image> cropped to the bounding box, and the bounding box, 
+            an integer array of shape (image.ndim, 2) holding its start and stop along each axis.
+    """
+
+    bounding_box = compute_foreground_bounding_box(image, scale_factors=scale_factors, padding=padding, threshold=threshold)
+
+    cropped_image = image[tuple(slice(start, stop) for start, stop in bounding_box)]
+
+    return cropped_image, bounding_box
@@ -1,45 +1,89 @@
 import numpy as np
 
 from ardent.utilities import _validate_ndarray
+from ardent.utilities import _resolve_float_dtype
+from ardent.preprocessing.statistics import compute_mean
+from ardent.preprocessing.statistics import compute_mean_absolute_deviation
 
 def _verify_data_is_ndarray(data):
     if not isinstance(data, np.ndarray):
         raise TypeError(f"data must be of type np.ndarray.\ntype(data): {type(data)}.")
 
 
-def cast_to_typed_array(data, dtype=float):
-    """Returns a copy of data cast as a np.ndarray of type dtype."""
+def _validate_out(out, shape, dtype):
+    """Returns out if it has the given shape, or a new array of shape and dtype if out is None."""
 
-    data = _validate_ndarray(data, dtype=dtype)
+    if out is None:
+        return np.empty(shape, dtype)
+    if not isinstance(out, np.ndarray):
+        raise TypeError(f"out must be of type np.ndarray.\n"
+            f"type(out): {type(out)}.")
+    if out.shape != tuple(shape):
+        raise ValueError(f"out must have the shape of the result.\n"
+            f"out.shape: {out.shape}, expected shape: {tuple(shape)}.")
+    return out
 
 
-def normalize_by_MAD(data):
-    """Returns a copy of <data> divided by its mean absolute deviation."""
+def cast_to_typed_array(data, dtype=None, copy=True):
+    """Returns a copy of data cast as a np.ndarray of type dtype, or if dtype is None, the default dtype set by set_default_dtype.
+    If copy is False, data is returned without copying if it is already a np.ndarray of that dtype."""
+
+    if dtype is None:
+        dtype = _resolve_float_dtype(None)
+    data = _validate_ndarray(data, dtype=np.dtype(dtype).type, copy=copy)
+
+    return data
+
+
+def normalize_by_MAD(data, sample_size=None, random_state=None, dtype=None, out=None):
+    """Returns a copy of <data> divided by its mean absolute deviation from its median.
+    If <sample_size> is provided, the mean absolute deviation is estimated from that many elements of <data> drawn at random, seeded by <random_state>.
+    The copy has dtype <dtype>, or if it is None, the dtype of <data> if it is floating point and the default dtype set by set_default_dtype otherwise.
+    If <out> is provided, the result is written into it instead and it is returned. <out> may be <data> itself."""
     
     _verify_data_is_ndarray(data)
 
-    mean_absolute_deviation = np.mean(np.abs(data - np.median(data)))
+    mean_absolute_deviation = compute_mean_absolute_deviation(data, sample_size=sample_size, random_state=random_state)
 
-    normalized_data = data / mean_absolute_deviation
+    out = _validate_out(out, data.shape, _resolve_float_dtype(data.dtype, dtype))
+    normalized_data = np.divide(data, mean_absolute_deviation, out=out)
 
     return normalized_data
 
 
-def center_to_mean(data):
-    """Returns a copy of <data> subtracted by its mean."""
+def center_to_mean(data, dtype=None, out=None):
+    """Returns a copy of <data> subtracted by its mean.
+    The copy has dtype <dtype>, or if it is None, the dtype of <data> if it is floating point and the default dtype set by set_default_dtype otherwise.
+    If <out> is provided, the result is written into it instead and it is returned. <out> may be <data> itself."""
 
     _verify_data_is_ndarray(data)
 
-    centered_data = data - np.mean(data)
+    mean = compute_mean(data)
+
+    out = _validate_out(out, data.shape, _resolve_float_dtype(data.dtype, dtype))
+    centered_data = np.subtract(data, mean, out=out)
 
     return centered_data
 
 
-def pad(data, pad_width=5, mode='constant', constant_values=0):
-    """Returns a padded copy of <data>."""
+def pad(data, pad_width=5, mode='constant', constant_values=0, out=None):
+    """Returns a padded copy of <data>.
+    If <out> is provided, the padded data is written into it instead and it is returned. 
+    With mode='constant' and a scalar <constant_values>, this is done without allocating the padded copy."""
 
     _verify_data_is_ndarray(data)
 
+    if out is not None:
+        pad_width = np.broadcast_to(np.asarray(pad_width, int), (data.ndim, 2))
+        out = _validate_out(out, np.add(data.shape, pad_width.sum(axis=1)), None)
+        if mode == 'constant' and np.ndim(constant_values) == 0:
+            # Fill out with constant_values and copy data into its interior.
+            out[...] = constant_values
+            out[tuple(slice(before, before + length) for (before, _), length in zip(pad_width, data.shape))] = data
+        else:
+            out[...] = pad(data, pad_width=pad_width, mode=mode, constant_values=constant_values)
+        return out
+
     pad_kwargs = {'array':data, 'pad_width':pad_width, 'mode':mode}
     if mode == 'constant': pad_kwargs.update(constant_values=constant_values)
 
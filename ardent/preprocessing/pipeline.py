@@ -0,0 +1,250 @@
+import numpy as np
+import json
+import time
+import inspect
+import tracemalloc
+
+from ardent.utilities import _validate_ndarray
+from ardent.utilities import _resolve_float_dtype
+from ardent.preprocessing.statistics import compute_mean
+from ardent.preprocessing.statistics import compute_mean_absolute_deviation
+
+# Elementwise steps of the form data * scale + offset, whose scale and offset depend on statistics of data.
+# Consecutive elementwise steps are fused into a single pass over the data.
+_elementwise_steps = ['normalize_by_MAD', 'center_to_mean']
+
+
+def _apply_affine(data, scale, offset, out, slab_bytes=2**22):
+    """Write data * scale + offset into out, which may be data, in a single pass over slabs along the first axis
+    small enough that each is still in cache for the addition."""
+
+    if data.ndim == 0 or data.size == 0:
+        np.multiply(data, scale, out=out, casting='unsafe')
+        np.add(out, offset, out=out, casting='unsafe')
+        return out
+
+    slab_length = max(1, slab_bytes // max(1, data[:1].nbytes))
+    for start in range(0, data.shape[0], slab_length):
+        slab = slice(start, start + slab_length)
+        np.multiply(data[slab], scale, out=out[slab], casting='unsafe')
+        np.add(out[slab], offset, out=out[slab], casting='unsafe')
+    return out
+
+
+class _Statistics():
+    """Lazily computed statistics of an array, each computed at most once."""
+
+    def __init__(self, data):
+
+        self.data = data
+        self._mean = None
+        self._mean_absolute_deviations = {}
+
+    @property
+    def mean(self):
+        if self._mean is None:
+            self._mean = compute_mean(self.data)
+        return self._mean
+
+    def mean_absolute_deviation(self, sample_size=None, random_state=None):
+        """The mean absolute deviation from the median, as computed by normalize_by_MAD with the same arguments."""
+        key = (sample_size, random_state)
+        if key not in self._mean_absolute_deviations:
+            self._mean_absolute_deviations[key] = compute_mean_absolute_deviation(self.data, sample_size=sample_size, random_state=random_state)
+        return self._mean_absolute_deviations[key]
+
+
+class PreprocessingPipeline():
+    """
+    A sequence of parameterized preprocessing steps, validated once on construction and applied to any number of arrays.
+
+    Each step is the name of a function in ardent.preprocessing.preprocessing_functions,
+    a callable taking an array as its first argument, or a tuple of either and a dict of keyword arguments,
+    e.g. ('pad', dict(pad_width=10)).
+
+    Rather than copying the data at every step, the pipeline copies it once and then works in place where it is safe to.
+    Consecutive elementwise steps, normalize_by_MAD and center_to_mean, are fused:
+    their statistics are derived from those of the data they start from,
+    and they are applied together in a single pass.
+    cast_to_typed_array and pad with mode='constant' are fused into the allocation of the padded array.
+    Other steps are applied as they are, and their results are owned by the pipeline.
+
+    After each call to apply, report lists the time, and if profile is True the peak memory, of each (fused) step.
+    """
+
+    def __init__(self, steps, profile=False):
+        """
+        Arguments:
+            steps {list} -- The steps to perform in order, each a name, a callable, or a tuple of either and a dict of keyword arguments.
+
+        Keyword Arguments:
+            profile {bool} -- If True, the peak memory allocated by each step is measured with tracemalloc. (default: {False})
+
+        Raises:
+            TypeError: Raised if a step is not a name, a callable, or a tuple of either and a dict.
+            ValueError: Raised if a step's name is not in ardent.preprocessing.preprocessing_functions.
+            TypeError: Raised if a step's keyword arguments are not accepted by its function.
+        """
+
+        from ardent import preprocessing
+
+        self.steps = []
+        for step in steps:
+            if isinstance(step, tuple):
+                if len(step) != 2 or not isinstance(step[1], dict):
+                    raise TypeError(f"A tuple step must be of the form (function, kwargs), where kwargs is a dict.\n"
+                        f"step: {step}.")
+                function, kwargs = step
+            else:
+                function, kwargs = step, {}
+
+            if isinstance(function, str):
+                if function not in preprocessing.preprocessing_functions:
+                    raise ValueError(f"Process {function} not recognized.\n"
+                        f"Recognized processes: {preprocessing.preprocessing_functions}.")
+                name = function
+                function = getattr(preprocessing, function)
+            elif callable(function):
+                name = getattr(function, '__name__', repr(function))
+            else:
+                raise TypeError(f"Each step must be the name of a preprocessing function or a callable, optionally paired with a dict of kwargs.\n"
+                    f"type(step): {type(function)}.")
+
+            # Verify that function accepts kwargs.
+            try:
+                inspect.signature(function).bind(None, **kwargs)
+            except TypeError as exception:
+                raise TypeError(f"The kwargs of step {name} are not accepted by its function.\n"
+                    f"kwargs: {kwargs}.") from exception
+            except ValueError:
+                # Some callables, such as builtins, have no signature to check against.
+                pass
+
+            self.steps.append((name, function, kwargs))
+
+        self.profile = profile
+        self.report = []
+
+
+    @property
+    def definition(self):
+        """A JSON string identifying each step by name, or by module and qualified name if it is a callable, 
+        and its keyword arguments, serialized by their str if they are not JSON-serializable."""
+
+        from ardent import preprocessing
+
+        step_definitions = []
+        for name, function, kwargs in self.steps:
+            if name not in preprocessing.preprocessing_functions:
+                name = f"{getattr(function, '__module__', None)}.{getattr(function, '__qualname__', name)}"
+            step_definitions.append([name, kwargs])
+        return json.dumps(step_definitions, sort_keys=True, default=str)
+
+
+    def _group_steps(self):
+        """Returns the steps grouped into runs to be performed together:
+        cast_to_typed_array followed by a constant pad with scalar constant_values, consecutive elementwise steps, or single other steps."""
+
+        groups = []
+        for name, function, kwargs in self.steps:
+            previous_group = groups[-1] if groups else None
+            if previous_group is not None and name in _elementwise_steps and all(step[0] in _elementwise_steps for step in previous_group):
+                previous_group.append((name, function, kwargs))
+            elif (previous_group is not None and name == 'pad' and kwargs.get('mode', 'constant') == 'constant'
+                and np.ndim(kwargs.get('constant_values', 0)) == 0 and len(previous_group) == 1 and previous_group[0][0] == 'cast_to_typed_array'):
+                previous_group.append((name, function, kwargs))
+            else:
+                groups.append([(name, function, kwargs)])
+        return groups
+
+
+    def apply(self, data, inplace=False):
+        """
+        Perform each step in order on <data>.
+
+        Arguments:
+            data {np.ndarray} -- The array to be preprocessed.
+
+        Keyword Arguments:
+            inplace {bool} -- If True, <data> may be modified and returned instead of copied,
+                if it is a floating point np.ndarray. (default: {False})
+
+        Returns:
+            np.ndarray -- The preprocessed array.
+        """
+
+        # owned indicates whether data may be modified in place.
+        owned = inplace and isinstance(data, np.ndarray) and np.issubdtype(data.dtype, np.floating)
+
+        start_tracing = self.profile and not tracemalloc.is_tracing()
+        if start_tracing:
+            tracemalloc.start()
+
+        self.report = []
+        try:
+            for group in self._group_steps():
+                if self.profile:
+                    tracemalloc.reset_peak()
+                    baseline_memory = tracemalloc.get_traced_memory()[0]
+                start_time = time.perf_counter()
+
+                data, owned = self._apply_group(group, data, owned)
+
+                group_report = dict(step='+'.join(name for name, _, _ in group), seconds=time.perf_counter() - start_time)
+                if self.profile:
+                    group_report.update(peak_bytes=tracemalloc.get_traced_memory()[1] - baseline_memory)
+                self.report.append(group_report)
+        finally:
+            if start_tracing:
+                tracemalloc.stop()
+
+        return data
+
+
+    __call__ = apply
+
+
+    def _apply_group(self, group, data, owned):
+        """Perform the steps in group on data, returning the result and whether the pipeline owns it."""
+
+        names = [name for name, _, _ in group]
+
+        if names[0] == 'cast_to_typed_array':
+            dtype = _resolve_float_dtype(None, group[0][2].get('dtype'))
+            if len(group) == 2:
+                # Allocate the padded array in dtype and let pad copy data into it, casting once.
+                _, pad_function, pad_kwargs = group[1]
+                data = np.asarray(data)
+                pad_width = pad_kwargs.get('pad_width', inspect.signature(pad_function).parameters['pad_width'].default)
+                pad_width = np.broadcast_to(np.asarray(pad_width, int), (data.ndim, 2))
+                padded_data = np.empty(tuple(np.add(data.shape, pad_width.sum(axis=1))), dtype=dtype)
+                return pad_function(data, **pad_kwargs, out=padded_data), True
+            if owned and isinstance(data, np.ndarray) and data.dtype == np.dtype(dtype):
+                return data, owned
+            return _validate_ndarray(data, dtype=dtype.type), True
+
+        if names[0] in _elementwise_steps:
+            data = np.asarray(data)
+            statistics = _Statistics(data)
+            # Compose the steps into data * scale + offset, computing their statistics from those of data.
+            scale, offset = 1, 0
+            for name, _, kwargs in group:
+                if name == 'normalize_by_MAD':
+                    statistics_kwargs = {key: value for key, value in kwargs.items() if key in ['sample_size', 'random_state']}
+                    mean_absolute_deviation = abs(scale) * statistics.mean_absolute_deviation(**statistics_kwargs)
+                    scale, offset = scale / mean_absolute_deviation, offset / mean_absolute_deviation
+                elif name == 'center_to_mean':
+                    offset = offset - (scale * statistics.mean + offset)
+            # The result has the dtype of the last step given one, as if the steps were performed in turn.
+            dtype = _resolve_float_dtype(data.dtype, next((kwargs['dtype'] for _, _, kwargs in group[::-1] if kwargs.get('dtype') is not None), None))
+            if owned and data.dtype == dtype:
+                out = data
+            else:
+                out = np.empty(data.shape, dtype)
+            return _apply_affine(data, scale, offset, out), True
+
+        name, function, kwargs = group[0]
+        result = function(data, **kwargs)
+        # The result of a step is owned if it is not a view of data, which may belong to the caller.
+        owned = owned or not (isinstance(result, np.ndarray) and np.may_share_memory(result, data))
+        return result, owned
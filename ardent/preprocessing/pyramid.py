@@ -0,0 +1,191 @@
+import numpy as np
+import json
+
+from ardent.utilities import _validate_scalar_to_multi
+from ardent.utilities import _validate_ndarray
+from ardent.utilities import _compute_content_hash
+from ardent.utilities import _LRUCache
+from ardent.utilities import _DiskCache
+from ardent.preprocessing.resampling import downsample_image
+from ardent.preprocessing.resampling import change_resolution_to
+
+# Levels of all ImagePyramid objects, keyed by the content hash of their image, their parameters, and their level.
+_pyramid_cache = _LRUCache(max_bytes=2**30)
+
+
+class ImagePyramid():
+    """
+    A sequence of copies of an image at successively lower resolutions, built lazily on first access
+    and memoized in a least-recently-used cache shared by all ImagePyramid objects.
+    Levels are keyed by a hash of the image's contents and the resampling parameters,
+    so a new ImagePyramid of the same image with the same parameters reuses the levels already computed,
+    and if cache_dir is provided they are also persisted there and reused across processes and runs.
+
+    By default, level 0 is the image itself and each subsequent level is produced by applying downsample_image
+    with scale_factors to the previous level. If xyz_resolutions is provided,
+    each level is instead produced by applying change_resolution_to to the image with the corresponding desired resolution.
+    Computed levels are read-only, since they may be shared.
+    """
+
+    def __init__(self, image, xyz_resolution=1, scale_factors=2, n_levels=4, xyz_resolutions=None,
+    truncate=False, cache_dir=None, **resample_kwargs):
+        """
+        Arguments:
+            image {np.ndarray} -- The full-resolution image.
+
+        Keyword Arguments:
+            xyz_resolution {float, sequence} -- The per-axis resolution of image. (default: {1})
+            scale_factors {int, sequence} -- The per-axis factors by which each level is downsampled from the previous level.
+                Ignored if xyz_resolutions is provided. (default: {2})
+            n_levels {int} -- The number of levels, including the full-resolution image.
+                Fewer levels are created if a level becomes smaller than scale_factors along an axis being downsampled.
+                Ignored if xyz_resolutions is provided. (default: {4})
+            xyz_resolutions {sequence, NoneType} -- If provided, the desired per-axis resolution of each level,
+                passed to change_resolution_to. (default: {None})
+            truncate {bool} -- Passed to downsample_image and change_resolution_to. (default: {False})
+            cache_dir {str, Path, NoneType} -- If provided, a directory in which levels are persisted. (default: {None})
+            resample_kwargs -- Passed to change_resolution_to if xyz_resolutions is provided.
+
+        Raises:
+            ValueError: Raised if n_levels is less than 1.
+            ValueError: Raised if any of scale_factors is less than 1.
+            ValueError: Raised if resample_kwargs are provided without xyz_resolutions.
+        """
+
+        self.image = _validate_ndarray(image)
+        self.xyz_resolution = _validate_scalar_to_multi(xyz_resolution, size=self.image.ndim, dtype=float)
+        self.truncate = bool(truncate)
+        self._disk_cache = None if cache_dir is None else _DiskCache(cache_dir)
+
+        if xyz_resolutions is not None:
+            self.desired_xyz_resolutions = [_validate_scalar_to_multi(desired_xyz_resolution, size=self.image.ndim, dtype=float)
+                for desired_xyz_resolution in xyz_resolutions]
+            self.scale_factors = None
+            self.resample_kwargs = resample_kwargs
+            n_levels = len(self.desired_xyz_resolutions)
+            parameters = dict(function='change_resolution_to', xyz_resolution=self.xyz_resolution.tolist(), truncate=self.truncate,
+                desired_xyz_resolutions=[desired.tolist() for desired in self.desired_xyz_resolutions], resample_kwargs=resample_kwargs)
+        else:
+            if resample_kwargs:
+                raise ValueError(f"resample_kwargs are only used with xyz_resolutions.\n"
+                    f"resample_kwargs: {resample_kwargs}.")
+            if n_levels < 1:
+                raise ValueError(f"n_levels must be at least 1.\n"
+                    f"n_levels: {n_levels}.")
+            self.desired_xyz_resolutions = None
+            self.scale_factors = _validate_scalar_to_multi(scale_factors, size=self.image.ndim, dtype=int)
+            if np.any(self.scale_factors < 1):
+                raise ValueError(f"Every element of scale_factors must be at least 1.\n"
+                    f"np.min(scale_factors): {np.min(self.scale_factors)}.")
+            self.resample_kwargs = {}
+            n_levels = self._count_downsampled_levels(n_levels)
+            parameters = dict(function='downsample_image', xyz_resolution=self.xyz_resolution.tolist(), truncate=self.truncate,
+                scale_factors=self.scale_factors.tolist())
+
+        self.n_levels = n_levels
+        self._key = (_compute_content_hash(self.image), json.dumps(parameters, sort_keys=True, default=str))
+
+
+    def _count_downsampled_levels(self, n_levels):
+        """Returns the number of levels up to n_levels before a level becomes smaller than scale_factors
+        along an axis being downsampled, as in save_multiscale."""
+
+        shape = np.array(self.image.shape)
+        if np.all(self.scale_factors == 1):
+            return 1
+        for level in range(1, n_levels):
+            if np.any((self.scale_factors > 1) & (shape < self.scale_factors)):
+                return level
+            shape = shape // self.scale_factors if self.truncate else -(-shape // self.scale_factors)
+        return n_levels
+
+
+    def __len__(self):
+        return self.n_levels
+
+
+    def __getitem__(self, level):
+        """Returns the image at level, computing it if it is not cached."""
+
+        return self._get_level(level)[0]
+
+
+    def _get_level(self, level):
+        """Returns (image, xyz_resolution) at level, from the in-memory cache, the on-disk cache, or by computing it."""
+
+        level = range(self.n_levels)[level]
+        if self.desired_xyz_resolutions is None and level == 0:
+            return self.image, self.xyz_resolution
+
+        level_key = (*self._key, level)
+        cached_level = _pyramid_cache.get(level_key)
+        if cached_level is not None:
+            return cached_level
+
+        if self._disk_cache is not None:
+            stored_level = self._disk_cache.get(level_key)
+            if stored_level is not None:
+                stored_level['image'].setflags(write=False)
+                cached_level = (stored_level['image'], stored_level['xyz_resolution'])
+                _pyramid_cache.put(level_key, cached_level)
+                return cached_level
+
+        if self.desired_xyz_resolutions is None:
+            previous_image, previous_xyz_resolution = self._get_level(level - 1)
+            level_image = downsample_image(previous_image, self.scale_factors, truncate=self.truncate)
+            level_xyz_resolution = previous_xyz_resolution * self.scale_factors
+        else:
+            level_image, level_xyz_resolution = change_resolution_to(self.image, self.xyz_resolution, self.desired_xyz_resolutions[level],
+                truncate=self.truncate, return_true_resolution=True, **self.resample_kwargs)
+            level_xyz_resolution = np.asarray(level_xyz_resolution, dtype=float)
+
+        # Levels are shared between ImagePyramid objects, so they are made read-only.
+        level_image.setflags(write=False)
+        cached_level = (level_image, level_xyz_resolution)
+        _pyramid_cache.put(level_key, cached_level)
+        if self._disk_cache is not None:
+            self._disk_cache.put(level_key, dict(image=level_image, xyz_resolution=level_xyz_resolution))
+        return cached_level
+
+
+    @property
+    def levels(self):
+        """The image at each level, computing any that are not cached."""
+        return [self[level] for level in range(self.n_levels)]
+
+
+    @property
+    def xyz_resolutions(self):
+        """The per-axis resolution of each level, computing any levels that are not cached."""
+        return [self._get_level(level)[1] for level in range(self.n_levels)]
+
+
+    def level_nearest(self, xyz_resolution):
+        """Returns the index of the lowest-resolution level whose resolution is no coarser than xyz_resolution along any axis,
+        or 0 if there is none."""
+
+        xyz_resolution = _validate_scalar_to_multi(xyz_resolution, size=self.image.ndim, dtype=float)
+        suitable_levels = [level for level, level_xyz_resolution in enumerate(self.xyz_resolutions)
+            if np.all(level_xyz_resolution <= xyz_resolution)]
+        return max(suitable_levels) if suitable_levels else 0
+
+
+    @staticmethod
+    def set_cache_limit(max_bytes=None, max_entries=None):
+        """
+        Set the limits on the in-memory cache of levels shared by all ImagePyramid objects,
+        evicting the least recently used levels as necessary.
+
+        Keyword Arguments:
+            max_bytes {int, NoneType} -- The maximum total size of the cached levels. If None, it is unchanged. (default: {None})
+            max_entries {int, NoneType} -- The maximum number of cached levels. If None, it is unchanged. (default: {None})
+        """
+
+        _pyramid_cache.resize(max_bytes=max_bytes, max_entries=max_entries)
+
+
+    @staticmethod
+    def clear_cache():
+        """Remove all levels from the in-memory cache shared by all ImagePyramid objects. On-disk caches are unaffected."""
+
+        _pyramid_cache.clear()
@@ -1,12 +1,38 @@
 import numpy as np
+import torch
 import warnings
+import itertools
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 from ardent.utilities import _validate_scalar_to_multi
 from ardent.utilities import _validate_ndarray
+from ardent.utilities import _resolve_float_dtype
+from ardent.lddmm.transformer import torch_as_tensor
 
 from scipy.interpolate import interpn
+import scipy.fft
+
+def _validate_image(image, backend):
+    """Validate backend and return image as a np.ndarray if backend is 'numpy', without copying it if it is one already, 
+    or as a floating point torch.Tensor if backend is 'torch'. 
+    A torch.Tensor keeps its device, and its dtype if it is floating point, otherwise the default dtype set by set_default_dtype is used."""
+
+    backends = ['numpy', 'torch']
+
+    if backend == 'numpy':
+        return _validate_ndarray(image, copy=False)
+    elif backend == 'torch':
+        if isinstance(image, torch.Tensor):
+            return image if image.is_floating_point() else image.to(getattr(torch, _resolve_float_dtype(None).name))
+        image = np.asarray(image)
+        dtype = getattr(torch, _resolve_float_dtype(image.dtype).name)
+        return torch_as_tensor(image, dtype=dtype, device='cpu')
+    else:
+        raise ValueError(f"backend must be one of {backends}.\n"
+            f"backend: {backend}.")
 
-# TODO: will need one more function to do sinc upsampling for initializing a high res velocity field from a low res.
 
 def _validate_xyz_resolution(ndim, xyz_resolution):
     """Validate xyz_resolution to assure its length matches the dimensionality of image."""
@@ -76,13 +102,98 @@ def _resample(image, real_axes, new_real_coords, **interpn_kwargs):
     return interpn(points=real_axes, values=image, xi=new_real_coords, **interpn_kwargs)
 
 
+def _compute_linear_interpolation_table(axis, new_axis):
+    """
+    Returns the indices of the lower and upper neighbors in axis of each point in new_axis, 
+    and the weight of each upper neighbor, for linear interpolation along a single axis. 
+    axis must be increasing. Points in new_axis outside the bounds of axis are clamped to them, 
+    absorbing floating point error at the edges.
+    """
+
+    axis = np.asarray(axis, float)
+    new_axis = np.clip(np.asarray(new_axis, float), axis[0], axis[-1])
+
+    if len(axis) == 1:
+        # There is nothing to interpolate between.
+        lower_indices = np.zeros(len(new_axis), int)
+        return lower_indices, lower_indices, np.zeros(len(new_axis), float)
+
+    lower_indices = np.clip(np.searchsorted(axis, new_axis, side='right') - 1, 0, len(axis) - 2)
+    upper_indices = lower_indices + 1
+    upper_weights = (new_axis - axis[lower_indices]) / (axis[upper_indices] - axis[lower_indices])
+
+    return lower_indices, upper_indices, upper_weights
+
+
+def _apply_interpolation_tables(image, interpolation_tables, out=None):
+    """
+    Linearly interpolates image one axis at a time using the per-axis interpolation_tables 
+    produced by _compute_linear_interpolation_table. Axes whose table is None are left as they are. 
+    Axes are processed in order of increasing scale so that intermediate arrays are as small as possible. 
+    If out is provided, the last axis is interpolated directly into it and it is returned.
+    """
+
+    # Process the axes that shrink the most first.
+    axis_order = np.argsort([1 if table is None else len(table[0]) / image.shape[axis] 
+        for axis, table in enumerate(interpolation_tables)], kind='stable')
+    axis_order = [axis for axis in axis_order if interpolation_tables[axis] is not None]
+
+    resampled_image = image
+    for axis in axis_order:
+        lower_indices, upper_indices, upper_weights = interpolation_tables[axis]
+        weights_shape = [1] * image.ndim
+        weights_shape[axis] = -1
+        # resampled_image = lower_values + (upper_values - lower_values) * upper_weights, with one temporary.
+        if isinstance(resampled_image, torch.Tensor):
+            device = resampled_image.device
+            lower_values = torch.index_select(resampled_image, axis, torch.as_tensor(lower_indices, device=device))
+            upper_values = torch.index_select(resampled_image, axis, torch.as_tensor(upper_indices, device=device))
+            upper_weights = torch.as_tensor(upper_weights, dtype=resampled_image.dtype, device=device)
+        else:
+            dtype = _resolve_float_dtype(resampled_image.dtype)
+            lower_values = np.take(resampled_image, lower_indices, axis=axis).astype(dtype, copy=False)
+            upper_values = np.take(resampled_image, upper_indices, axis=axis).astype(dtype, copy=False)
+            upper_weights = upper_weights.astype(dtype, copy=False)
+        upper_values -= lower_values
+        upper_values *= upper_weights.reshape(weights_shape)
+        if out is not None and axis == axis_order[-1]:
+            add = torch.add if isinstance(out, torch.Tensor) else np.add
+            resampled_image = add(lower_values, upper_values, out=out)
+        else:
+            lower_values += upper_values
+            resampled_image = lower_values
+
+    if out is not None and resampled_image is not out:
+        # There were no axes to interpolate.
+        out[...] = resampled_image
+        resampled_image = out
+
+    return resampled_image
+
+
+def _resample_separable(image, real_axes, new_real_axes):
+    """
+    Resamples image by linear interpolation, one axis at a time. 
+    real_axes are the coordinates defining the image points along each axis, 
+    new_real_axes are the coordinates along each axis of the grid at which to resample the image.
+
+    This is equivalent to _resample with new_real_coords spanning the grid of new_real_axes, 
+    but never constructs those coordinates.
+    """
+
+    interpolation_tables = [_compute_linear_interpolation_table(axis, new_axis) 
+        for axis, new_axis in zip(real_axes, new_real_axes)]
+
+    return _apply_interpolation_tables(image, interpolation_tables)
+
+
 def _downsample_along_axis(image, axis, scale_factor, truncate=False):
     """Average image along axis across intervals of length scale_factor."""
 
     # Validate arguments.
 
     # Validate image.
-    image = _validate_ndarray(image)
+    image = _validate_ndarray(image, copy=False)
 
     # Validate axis.
     if not isinstance(axis, int):
@@ -122,7 +233,7 @@ def _downsample_along_axis(image, axis, scale_factor, truncate=False):
         
         scaled_shape[axis] = np.floor(scaled_shape[axis])
         scaled_shape = scaled_shape.astype(int)
-        scaled_image = np.zeros(scaled_shape)
+        scaled_image = np.zeros(scaled_shape, _resolve_float_dtype(image.dtype))
 
         excess_shape_on_axis = image.shape[axis] % scale_factor
         # Slice image from np.floor(excess_shape_on_axis / 2) to np.ceil(excess_shape_on_axis / 2) along axis.
@@ -133,7 +244,7 @@ def _downsample_along_axis(image, axis, scale_factor, truncate=False):
         
         scaled_shape[axis] = np.ceil(scaled_shape[axis])
         scaled_shape = scaled_shape.astype(int)
-        scaled_image = np.zeros(scaled_shape)
+        scaled_image = np.zeros(scaled_shape, _resolve_float_dtype(image.dtype))
 
         total_padding = -image.shape[axis] % scale_factor # The difference between image.shape[axis] and the nearest not-smaller multiple of scale_factor.
         on_axis_pad_width = np.array([np.floor(total_padding / 2), np.ceil(total_padding / 2)], int)
@@ -156,7 +267,173 @@ def _downsample_along_axis(image, axis, scale_factor, truncate=False):
     return scaled_image
 
 
-def downsample_image(image, scale_factors, truncate=False):
+def _compute_block_boundaries(axis_length, scale_factor, truncate=False):
+    """
+    Returns the n_blocks + 1 boundaries of the blocks of length scale_factor along an axis of length axis_length, 
+    in the coordinates of that axis. 
+    
+    If truncate, the axis is evenly cropped to a multiple of scale_factor, as by _downsample_along_axis. 
+    Otherwise, it is treated as evenly padded up to a multiple of scale_factor, 
+    and the boundaries are clipped to the real elements, so the edge blocks may be shorter than scale_factor.
+    """
+
+    if truncate:
+        excess = axis_length % scale_factor
+        n_blocks = axis_length // scale_factor
+        return excess // 2 + np.arange(n_blocks + 1) * scale_factor
+    else:
+        total_padding = -axis_length % scale_factor
+        padding_before = total_padding // 2
+        n_blocks = (axis_length + total_padding) // scale_factor
+        return np.clip(np.arange(n_blocks + 1) * scale_factor - padding_before, 0, axis_length)
+
+
+def _average_blocks(region, block_boundaries, scale_factors, full_blocks, dtype):
+    """
+    Average region over the blocks delimited by block_boundaries, which span region exactly along each axis. 
+
+    If full_blocks, every block has the shape scale_factors, and the blocks are summed 
+    over the block axes of a reshaped view. 
+    Otherwise, sums over blocks are taken with np.add.reduceat. 
+    Either way, one axis is reduced at a time, largest reduction first, so that each block is summed in the same order 
+    regardless of the extent of region, and the sums are divided once by the number of elements in each block. 
+    Sums are accumulated into arrays no larger than region divided by the largest scale factor, 
+    in dtype if it is a floating point type, otherwise in the default dtype set by set_default_dtype, and in at least float32. 
+    The result is cast to dtype, rounding if dtype is an integer type.
+    """
+
+    output_shape = tuple(len(boundaries) - 1 for boundaries in block_boundaries)
+    reduction_order = np.argsort(scale_factors, kind='stable')[::-1]
+    accumulation_dtype = np.promote_types(_resolve_float_dtype(dtype), np.float32)
+
+    if region.size == 0 or 0 in output_shape:
+        averaged_region = np.zeros(output_shape, accumulation_dtype)
+    elif full_blocks:
+        # Reshape to (n_0, s_0, n_1, s_1, ...) and sum over the block axes.
+        block_shape = [length for n_blocks, scale_factor in zip(output_shape, scale_factors) for length in (n_blocks, scale_factor)]
+        averaged_region = region.reshape(block_shape)
+        for axis in reduction_order:
+            if scale_factors[axis] > 1:
+                averaged_region = averaged_region.sum(axis=2 * axis + 1, keepdims=True, dtype=accumulation_dtype)
+        averaged_region = averaged_region.reshape(output_shape).astype(accumulation_dtype, copy=False) / int(np.prod(scale_factors))
+    else:
+        # Sum over the blocks along each axis, then correct for block sizes once.
+        averaged_region = region
+        for axis in reduction_order:
+            if scale_factors[axis] > 1:
+                block_starts = block_boundaries[axis][:-1] - block_boundaries[axis][0]
+                averaged_region = np.add.reduceat(averaged_region, block_starts, axis=axis, dtype=accumulation_dtype)
+        averaged_region = averaged_region.astype(accumulation_dtype, copy=False)
+        block_counts = np.ones(output_shape, accumulation_dtype)
+        for axis, boundaries in enumerate(block_boundaries):
+            block_counts = block_counts * np.diff(boundaries).reshape([-1 if dim == axis else 1 for dim in range(region.ndim)])
+        averaged_region = averaged_region / block_counts
+
+    if np.issubdtype(dtype, np.integer):
+        averaged_region = np.rint(averaged_region)
+    return averaged_region.astype(dtype, copy=False)
+
+
+def _downsample_blocks(image, scale_factors, truncate=False, dtype=None, out=None):
+    """
+    Average image over blocks of shape scale_factors, reducing all axes together. 
+    
+    If truncate, image is evenly cropped to a multiple of scale_factors. 
+    Otherwise, image is treated as evenly padded up to a multiple of scale_factors, as by _downsample_along_axis, 
+    but rather than materializing the padding, each block is averaged over only its real elements. 
+    This matches _downsample_along_axis exactly for floating point images.
+
+    If dtype is None, floating point images keep their dtype and other images produce the default dtype set by set_default_dtype. 
+    If out is provided, the result is written into it and it is returned.
+    """
+
+    scale_factors = [int(scale_factor) for scale_factor in scale_factors]
+    dtype = _resolve_float_dtype(image.dtype, dtype)
+
+    block_boundaries = [_compute_block_boundaries(axis_length, scale_factor, truncate) 
+        for axis_length, scale_factor in zip(image.shape, scale_factors)]
+
+    output_shape = tuple(len(boundaries) - 1 for boundaries in block_boundaries)
+    if out is not None and out.shape != output_shape:
+        raise ValueError(f"out must have the shape of the downsampled image.\n"
+            f"out.shape: {out.shape}, expected shape: {output_shape}.")
+
+    full_blocks = all(np.all(np.diff(boundaries) == scale_factor) for boundaries, scale_factor in zip(block_boundaries, scale_factors))
+    region = image[tuple(slice(boundaries[0], boundaries[-1]) for boundaries in block_boundaries)]
+    scaled_image = _average_blocks(region, block_boundaries, scale_factors, full_blocks, dtype)
+
+    if out is None:
+        return scaled_image
+    out[...] = scaled_image
+    return out
+
+
+def _downsample_image_torch(image, scale_factors, truncate=False):
+    """
+    Average image, a floating point torch.Tensor, over blocks of shape scale_factors, one axis at a time, 
+    by summing over a reshaped block axis. Like _downsample_blocks, 
+    each block is averaged over its real elements only.
+    """
+
+    scaled_image = image
+    for axis, scale_factor in enumerate(scale_factors):
+        scale_factor = int(scale_factor)
+        if scale_factor == 1:
+            continue
+        axis_length = scaled_image.shape[axis]
+        counts = None
+        if truncate:
+            excess = axis_length % scale_factor
+            scaled_image = scaled_image.narrow(axis, excess // 2, axis_length - excess)
+        else:
+            total_padding = -axis_length % scale_factor
+            padding_before, padding_after = total_padding // 2, total_padding - total_padding // 2
+            if total_padding:
+                padding_shape = list(scaled_image.shape)
+                padding_shape[axis] = padding_before
+                padding_before_tensor = scaled_image.new_zeros(padding_shape)
+                padding_shape[axis] = padding_after
+                padding_after_tensor = scaled_image.new_zeros(padding_shape)
+                scaled_image = torch.cat([padding_before_tensor, scaled_image, padding_after_tensor], dim=axis)
+            counts = torch.full((scaled_image.shape[axis] // scale_factor,), scale_factor, 
+                dtype=scaled_image.dtype, device=scaled_image.device)
+            counts[0] -= padding_before
+            counts[-1] -= padding_after
+        # Split axis into (n_blocks, scale_factor) and sum over the blocks.
+        shape = list(scaled_image.shape)
+        block_shape = shape[:axis] + [shape[axis] // scale_factor, scale_factor] + shape[axis + 1:]
+        scaled_image = scaled_image.reshape(block_shape).sum(axis + 1)
+        if counts is None:
+            scaled_image /= scale_factor
+        else:
+            counts_shape = [1] * scaled_image.ndim
+            counts_shape[axis] = -1
+            scaled_image /= counts.reshape(counts_shape)
+
+    return scaled_image
+
+
+def _pad_with_mean_torch(image, pad_width, stat_length):
+    """Pad image, a torch.Tensor, as np.pad with mode='mean' would, one axis at a time."""
+
+    padded_image = image
+    for axis, ((before, after), (before_stat_length, after_stat_length)) in enumerate(zip(pad_width, stat_length)):
+        axis_length = padded_image.shape[axis]
+        pieces = [padded_image]
+        if before:
+            before_stat_length = min(before_stat_length, axis_length)
+            before_mean = padded_image.narrow(axis, 0, before_stat_length).mean(axis, keepdim=True)
+            pieces.insert(0, before_mean.expand(*padded_image.shape[:axis], before, *padded_image.shape[axis + 1:]))
+        if after:
+            after_stat_length = min(after_stat_length, axis_length)
+            after_mean = padded_image.narrow(axis, axis_length - after_stat_length, after_stat_length).mean(axis, keepdim=True)
+            pieces.append(after_mean.expand(*padded_image.shape[:axis], after, *padded_image.shape[axis + 1:]))
+        padded_image = torch.cat(pieces, dim=axis)
+
+    return padded_image
+
+
+def downsample_image(image, scale_factors, truncate=False, backend='numpy', dtype=None, out=None):
     """
     Downsample an image by averaging.
     
@@ -166,18 +443,24 @@ def downsample_image(image, scale_factors, truncate=False):
     
     Keyword Arguments:
         truncate {bool} -- If True, evenly truncates the image down to the nearest multiple of the scale_factor for each axis. (default: {False})
+        backend {str} -- Either 'numpy' or 'torch'. If 'torch', <image> may be a torch.Tensor, 
+            the work is done in torch on its device, and a torch.Tensor is returned. (default: {'numpy'})
+        dtype {type, NoneType} -- The dtype of the result, rounded to if it is an integer type. 
+            If None, floating point images keep their dtype and other images produce the default dtype set by set_default_dtype. Ignored if backend is 'torch'. (default: {None})
+        out {np.ndarray, NoneType} -- If provided, the result is written into <out>, which is returned. Ignored if backend is 'torch'. (default: {None})
     
     Raises:
         ValueError: Raised if any of scale_factors is less than 1.
+        ValueError: Raised if <out> does not have the shape of the result.
     
     Returns:
-        np.ndarray -- A downsampled copy of <image>.
+        np.ndarray, torch.Tensor -- A downsampled copy of <image>.
     """
     
     # Validate arguments.
 
-    # Validate image.
-    image = _validate_ndarray(image)
+    # Validate image and backend.
+    image = _validate_image(image, backend)
 
     # Validate scale_factors.
     scale_factors = _validate_scalar_to_multi(scale_factors, image.ndim, int)
@@ -186,16 +469,12 @@ def downsample_image(image, scale_factors, truncate=False):
         raise ValueError(f"Every element of scale_factors must be at least 1.\n"
             f"np.min(scale_factors): {np.min(scale_factors)}.")
 
-    # Downsample a copy of image by averaging.
+    if backend == 'torch':
+        return _downsample_image_torch(image, scale_factors, truncate)
 
-    scaled_image = np.copy(image) # Not necessary since _downsample_along_axis does not mutate.
-
-    # Downsample image along each dimension.
-    for dim, scale_factor in enumerate(scale_factors):
-        scaled_image = _downsample_along_axis(scaled_image, dim, scale_factor, truncate) # Side effect: breaks alias.
-    
-    return scaled_image
+    # Downsample image by averaging over blocks along all dimensions together.
 
+    return _downsample_blocks(image, scale_factors, truncate=truncate, dtype=dtype, out=out)
 
     """
     Resamples image as close as possible to the desired_xyz_resolution. 
@@ -210,9 +489,320 @@ def downsample_image(image, scale_factors, truncate=False):
 
     truncate is used in downsample_image.
     """
+
+def _compute_tile_shape(output_shape, scale_factors, itemsize, max_block_bytes):
+    """
+    Returns the shape in output voxels of the tiles processed by downsample_image_blockwise, 
+    splitting the leading axes first so that each tile reads contiguous slabs of a C-ordered input, 
+    until the input spanned by a tile, at itemsize bytes per element, fits in max_block_bytes.
+    """
+
+    tile_shape = list(output_shape)
+    for axis in range(len(tile_shape)):
+        tile_nbytes = int(np.prod(np.multiply(tile_shape, scale_factors), dtype=np.int64)) * itemsize
+        if tile_nbytes <= max_block_bytes:
+            break
+        slab_nbytes = tile_nbytes // (tile_shape[axis] * scale_factors[axis])
+        tile_shape[axis] = int(max(1, max_block_bytes // (slab_nbytes * scale_factors[axis])))
+    return tuple(tile_shape)
+
+
+def downsample_image_blockwise(image, scale_factors, truncate=False, dtype=None, out=None, mmap_path=None, 
+max_block_bytes=2**27, n_workers=None):
+    """
+    Downsample an image by averaging, one block at a time, for images too large to hold in memory. 
+    The output is divided into tiles, and each tile reads only the region of <image> it averages over, 
+    aligned to the blocks of shape scale_factors, so <image> may be a np.memmap or an ardent.io.ChunkedImage. 
+    Tiles are processed in parallel by a pool of threads and written into <out>, 
+    and the result is identical to downsample_image.
+    
+    Arguments:
+        image {np.ndarray, np.memmap, ChunkedImage} -- The image to be downsampled. 
+            Any array-like with shape and dtype attributes that supports indexing by a tuple of slices.
+        scale_factors {int, sequence} -- The per-axis factor by which to reduce the image size.
+    
+    Keyword Arguments:
+        truncate {bool} -- If True, evenly truncates the image down to the nearest multiple of the scale_factor for each axis. (default: {False})
+        dtype {type, NoneType} -- The dtype of the result, rounded to if it is an integer type. 
+            If None, floating point images keep their dtype and other images produce the default dtype set by set_default_dtype. (default: {None})
+        out {np.ndarray, np.memmap, ChunkedImage, NoneType} -- If provided, the result is written into <out>, which is returned. (default: {None})
+        mmap_path {str, Path, NoneType} -- If provided and <out> is None, the result is written to a memory-mapped .npy file at this path. (default: {None})
+        max_block_bytes {int} -- The approximate maximum number of bytes of <image> read by each tile, 
+            counting each element as at least the size of the floating point dtype sums are accumulated in. 
+            Each worker holds about twice this much in memory. (default: {2**27})
+        n_workers {int, NoneType} -- The number of threads processing tiles. If None, the ThreadPoolExecutor default is used. (default: {None})
+    
+    Raises:
+        ValueError: Raised if any of scale_factors is less than 1.
+        ValueError: Raised if <out> does not have the shape of the result.
+    
+    Returns:
+        np.ndarray, np.memmap, ChunkedImage -- The downsampled image, <out> if it was provided.
+    """
+
+    # Validate scale_factors.
+    scale_factors = _validate_scalar_to_multi(scale_factors, len(image.shape), int)
+    # Verify that all scale_factors are at least 1.
+    if np.any(scale_factors < 1):
+        raise ValueError(f"Every element of scale_factors must be at least 1.\n"
+            f"np.min(scale_factors): {np.min(scale_factors)}.")
+    scale_factors = [int(scale_factor) for scale_factor in scale_factors]
+
+    dtype = _resolve_float_dtype(image.dtype, dtype)
+
+    # Compute the blocks over the whole image, as _downsample_blocks does, so that every tile averages exactly the same elements.
+    block_boundaries = [_compute_block_boundaries(axis_length, scale_factor, truncate) 
+        for axis_length, scale_factor in zip(image.shape, scale_factors)]
+    full_blocks = all(np.all(np.diff(boundaries) == scale_factor) for boundaries, scale_factor in zip(block_boundaries, scale_factors))
+    output_shape = tuple(len(boundaries) - 1 for boundaries in block_boundaries)
+
+    # Preallocate the result.
+    if out is None:
+        if mmap_path is not None:
+            out = np.lib.format.open_memmap(Path(mmap_path).expanduser().with_suffix('.npy'), mode='w+', dtype=dtype, shape=output_shape)
+        else:
+            out = np.empty(output_shape, dtype=dtype)
+    elif tuple(out.shape) != output_shape:
+        raise ValueError(f"out must have the shape of the downsampled image.\n"
+            f"out.shape: {out.shape}, expected shape: {output_shape}.")
+
+    # Writes into stores other than np.ndarray, such as the chunks of a ChunkedImage, may overlap between tiles.
+    write_lock = None if isinstance(out, np.ndarray) else threading.Lock()
+
+    # Sums are accumulated as in _average_blocks.
+    itemsize = max(image.dtype.itemsize, np.promote_types(_resolve_float_dtype(dtype), np.float32).itemsize)
+    tile_shape = _compute_tile_shape(output_shape, scale_factors, itemsize, max_block_bytes)
+    tile_starts = itertools.product(*[range(0, output_length, max(1, tile_length)) 
+        for output_length, tile_length in zip(output_shape, tile_shape)])
+
+    def _downsample_tile(tile_start):
+        """Read the region of image averaged over by the tile at tile_start, average it, and write it into out."""
+
+        output_slices = tuple(slice(start, min(start + length, output_length)) 
+            for start, length, output_length in zip(tile_start, tile_shape, output_shape))
+        tile_boundaries = [boundaries[output_slice.start:output_slice.stop + 1] 
+            for boundaries, output_slice in zip(block_boundaries, output_slices)]
+        # Copy the region into a C-ordered array so that it is averaged in the same order as the whole image would be.
+        region = np.ascontiguousarray(image[tuple(slice(boundaries[0], boundaries[-1]) for boundaries in tile_boundaries)])
+        scaled_tile = _average_blocks(region, tile_boundaries, scale_factors, full_blocks, dtype)
+        if write_lock is None:
+            out[output_slices] = scaled_tile
+        else:
+            with write_lock:
+                out[output_slices] = scaled_tile
+
+    if 0 not in output_shape:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            # Consume the results to propagate any exceptions.
+            list(executor.map(_downsample_tile, tile_starts))
+
+    if isinstance(out, np.memmap):
+        out.flush()
+
+    return out
+
+
+class ResamplingPlan():
+    """
+    The geometry of resampling images of a given shape and resolution as close as possible to a desired resolution, 
+    as change_resolution_to does: the padding, the downsampling scale factors, the true resolution, 
+    and the per-axis linear interpolation tables, or the coordinates at which to interpolate for other methods. 
+    These are computed once on construction, so that apply costs only the padding, averaging, and interpolation work, 
+    for many images of the same shape or a stacked batch of them.
+    """
+
+    def __init__(self, shape, xyz_resolution, desired_xyz_resolution, 
+    pad_to_match_res=True, err_to_higher_res=True, average_on_downsample=True, truncate=False, **resample_kwargs):
+        """
+        Arguments:
+            shape {sequence} -- The shape of the images to be resampled, allowing arbitrary dimensions.
+            xyz_resolution {float, sequence} -- The per-axis resolution of the images.
+            desired_xyz_resolution {float, sequence} -- The desired per-axis resolution of the images after resampling.
+        
+        Keyword Arguments:
+            pad_to_match_res {bool} -- If True, pads a copy of each image to guarantee that <desired_xyz_resolution> is achieved. (default: {True})
+            err_to_higher_res {bool} -- If True and <pad_to_match_res> is False, rounds the shape of the new images up rather than down. (default: {True})
+            average_on_downsample {bool} -- If True, performs downsample_image on a copy of each image before resampling to prevent aliasing. 
+                It scales the images by the largest integer possible along each axis without reducing the resolution past the final resolution. (default: {True})
+            truncate {bool} -- A kwarg passed to downsample_image. If true, evenly truncates the images down to the nearest multiple of the scale_factor for each axis. (default: {False})
+            resample_kwargs -- Passed to scipy.interpolate.interpn unless they specify only linear interpolation, 
+                in which case the images are interpolated one axis at a time.
+        """
+
+        self.shape = tuple(int(length) for length in shape)
+        ndim = len(self.shape)
+        self.resample_kwargs = resample_kwargs
+        self.separable = not resample_kwargs or resample_kwargs == {'method':'linear'}
+        self.truncate = truncate
+
+        # Validate resolutions.
+        xyz_resolution = _validate_xyz_resolution(ndim, xyz_resolution)
+        desired_xyz_resolution = _validate_xyz_resolution(ndim, desired_xyz_resolution)
+
+        # Compute new_shape, and consequently true_resolution, after resampling.
+
+        # image.shape * xyz_resolution == new_shape * new_xyz_resolution
+        new_shape = np.multiply(self.shape, xyz_resolution) / desired_xyz_resolution
+
+        if pad_to_match_res:
+            # Guarantee realization of desired_xyz_resolution at the possible expense of maintaining the true shape (shape * resolution).
+            new_shape = np.ceil(new_shape)
+            # Pad image evenly until image.shape * xyz_resolution >= new_shape * desired_xyz_resolution.
+            minimum_image_padding = np.ceil((new_shape * desired_xyz_resolution - np.multiply(self.shape, xyz_resolution)) / xyz_resolution)
+            self.pad_width = np.array(list(zip(np.ceil(minimum_image_padding / 2), np.ceil(minimum_image_padding / 2))), int)
+            old_true_shape = xyz_resolution * self.shape
+            new_true_shape = desired_xyz_resolution * new_shape
+            stat_length = np.maximum(1, np.ceil((desired_xyz_resolution - ((new_true_shape - old_true_shape) / 2)) / xyz_resolution)).astype(int)
+            self.stat_length = np.broadcast_to(stat_length, self.pad_width.T.shape).T
+            padded_shape = np.add(self.shape, self.pad_width.sum(axis=1))
+            # true_resolution has been guaranteed to equal desired_xyz_resolution.
+            self.true_resolution = desired_xyz_resolution
+        else:
+            self.pad_width = None
+            self.stat_length = None
+            padded_shape = np.array(self.shape)
+            # Guarantee the true shape (shape * resolution) is maintained at the possible expense of achieving desired_xyz_resolution.
+            if err_to_higher_res:
+                # Round resolution up.
+                new_shape = np.ceil(new_shape)
+            else:
+                # Round resolution down.
+                new_shape = np.floor(new_shape)
+            # Compute the achieved resultant resolution, or true_resolution.
+            self.true_resolution = np.multiply(self.shape, xyz_resolution) / new_shape
+            # Warn the user if desired_xyz_resolution cannot be produced from image and xyz_resolution.
+            if not np.array_equal(new_shape, np.multiply(self.shape, xyz_resolution) / desired_xyz_resolution):
+                warnings.warn(message=f"Could not exactly produce the desired_xyz_resolution.\n"
+                    f"xyz_resolution {xyz_resolution}.\n"
+                    f"desired_xyz_resolution: {desired_xyz_resolution}.\n"
+                    f"true_resolution: {self.true_resolution}.", category=RuntimeWarning)
+
+        # Average if appropriate before resampling to lower resolution.
+
+        if average_on_downsample:
+            # Check resampling scales.
+            downsampling_scale_factors = np.divide(padded_shape, new_shape).astype(int)
+            # downsampling_scale_factors[dim] is the maximum of 1 or factor by which resolution[dim] is multiplied.
+            self.downsampling_scale_factors = np.maximum(
+                np.ones_like(downsampling_scale_factors, dtype=int), downsampling_scale_factors)
+            downsampled_shape = np.array([len(_compute_block_boundaries(axis_length, scale_factor, truncate)) - 1 
+                for axis_length, scale_factor in zip(padded_shape, self.downsampling_scale_factors)])
+            # Update xyz_resolution.
+            xyz_resolution = xyz_resolution * self.downsampling_scale_factors
+        else:
+            self.downsampling_scale_factors = None
+            downsampled_shape = padded_shape
+
+        # Compute real_axes and new_real_axes.
+
+        self.real_axes = _compute_axes(downsampled_shape, xyz_resolution)
+        # new_shape is recalculated assuming the image shape is 1 less than it really is along each dimension, 
+        # with 1 added at the end. This is to account for interpn's coordinate interpretation of voxels, 
+        # to ensure that new_real_axes all lie within the bounds of real_axes, but as close to filling them as possible.
+        real_scales = np.divide(new_shape, downsampled_shape)
+        new_shape = np.floor(np.multiply(np.subtract(downsampled_shape, 1), real_scales)) + 1
+        self.new_shape = tuple(new_shape.astype(int))
+        self.new_real_axes = _compute_axes(new_shape, self.true_resolution)
+
+        if self.separable:
+            self.interpolation_tables = [_compute_linear_interpolation_table(axis, new_axis) 
+                for axis, new_axis in zip(self.real_axes, self.new_real_axes)]
+        else:
+            self.interpolation_tables = None
+        # The full coordinate mesh is only computed for methods other than linear interpolation, on first use.
+        self._new_real_coords = None
+
+
+    def apply(self, image, backend='numpy', out=None):
+        """
+        Resample <image>, or each image in a stack of images, according to this plan.
+        
+        Arguments:
+            image {np.ndarray, torch.Tensor} -- An image of shape <shape>, 
+                or a batch of images of shape (n_images, *<shape>), stacked along a new first axis.
+        
+        Keyword Arguments:
+            backend {str} -- Either 'numpy' or 'torch'. If 'torch', <image> may be a torch.Tensor, 
+                the work is done in torch on its device, and a torch.Tensor is returned. Only linear interpolation is supported. (default: {'numpy'})
+            out {np.ndarray, torch.Tensor, NoneType} -- If provided, the result is written into <out>, which is returned. 
+                With linear interpolation, the last interpolation is performed directly into <out>. (default: {None})
+        
+        Raises:
+            ValueError: Raised if backend is 'torch' and this plan does not use linear interpolation.
+            ValueError: Raised if the shape of <image> is neither <shape> nor (n_images, *<shape>).
+            ValueError: Raised if <out> does not have the shape of the result.
+        
+        Returns:
+            np.ndarray, torch.Tensor -- A resampled copy of <image>, or <out>.
+        """
+
+        # Validate arguments.
+
+        # Validate image and backend.
+        image = _validate_image(image, backend)
+        if backend == 'torch' and not self.separable:
+            raise ValueError(f"backend='torch' supports only linear interpolation, without further resample_kwargs.\n"
+                f"resample_kwargs: {self.resample_kwargs}.")
+
+        # Validate shape.
+        if tuple(image.shape) == self.shape:
+            batched = False
+        elif tuple(image.shape[1:]) == self.shape:
+            batched = True
+        else:
+            raise ValueError(f"image must have the shape of this plan, optionally preceded by a batch axis.\n"
+                f"image.shape: {tuple(image.shape)}, shape: {self.shape}.")
+
+        # Validate out.
+        output_shape = tuple(image.shape[:1]) * batched + self.new_shape
+        if out is not None and tuple(out.shape) != output_shape:
+            raise ValueError(f"out must have the shape of the resampled image.\n"
+                f"out.shape: {tuple(out.shape)}, expected shape: {output_shape}.")
+
+        # The batch axis, if present, is neither padded, averaged, nor interpolated.
+        batch_padding = [[0, 0]] if batched else []
+        batch_scale_factors = [1] if batched else []
+
+        # Pad image if appropriate.
+        if self.pad_width is not None:
+            pad_width = np.array(batch_padding + self.pad_width.tolist(), int)
+            stat_length = np.array([[1, 1]] * batched + self.stat_length.tolist(), int)
+            if backend == 'torch':
+                image = _pad_with_mean_torch(image, pad_width=pad_width, stat_length=stat_length)
+            else:
+                image = np.pad(image, pad_width=pad_width, mode='mean', stat_length=stat_length)
+
+        # Average if appropriate before resampling to lower resolution.
+        if self.downsampling_scale_factors is not None:
+            scale_factors = batch_scale_factors + self.downsampling_scale_factors.tolist()
+            image = downsample_image(image, scale_factors, truncate=self.truncate, backend=backend)
+
+        # Perform resampling.
+
+        if self.separable:
+            # Interpolate linearly one axis at a time, without constructing a full coordinate mesh.
+            interpolation_tables = [None] * batched + self.interpolation_tables
+            return _apply_interpolation_tables(image, interpolation_tables, out=out)
+        else:
+            if self._new_real_coords is None:
+                self._new_real_coords = _compute_coords(self.new_shape, self.true_resolution)
+            # interpn produces float64 from non-floating point images.
+            image = image.astype(_resolve_float_dtype(image.dtype), copy=False)
+            if batched:
+                # interpn interpolates trailing axes of values together, so move the batch axis last and back.
+                resampled_images = _resample(np.moveaxis(image, 0, -1), self.real_axes, self._new_real_coords, **self.resample_kwargs)
+                resampled_image = np.moveaxis(resampled_images, -1, 0)
+            else:
+                resampled_image = _resample(image, self.real_axes, self._new_real_coords, **self.resample_kwargs)
+            if out is None:
+                return resampled_image
+            out[...] = resampled_image
+            return out
+
+
 def change_resolution_to(image, xyz_resolution, desired_xyz_resolution, 
 pad_to_match_res=True, err_to_higher_res=True, average_on_downsample=True, 
-truncate=False, return_true_resolution=False, **resample_kwargs):
+truncate=False, return_true_resolution=False, backend='numpy', out=None, **resample_kwargs):
     """
     Resamples <image> to get its resolution as close as possible to <desired_xyz_resolution>.
     
@@ -228,93 +818,36 @@ truncate=False, return_true_resolution=False, **resample_kwargs):
             It scales the image by the largest integer possible along each axis without reducing the resolution past the final resolution. (default: {True})
         truncate {bool} -- A kwarg passed to downsample_image. If true, evenly truncates the image down to the nearest multiple of the scale_factor for each axis. (default: {False})
         return_true_resolution {bool} -- If True, rather than just returning the resampled image, returns a tuple containing the resampled image and its actual resolution. (default: {False})
+        backend {str} -- Either 'numpy' or 'torch'. If 'torch', <image> may be a torch.Tensor, 
+            the work is done in torch on its device, and a torch.Tensor is returned. Only linear interpolation is supported. (default: {'numpy'})
+        out {np.ndarray, torch.Tensor, NoneType} -- If provided, the resampled image is written into <out> rather than a new array, as by ResamplingPlan.apply. (default: {None})
     
     Returns:
-        np.ndarray, tuple -- A resampled copy of <image>. 
+        np.ndarray, torch.Tensor, tuple -- A resampled copy of <image>. 
             If <return_true_resolution> was provided as True, then the return value is a tuple containing the resampled copy of <image> and its actual resolution.
     """
 
     # Validate arguments.
 
-    # Validate image.
-    image = _validate_ndarray(image)
+    # Validate image and backend.
+    image = _validate_image(image, backend)
 
-    # Validate resolutions.
-    xyz_resolution = _validate_xyz_resolution(image.ndim, xyz_resolution)
-    desired_xyz_resolution = _validate_xyz_resolution(image.ndim, desired_xyz_resolution)
-
-    # Compute new_shape, and consequently true_resolution, after resampling.
-
-    # image.shape * xyz_resolution == new_shape * new_xyz_resolution
-    new_shape = image.shape * xyz_resolution / desired_xyz_resolution
-
-    if pad_to_match_res:
-        # Guarantee realization of desired_xyz_resolution at the possible expense of maintaining the true shape (shape * resolution).
-        new_shape = np.ceil(new_shape)
-        # Pad image evenly until image.shape * xyz_resolution >= new_shape * desired_xyz_resolution.
-        minimum_image_padding = np.ceil((new_shape * desired_xyz_resolution - image.shape * xyz_resolution) / xyz_resolution)
-        pad_width = np.array(list(zip(np.ceil(minimum_image_padding / 2), np.ceil(minimum_image_padding / 2))), int)
-        old_true_shape = xyz_resolution * image.shape
-        new_true_shape = desired_xyz_resolution * new_shape
-        stat_length = np.maximum(1, np.ceil((desired_xyz_resolution - ((new_true_shape - old_true_shape) / 2)) / xyz_resolution)).astype(int)
-        stat_length = np.broadcast_to(stat_length, pad_width.T.shape).T
-        image = np.pad(image, pad_width=pad_width, mode='mean', stat_length=stat_length)
-        # true_resolution has been guaranteed to equal desired_xyz_resolution.
-        true_resolution = desired_xyz_resolution
-    else:
-        # Guarantee the true shape (shape * resolution) is maintained at the possible expense of achieving desired_xyz_resolution.
-        if err_to_higher_res:
-            # Round resolution up.
-            new_shape = np.ceil(new_shape)
-        else:
-            # Round resolution down.
-            new_shape = np.floor(new_shape)
-        # Compute the achieved resultant resolution, or true_resolution.
-        true_resolution = image.shape * xyz_resolution / new_shape
-        # Warn the user if desired_xyz_resolution cannot be produced from image and xyz_resolution.
-        if not np.array_equal(new_shape, image.shape * xyz_resolution / desired_xyz_resolution):
-            warnings.warn(message=f"Could not exactly produce the desired_xyz_resolution.\n"
-                f"xyz_resolution {xyz_resolution}.\n"
-                f"desired_xyz_resolution: {desired_xyz_resolution}.\n"
-                f"true_resolution: {true_resolution}.", category=RuntimeWarning)
-
-    # Average if appropriate before resampling to lower resolution.
-
-    if average_on_downsample:
-        # Check resampling scales.
-        downsampling_scale_factors = np.divide(image.shape, new_shape).astype(int)
-        # downsampling_scale_factors[dim] is the maximum of 1 or factor by which resolution[dim] is multiplied.
-        downsampling_scale_factors = np.maximum(
-            np.ones_like(downsampling_scale_factors, dtype=int), downsampling_scale_factors)
-        
-        # Perform downsampling.
-        image = downsample_image(image, downsampling_scale_factors, truncate=truncate)
-        # Update xyz_resolution.
-        xyz_resolution *= downsampling_scale_factors
-
-    # Compute real_axes and new_real_coords.
-
-    real_axes = _compute_axes(image.shape, xyz_resolution)
-    # new_shape is recalculated assuming the image shape is 1 less than it really is along each dimension, 
-    # with 1 added at the end. This is to account for interpn's coordinate interpretation of voxels, 
-    # to ensure that new_real_coords all lie within the bounds of real_axes, but as close to filling them as possible.
-    real_scales = np.divide(new_shape, image.shape)
-    new_shape = np.floor(np.multiply(np.subtract(image.shape, 1), real_scales)) + 1
-    new_real_coords = _compute_coords(new_shape, true_resolution)
+    # Compute the geometry of the resampling, then resample image.
 
-    # Perform resampling.
-
-    resampled_image = _resample(image, real_axes, new_real_coords, **resample_kwargs)
+    plan = ResamplingPlan(image.shape, xyz_resolution, desired_xyz_resolution, 
+        pad_to_match_res=pad_to_match_res, err_to_higher_res=err_to_higher_res, 
+        average_on_downsample=average_on_downsample, truncate=truncate, **resample_kwargs)
+    resampled_image = plan.apply(image, backend=backend, out=out)
 
     if return_true_resolution:
-        return resampled_image, true_resolution
+        return resampled_image, plan.true_resolution
     else:
         return resampled_image
 
     
 def change_resolution_by(image, xyz_scales, xyz_resolution=1, 
 pad_to_match_res=True, err_to_higher_res=True, average_on_downsample=True, 
-truncate=False, return_true_resolution=False, **resample_kwargs):
+truncate=False, return_true_resolution=False, backend='numpy', out=None, **resample_kwargs):
     """
     Resample image such that its resolution is scaled by 1 / <xyz_scales>[dim] or abs(xyz_scales[dim]) if xyz_scales[dim] is negative, in each dimension dim.
 
@@ -342,16 +875,18 @@ truncate=False, return_true_resolution=False, **resample_kwargs):
             It scales the image by the largest integer possible along each axis without reducing the resolution past the final resolution. (default: {True})
         truncate {bool} -- A kwarg passed to downsample_image. If true, evenly truncates the image down to the nearest multiple of the scale_factor for each axis. (default: {False})
         return_true_resolution {bool} -- If True, rather than just returning the resampled image, returns a tuple containing the resampled image and its actual resolution. (default: {False})
+        backend {str} -- Either 'numpy' or 'torch', passed to change_resolution_to. (default: {'numpy'})
+        out {np.ndarray, torch.Tensor, NoneType} -- If provided, the resampled image is written into <out>, passed to change_resolution_to. (default: {None})
     
     Returns:
-        np.ndarray, tuple -- A resampled copy of <image>. 
+        np.ndarray, torch.Tensor, tuple -- A resampled copy of <image>. 
             If <return_true_resolution> was provided as True, then the return value is a tuple containing the resampled copy of <image> and its actual resolution.
     """
 
     # Validate arguments.
 
-    # Validate image.
-    image = _validate_ndarray(image)
+    # Validate image and backend.
+    image = _validate_image(image, backend)
 
     # Validate xyz_scales.
     xyz_scales = _validate_scalar_to_multi(xyz_scales, size=image.ndim)
@@ -374,11 +909,144 @@ truncate=False, return_true_resolution=False, **resample_kwargs):
         average_on_downsample=average_on_downsample,
         truncate=truncate,
         return_true_resolution=return_true_resolution,
+        backend=backend,
+        out=out,
         **resample_kwargs
     )
 
     return change_resolution_to(**change_resolution_to_kwargs)
 
+
+
+def _resize_spectrum(spectrum, axis, length, new_length, onesided):
+    """
+    Zero-pad or crop spectrum along axis, the FFT of a signal of the given length along that axis, 
+    to the FFT of a signal of new_length, keeping the lowest frequencies. 
+    If onesided, spectrum is the output of a real FFT along axis, holding only the non-negative frequencies. 
+    As in scipy.signal.resample, a Nyquist component of an even length is split evenly 
+    between the positive and negative frequencies when padding, and combined from them when cropping.
+    """
+
+    def _index(index):
+        """Returns an index into axis."""
+        return (slice(None),) * axis + (index,)
+
+    common_length = min(length, new_length)
+    new_shape = list(spectrum.shape)
+    new_shape[axis] = new_length // 2 + 1 if onesided else new_length
+    resized_spectrum = np.zeros(new_shape, spectrum.dtype)
+
+    # Copy the non-negative frequencies, including the Nyquist frequency of common_length if it is even.
+    n_nonnegative = common_length // 2 + 1
+    resized_spectrum[_index(slice(0, n_nonnegative))] = spectrum[_index(slice(0, n_nonnegative))]
+    # Copy the negative frequencies.
+    n_negative = common_length - n_nonnegative
+    if not onesided and n_negative > 0:
+        resized_spectrum[_index(slice(-n_negative, None))] = spectrum[_index(slice(-n_negative, None))]
+
+    # Reconcile the Nyquist component.
+    if common_length % 2 == 0 and length != new_length:
+        nyquist_index = _index(common_length // 2)
+        if new_length < length:
+            # Combine the positive and negative frequencies of the input into the Nyquist frequency of the output.
+            if onesided:
+                resized_spectrum[nyquist_index] *= 2
+            else:
+                resized_spectrum[nyquist_index] += spectrum[_index(-(common_length // 2))]
+        else:
+            # Split the Nyquist frequency of the input evenly between the positive and negative frequencies of the output.
+            resized_spectrum[nyquist_index] *= 0.5
+            if not onesided:
+                resized_spectrum[_index(-(common_length // 2))] = resized_spectrum[nyquist_index]
+
+    return resized_spectrum
+
+
+def fourier_resample(image, new_shape, axes=None, origin='center', workers=None):
+    """
+    Resample <image> to <new_shape> by zero-padding or cropping its spectrum, i.e. by sinc interpolation. 
+    This is exact for band-limited images, treating them as periodic, 
+    and suits smooth fields such as velocity fields and bias fields, which linear interpolation would blur. 
+    The new samples span the same extent as the old, so the resolution along each axis is scaled by its old length over its new length.
+    
+    Arguments:
+        image {np.ndarray} -- The image to be resampled, real or complex.
+        new_shape {sequence} -- The new length of each of <axes>.
+    
+    Keyword Arguments:
+        axes {sequence, NoneType} -- The axes to be resampled. If None, all axes are resampled. 
+            For example, a Transformer velocity field of shape (nt, 3, nx, ny, nz) is resampled spatially with axes=(2, 3, 4). (default: {None})
+        origin {str} -- Either 'center' or 'zero', as in _compute_axes. If 'center', the old and new samples are centered on the same point, 
+            matching the grids of change_resolution_to and Transformer. If 'zero', the first old and new samples coincide. (default: {'center'})
+        workers {int, NoneType} -- The number of threads used by scipy.fft. If None, a single thread is used. (default: {None})
+    
+    Raises:
+        ValueError: Raised if new_shape does not have the same length as axes.
+        ValueError: Raised if any of new_shape is less than 1.
+        NotImplementedError: Raised if origin is not one of the supported values.
+    
+    Returns:
+        np.ndarray -- A resampled copy of <image>, of the same dtype if it is floating point or complex, 
+            and the default dtype set by set_default_dtype otherwise.
+    """
+
+    # Validate arguments.
+
+    # Validate image.
+    image = _validate_ndarray(image, copy=False)
+    if not np.issubdtype(image.dtype, np.inexact):
+        image = image.astype(_resolve_float_dtype(image.dtype))
+
+    # Validate axes and new_shape.
+    axes = list(range(image.ndim)) if axes is None else [axis % image.ndim for axis in axes]
+    new_shape = _validate_ndarray(new_shape, dtype=int, required_ndim=1)
+    if len(new_shape) != len(axes):
+        raise ValueError(f"new_shape must have a length for each of axes.\n"
+            f"len(new_shape): {len(new_shape)}, len(axes): {len(axes)}.")
+    if np.any(new_shape < 1):
+        raise ValueError(f"Every element of new_shape must be at least 1.\n"
+            f"np.min(new_shape): {np.min(new_shape)}.")
+
+    # Validate origin.
+    origins = ['center', 'zero']
+    if origin not in origins:
+        raise NotImplementedError(f"origin must be one of these supported values: {origins}.\n"
+            f"origin: {origin}.")
+
+    # Resample.
+
+    lengths = [image.shape[axis] for axis in axes]
+    complex_image = np.iscomplexobj(image)
+
+    # Transform, with a real FFT along the last of axes for real images.
+    if complex_image:
+        spectrum = scipy.fft.fftn(image, axes=axes, workers=workers)
+    else:
+        spectrum = scipy.fft.rfftn(image, axes=axes, workers=workers)
+
+    for axis_index, (axis, length, new_length) in enumerate(zip(axes, lengths, new_shape)):
+        if length == new_length:
+            continue
+        onesided = not complex_image and axis_index == len(axes) - 1
+        spectrum = _resize_spectrum(spectrum, axis, length, new_length, onesided)
+        if origin == 'center':
+            # Shift by half the difference between the old and new spacings, in old samples, 
+            # so that the new samples are centered on the same point as the old.
+            shift = (length / new_length - 1) / 2
+            frequencies = (scipy.fft.rfftfreq(new_length) if onesided else scipy.fft.fftfreq(new_length)) * new_length / length
+            phases_shape = [1] * spectrum.ndim
+            phases_shape[axis] = -1
+            spectrum *= np.exp(2j * np.pi * frequencies * shift).astype(spectrum.dtype).reshape(phases_shape)
+
+    # Invert, scaling to preserve amplitudes.
+    if complex_image:
+        resampled_image = scipy.fft.ifftn(spectrum, s=new_shape, axes=axes, workers=workers)
+    else:
+        resampled_image = scipy.fft.irfftn(spectrum, s=new_shape, axes=axes, workers=workers)
+    resampled_image *= np.prod(np.divide(new_shape, lengths))
+
+    return resampled_image.astype(image.dtype, copy=False)
+
 # TODO: reconcile use of scipy.interpolate.interpn vs scipy.misc.resize & skimage.transform.downscale_local_mean.
 
 # TODO: isolate negative scale conversion into its own function.
@@ -0,0 +1,272 @@
+import numpy as np
+from scipy.special import ndtri
+
+"""
+Allocation-light statistics of large arrays, including np.memmap objects.
+Data is read in slabs along its first axis, so temporaries are bounded by the slab size rather than the size of the data.
+"""
+
+_slab_bytes = 2**22
+# Keys and masks take several times the memory of the values they are computed from, so they are computed over smaller slabs.
+_key_slab_bytes = 2**19
+_sign_bit = np.uint64(1 << 63)
+
+
+def _iterate_slabs(data, slab_bytes=_slab_bytes):
+    """Yields consecutive slabs of data along its first axis, each of about slab_bytes once cast to float64, 
+    in which statistics are computed, as views where possible. 0-dimensional data is yielded as a 1-element array."""
+
+    if data.ndim == 0:
+        yield data.reshape(1)
+        return
+
+    slab_length = max(1, slab_bytes // max(1, data[:1].size * max(data.dtype.itemsize, 8)))
+    for start in range(0, data.shape[0], slab_length):
+        yield data[start:start + slab_length]
+
+
+def _to_keys(values):
+    """Returns uint64 keys of values as float64 whose order matches the order of values, by flipping sign bits."""
+
+    bits = np.ascontiguousarray(values, dtype=np.float64).reshape(-1).view(np.uint64)
+    return np.where(bits & _sign_bit, ~bits, bits | _sign_bit)
+
+
+def _from_key(key):
+    """Returns the float64 value of a key produced by _to_keys."""
+
+    key = np.uint64(key)
+    bits = key & ~_sign_bit if key & _sign_bit else ~key
+    return float(np.array(bits, dtype=np.uint64).view(np.float64))
+
+
+def _select_ranks(data, ranks, bins=2**12, max_candidates=2**18):
+    """
+    Returns the values at each of ranks in data sorted, as float64, without sorting or copying data.
+
+    Values are mapped to ordered integer keys. Each pass histograms the keys in a range containing some ranks
+    into bins, narrowing the range to the bin containing each rank, until a bin holds at most max_candidates values,
+    which are then collected and partitioned. Each pass narrows the range by a factor of bins, so this terminates
+    after at most a few passes for any data, and returns NaN if data contains NaN, as np.median does.
+    """
+
+    ranks = np.asarray(ranks, dtype=np.int64)
+    values = np.empty(len(ranks))
+
+    # Find the range of keys.
+    minimum_key, maximum_key = None, None
+    for slab in _iterate_slabs(data, _key_slab_bytes):
+        if slab.size == 0:
+            continue
+        if np.isnan(np.min(slab)):
+            return np.full(len(ranks), np.nan)
+        slab_keys = _to_keys(slab)
+        slab_minimum, slab_maximum = int(slab_keys.min()), int(slab_keys.max())
+        minimum_key = slab_minimum if minimum_key is None else min(minimum_key, slab_minimum)
+        maximum_key = slab_maximum if maximum_key is None else max(maximum_key, slab_maximum)
+
+    # Each search is (lower_key, upper_key, n_below, rank_indices), where the keys in [lower_key, upper_key] hold the ranks in rank_indices,
+    # and n_below values have keys below lower_key.
+    searches = [(minimum_key, maximum_key, 0, np.arange(len(ranks)))]
+    while searches:
+        lower_key, upper_key, n_below, rank_indices = searches.pop()
+        if lower_key == upper_key:
+            values[rank_indices] = _from_key(lower_key)
+            continue
+
+        # Histogram the keys in [lower_key, upper_key].
+        bin_width = -(-(upper_key - lower_key + 1) // bins)
+        counts = np.zeros(bins, np.int64)
+        for slab in _iterate_slabs(data, _key_slab_bytes):
+            slab_keys = _to_keys(slab)
+            slab_keys = slab_keys[(slab_keys >= np.uint64(lower_key)) & (slab_keys <= np.uint64(upper_key))]
+            counts += np.bincount(((slab_keys - np.uint64(lower_key)) // np.uint64(bin_width)).astype(np.intp), minlength=bins)
+
+        # Locate the bin holding each rank.
+        cumulative_counts = n_below + np.concatenate([[0], np.cumsum(counts)])
+        rank_bins = np.searchsorted(cumulative_counts, ranks[rank_indices], side='right') - 1
+
+        collected_bins = []
+        for rank_bin in np.unique(rank_bins):
+            bin_lower_key = lower_key + int(rank_bin) * bin_width
+            bin_upper_key = min(upper_key, bin_lower_key + bin_width - 1)
+            bin_rank_indices = rank_indices[rank_bins == rank_bin]
+            if counts[rank_bin] <= max_candidates:
+                collected_bins.append((bin_lower_key, bin_upper_key, cumulative_counts[rank_bin], bin_rank_indices))
+            else:
+                searches.append((bin_lower_key, bin_upper_key, cumulative_counts[rank_bin], bin_rank_indices))
+
+        # Collect the values in small enough bins and partition them.
+        if collected_bins:
+            candidates = [[] for _ in collected_bins]
+            for slab in _iterate_slabs(data, _key_slab_bytes):
+                slab_keys = _to_keys(slab)
+                for bin_candidates, (bin_lower_key, bin_upper_key, _, _) in zip(candidates, collected_bins):
+                    bin_candidates.append(slab_keys[(slab_keys >= np.uint64(bin_lower_key)) & (slab_keys <= np.uint64(bin_upper_key))])
+            for bin_candidates, (_, _, bin_n_below, bin_rank_indices) in zip(candidates, collected_bins):
+                bin_candidates = np.concatenate(bin_candidates)
+                local_ranks = ranks[bin_rank_indices] - bin_n_below
+                bin_candidates.partition(np.unique(local_ranks))
+                values[bin_rank_indices] = [_from_key(key) for key in bin_candidates[local_ranks]]
+
+    return values
+
+
+def _sample(data, sample_size, random_state=None):
+    """Returns sample_size elements of data drawn uniformly at random with replacement, read in order of their position."""
+
+    rng = np.random.default_rng(random_state)
+    flat_indices = np.sort(rng.integers(0, data.size, size=sample_size))
+    return np.asarray(data[np.unravel_index(flat_indices, data.shape)], dtype=np.float64)
+
+
+def compute_quantiles(data, quantiles, sample_size=None, confidence=0.95, random_state=None, return_bounds=False):
+    """
+    Returns the <quantiles> of <data>, interpolated linearly between values as by np.quantile,
+    either exactly by selection, without sorting or copying <data>, or estimated from a random sample of it.
+
+    Arguments:
+        data {np.ndarray} -- The array whose quantiles are computed, which may be a np.memmap.
+        quantiles {float, sequence} -- The quantiles to compute, each in the interval [0, 1].
+
+    Keyword Arguments:
+        sample_size {int, NoneType} -- If provided, the quantiles are estimated from this many elements of <data>
+            drawn at random with replacement. (default: {None})
+        confidence {float} -- The confidence level of the bounds returned if <return_bounds> and <sample_size> is provided. (default: {0.95})
+        random_state {int, np.random.Generator, NoneType} -- Seeds the random sample. (default: {None})
+        return_bounds {bool} -- If True, also returns lower and upper bounds on each quantile:
+            distribution-free confidence bounds from order statistics of the sample if <sample_size> is provided,
+            and otherwise the exact quantiles themselves. (default: {False})
+
+    Raises:
+        ValueError: Raised if <data> is empty.
+        ValueError: Raised if any of <quantiles> is not in the interval [0, 1].
+
+    Returns:
+        float, np.ndarray, tuple -- The quantiles, a float if <quantiles> is a scalar,
+            or if <return_bounds>, a tuple of the quantiles and their lower and upper bounds.
+    """
+
+    data = np.asanyarray(data)
+    if data.size == 0:
+        raise ValueError(f"data must not be empty.\n"
+            f"data.shape: {data.shape}.")
+    scalar_quantiles = np.ndim(quantiles) == 0
+    quantiles = np.atleast_1d(np.asarray(quantiles, dtype=float))
+    if np.any((quantiles < 0) | (quantiles > 1)):
+        raise ValueError(f"Every element of quantiles must be in the interval [0, 1].\n"
+            f"quantiles: {quantiles}.")
+
+    if sample_size is not None:
+        sample = np.sort(_sample(data, sample_size, random_state))
+        estimates = np.quantile(sample, quantiles)
+        # The ranks in the sample bounding each quantile with probability confidence, by the normal approximation to the binomial distribution.
+        margins = ndtri(0.5 + confidence / 2) * np.sqrt(sample_size * quantiles * (1 - quantiles))
+        lower_bounds = sample[np.clip(np.floor(quantiles * (sample_size - 1) - margins).astype(int), 0, sample_size - 1)]
+        upper_bounds = sample[np.clip(np.ceil(quantiles * (sample_size - 1) + margins).astype(int), 0, sample_size - 1)]
+    else:
+        # Select the values on either side of each quantile and interpolate between them.
+        positions = quantiles * (data.size - 1)
+        lower_ranks = np.floor(positions).astype(np.int64)
+        upper_ranks = np.minimum(lower_ranks + 1, data.size - 1)
+        selected_values = _select_ranks(data, np.concatenate([lower_ranks, upper_ranks]))
+        lower_values, upper_values = np.split(selected_values, 2)
+        estimates = lower_values + (upper_values - lower_values) * (positions - lower_ranks)
+        # Avoid interpolating where it is unnecessary, which could produce NaN from infinite values.
+        estimates = np.where(positions == lower_ranks, lower_values, estimates)
+        lower_bounds, upper_bounds = estimates, estimates
+
+    if scalar_quantiles:
+        estimates, lower_bounds, upper_bounds = float(estimates[0]), float(lower_bounds[0]), float(upper_bounds[0])
+
+    if return_bounds:
+        return estimates, lower_bounds, upper_bounds
+    else:
+        return estimates
+
+
+def compute_median(data, **kwargs):
+    """Returns the median of <data>, as by compute_quantiles with <quantiles> 0.5, to which kwargs are passed."""
+
+    return compute_quantiles(data, 0.5, **kwargs)
+
+
+def compute_mean(data):
+    """Returns the mean of <data> as a float, accumulated in float64 over slabs."""
+
+    data = np.asanyarray(data)
+    total = sum(np.sum(slab, dtype=np.float64) for slab in _iterate_slabs(data))
+    return float(total / data.size)
+
+
+def compute_standard_deviation(data, mean=None):
+    """Returns the standard deviation of <data> as a float, as by np.std, accumulated in float64 over slabs.
+    If <mean> is None, it is computed with compute_mean."""
+
+    data = np.asanyarray(data)
+    if mean is None:
+        mean = compute_mean(data)
+    squared_deviation_sum = sum(np.sum(np.square(slab - mean, dtype=np.float64)) for slab in _iterate_slabs(data))
+    return float(np.sqrt(squared_deviation_sum / data.size))
+
+
+def compute_mean_absolute_deviation(data, center=None, sample_size=None, random_state=None):
+    """
+    Returns the mean absolute deviation of <data> from <center>, accumulated in float64 over slabs.
+
+    Arguments:
+        data {np.ndarray} -- The array whose mean absolute deviation is computed, which may be a np.memmap.
+
+    Keyword Arguments:
+        center {float, NoneType} -- The value from which deviations are measured. If None, the median of <data> is used. (default: {None})
+        sample_size {int, NoneType} -- If provided, the median and mean absolute deviation are estimated from
+            this many elements of <data> drawn at random with replacement. (default: {None})
+        random_state {int, np.random.Generator, NoneType} -- Seeds the random sample. (default: {None})
+
+    Returns:
+        float -- The mean absolute deviation.
+    """
+
+    data = np.asanyarray(data)
+    if sample_size is not None:
+        data = _sample(data, sample_size, random_state)
+    if center is None:
+        center = compute_median(data)
+
+    absolute_deviation_sum = 0
+    for slab in _iterate_slabs(data):
+        deviations = np.subtract(slab, center, dtype=np.float64)
+        absolute_deviation_sum += np.sum(np.abs(deviations, out=deviations))
+        # Release deviations before the next slab's are allocated.
+        del deviations
+    return float(absolute_deviation_sum / data.size)
+
+
+def compute_otsu_threshold(data, n_bins=128):
+    """Returns the threshold of <data> maximizing the between-class variance of its histogram with <n_bins> bins over [min, max], 
+    approximately that computed by sitk.OtsuThresholdImageFilter, with the histogram accumulated over slabs."""
+
+    data = np.asanyarray(data)
+    minimum, maximum = np.inf, -np.inf
+    for slab in _iterate_slabs(data):
+        minimum = min(minimum, float(np.min(slab)))
+        maximum = max(maximum, float(np.max(slab)))
+    bin_width = (maximum - minimum) / n_bins
+    if bin_width == 0:
+        return minimum
+
+    counts = np.zeros(n_bins, np.int64)
+    for slab in _iterate_slabs(data):
+        counts += np.histogram(slab, bins=n_bins, range=(minimum, maximum))[0]
+    bin_centers = minimum + (np.arange(n_bins) + 0.5) * bin_width
+
+    # Compute the between-class variance of thresholding at the upper edge of each bin.
+    counts_below = np.cumsum(counts)[:-1]
+    counts_above = counts.sum() - counts_below
+    sums_below = np.cumsum(counts * bin_centers)[:-1]
+    sums_above = np.sum(counts * bin_centers) - sums_below
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between_class_variances = counts_below * counts_above * (sums_below / counts_below - sums_above / counts_above) ** 2
+    threshold_bin = np.argmax(np.nan_to_num(between_class_variances, nan=-1))
+
+    return float(minimum + (threshold_bin + 1) * bin_width)
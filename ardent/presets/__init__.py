@@ -1,3 +1,4 @@
 from .batch_preprocessing import basic_preprocessing
+from .batch_preprocessing import batch_preprocess
 from .registration_parameters import get_registration_preset
 from .registration_parameters import get_registration_presets
\ No newline at end of file
@@ -1,4 +1,15 @@
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
 from ardent.preprocessing import preprocess
+from ardent.preprocessing import PreprocessingPipeline
+from ardent.io import load
+from ardent.utilities import _compute_file_hash
+from ardent.utilities import _DiskCache
+from ardent.__version__ import __version__
+
+_basic_preprocessing_steps = ['cast_to_typed_array', 'pad', 'normalize_by_MAD', 'center_to_mean']
 
 def basic_preprocessing(data):
     """
@@ -8,13 +19,69 @@ def basic_preprocessing(data):
         - pad
         - normalize_by_MAD
         - center_to_mean
-    
+
     Arguments:
         data {np.ndarray, list} -- An array to be preprocessed, or a list of arrays to be preprocessed.
-    
+
     Returns:
         np.ndarray, list -- The input array <data> after preprocessing, or each preprocessed array from the input list <data> if a list of arrays was provided.
     """
 
-    return preprocess(data, ['cast_to_typed_array', 'pad', 'normalize_by_MAD', 'center_to_mean'])
+    return preprocess(data, _basic_preprocessing_steps)
+
+
+def _preprocess_file(file_path, pipeline, cache_dir):
+    """Preprocess the image at file_path with pipeline into the _DiskCache at cache_dir,
+    unless it is already there, and return the path of the cached result."""
+
+    file_path = Path(file_path)
+    cache = _DiskCache(cache_dir)
+    # The file's suffix determines how it is read, and the version of ardent how it is preprocessed.
+    key = [_compute_file_hash(file_path), file_path.suffix.lower(), pipeline.definition, __version__]
+
+    if key not in cache:
+        cache.put(key, dict(data=np.asarray(pipeline.apply(load(file_path)))))
+
+    return cache.file_path(key)
+
+
+def batch_preprocess(file_paths, cache_dir, processes=None, n_workers=None):
+    """
+    Preprocess each image in <file_paths> across a pool of processes, caching each result on disk.
+    Results are keyed by a hash of the contents of the input file and the definition of the preprocessing steps,
+    so on rerun, unchanged inputs are not read or preprocessed again.
+
+    Arguments:
+        file_paths {sequence} -- The paths of the images to be preprocessed, in any format supported by ardent.io.load.
+        cache_dir {str, Path} -- The directory in which results are cached. It is created if it does not exist.
+
+    Keyword Arguments:
+        processes {list, NoneType} -- The preprocessing steps, as accepted by PreprocessingPipeline.
+            If None, the steps of basic_preprocessing are used. (default: {None})
+        n_workers {int, NoneType} -- The maximum number of images preprocessed at once.
+            If None, the ProcessPoolExecutor default is used. If 1, images are preprocessed in this process. (default: {None})
+
+    Raises:
+        ValueError: Raised if n_workers is less than 1.
+
+    Returns:
+        list -- The path of the cached result for each of <file_paths>, a .npz file holding the preprocessed image as 'data',
+            which can be read with ardent.io.load, optionally memory-mapped.
+    """
+
+    if n_workers is not None and n_workers < 1:
+        raise ValueError(f"n_workers must be at least 1.\n"
+            f"n_workers: {n_workers}.")
+
+    # Validate processes once.
+    pipeline = PreprocessingPipeline(_basic_preprocessing_steps if processes is None else processes)
+
+    file_paths = [Path(file_path).expanduser().resolve() for file_path in file_paths]
+    # Create cache_dir before any worker does.
+    cache_dir = _DiskCache(cache_dir).dir_path
+
+    if n_workers == 1:
+        return [_preprocess_file(file_path, pipeline, cache_dir) for file_path in file_paths]
 
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(_preprocess_file, file_paths, [pipeline] * len(file_paths), [cache_dir] * len(file_paths)))
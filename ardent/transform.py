@@ -7,11 +7,61 @@ from .presets import get_registration_preset
 from .lddmm.transformer import Transformer
 from .lddmm.transformer import torch_register
 from .lddmm.transformer import torch_apply_transform
+from .lddmm.transformer import torch_compute_axes
+from .lddmm.transformer import torch_compute_deformation
+from .lddmm.transformer import torch_as_tensor
+from .lddmm.transformer import _get_grid
 # TODO: rename io as fileio to avoid conflict with standard library package io?
 # from .io import save as io_save
 from . import io
+from .preprocessing import foreground
+from .utilities import _validate_scalar_to_multi
+from .utilities import _LRUCache
 from pathlib import Path
 import pickle
+import uuid
+import json
+import warnings
+import zipfile
+
+# The version of the on-disk format written by Transform.save.
+# Version 2 adds the crop boxes of Transform objects registered with crop_to_foreground, and is only written for them.
+_transform_format_version = 2
+
+# Position fields derived lazily by lean Transform objects, shared across all instances.
+_field_cache = _LRUCache(max_bytes=2**30)
+
+
+def _serialize_registration_parameters(registration_parameters):
+    """Returns <registration_parameters> as a JSON string, with arrays, tensors, and numpy scalars converted to lists and numbers. 
+    Parameters that still cannot be serialized are dropped with a warning."""
+
+    def convert(value):
+        if hasattr(value, 'tolist'):
+            return value.tolist()
+        raise TypeError(f"{type(value)} is not JSON-serializable.")
+
+    if registration_parameters is None:
+        return json.dumps(None)
+    serializable_parameters = {}
+    for key, value in registration_parameters.items():
+        try:
+            serializable_parameters[key] = json.loads(json.dumps(value, default=convert))
+        except (TypeError, ValueError):
+            warnings.warn(f"The registration parameter {key} cannot be serialized and is not saved.\n"
+                f"type({key}): {type(value)}.")
+    return json.dumps(serializable_parameters)
+
+
+def _compute_axes_at_resolution(axes, resolution):
+    """Returns centered coordinate tensors spanning the extent of <axes> at the given per-axis <resolution>."""
+
+    new_axes = []
+    for axis, axis_resolution in zip(axes, resolution):
+        n_points = int(np.floor(float(axis[-1] - axis[0]) / axis_resolution)) + 1
+        new_axis = torch.arange(n_points, dtype=axis.dtype, device=axis.device) * axis_resolution
+        new_axes.append(new_axis - torch.mean(new_axis))
+    return new_axes
 
 class Transform():
     """transform stores the deformation that is output by a registration 
@@ -28,8 +78,29 @@ class Transform():
         self.Aphis = None
         self.phiinvAinvs = None
         self.affine = None
+        self.registration_parameters = None
 
         self.transformer = None # To be instantiated in the register method.
+
+        # Retained in place of the transformer by lean Transform objects. See the make_lean method.
+        self.v = None
+        self.template_shape = None
+        self.template_resolution = None
+        self.target_shape = None
+        self.target_resolution = None
+        self._field_cache_key = uuid.uuid4().hex
+
+        # Set by the register method if crop_to_foreground, the start and stop along each axis of the crops of the template and target 
+        # that were registered, and their uncropped shapes. The affine, velocity field, and the shapes above refer to the crops.
+        self.template_crop_box = None
+        self.target_crop_box = None
+        self.uncropped_template_shape = None
+        self.uncropped_target_shape = None
+
+        # To be populated by the compose method.
+        self._composition = None
+        self._output_resolution = None
+        self._composed_fields = {}
     
     @staticmethod
     def _handle_registration_parameters(preset:str, params:dict) -> dict:
@@ -56,10 +127,13 @@ class Transform():
     # TODO: argument validation and resolution scalar to triple correction.
     def register(self, template:np.ndarray, target:np.ndarray, template_resolution=[1,1,1], target_resolution=[1,1,1], 
         preset=None, sigmaR=None, eV=None, eL=None, eT=None, 
-        A=None, v=None, **kwargs) -> None:
+        A=None, v=None, lean=False, crop_to_foreground=False, **kwargs) -> None:
         """
         Perform a registration using transformer between template and target.
         Populates attributes for future calls to the apply_transform method.
+
+        If crop_to_foreground, the template and target are each cropped to the bounding box of their foreground before registration, 
+        so that empty background does not cost computation. The crops are recorded, and apply_transform still works in the uncropped spaces.
         
         Arguments:
             template {np.ndarray} -- Image to target.
@@ -82,11 +156,35 @@ class Transform():
             eT {float} -- Translation step size. (default: {None})
             A {np.ndarray, NoneType} -- Initial affine transformation. (default: {None})
             v {np.ndarray} -- Initial velocity field. (default: {None})
+            lean {bool} -- If True, calls the make_lean method once registration is complete. (default: {False})
+            crop_to_foreground {bool, dict} -- If True, or a dict of keyword arguments for ardent.preprocessing.crop_to_foreground, 
+                the template and target are cropped to their foreground with it before registration. 
+                <A> is given in the uncropped spaces and converted. (default: {False})
         
         Returns:
             None -- Sets internal attributes and returns None.
         """
 
+        # Crop template and target to their foreground if appropriate.
+        if crop_to_foreground:
+            crop_kwargs = crop_to_foreground if isinstance(crop_to_foreground, dict) else {}
+            self.uncropped_template_shape = tuple(template.shape)
+            self.uncropped_target_shape = tuple(target.shape)
+            template, self.template_crop_box = foreground.crop_to_foreground(template, **crop_kwargs)
+            target, self.target_crop_box = foreground.crop_to_foreground(target, **crop_kwargs)
+            if A is not None:
+                # Aphi maps template to target positions, so the translation of A in the crops is L o_template + T - o_target.
+                template_offset = self._get_crop_offset('template', template_resolution)
+                target_offset = self._get_crop_offset('target', target_resolution)
+                A = np.array(A, float)
+                A[:3, 3] += A[:3, :3] @ template_offset - target_offset
+        else:
+            self.template_crop_box = None
+            self.target_crop_box = None
+            self.uncropped_template_shape = None
+            self.uncropped_target_shape = None
+        self._clear_cached_fields()
+
         # Collect registration parameters from chosen caller.
         registration_parameters = dict(sigmaR=sigmaR, eV=eV, eL=eL, eT=eT, **kwargs)
         registration_parameters = {key : value for key, value in registration_parameters.items() if value is not None}
@@ -96,9 +194,15 @@ class Transform():
 
         # Instantiate transformer as a new Transformer object.
         # self.affine and self.v will not be None if this Transform object was read with its load method or if its register method was already called.
+        # A lean Transform has no transformer, so its A and v are passed on explicitly.
+        if self.transformer is None and self.v is not None:
+            A = self.affine if A is None else A
+            v = self.v if v is None else v
         transformer = Transformer(I=template, J=target, Ires=template_resolution, Jres=target_resolution, 
                                     transformer=self.transformer, sigmaR=registration_parameters['sigmaR'], A=A, v=v)
 
+        self.registration_parameters = registration_parameters
+
         outdict = torch_register(template, target, transformer, **registration_parameters)
         '''outdict contains:
             - phis
@@ -110,6 +214,10 @@ class Transform():
             - transformer
         '''
 
+        # Fold a crop of the template working grid made by torch_register into the crops of this Transform.
+        if transformer.template_crop_box is not None:
+            self._fold_template_crop_box(transformer.template_crop_box, template.shape, target.shape)
+
         # Populate attributes.
         self.phis = outdict['phis']
         self.phiinvs = outdict['phiinvs']
@@ -119,6 +227,9 @@ class Transform():
 
         self.transformer = outdict['transformer']
 
+        if lean:
+            self.make_lean()
+
 
     def apply_transform(self, subject:np.ndarray, deform_to="template", save_path=None) -> np.ndarray:
         """
@@ -136,7 +247,11 @@ class Transform():
             np.ndarray -- The result of deforming <subject> to match <deform_to>.
         """
 
-        deformed_subject = torch_apply_transform(image=subject, deform_to=deform_to, transformer=self.transformer)
+        if self._composition is None and self.transformer is not None and not self._is_cropped():
+            deformed_subject = torch_apply_transform(image=subject, deform_to=deform_to, transformer=self.transformer)
+        else:
+            # This Transform is either composed, lean, or registered on crops.
+            deformed_subject = self._apply_position_field(subject, deform_to)
         
         if save_path is not None:
             io.save(deformed_subject, save_path)
@@ -144,27 +259,434 @@ class Transform():
         return deformed_subject
 
     
-    def save(self, file_path):
+    def make_lean(self):
+        """
+        Discard the transformer and the deformation fields computed during registration, 
+        retaining only the affine, the velocity field, and the shapes and resolutions of the template and target. 
+        The deformation fields are recomputed on first use by apply_transform 
+        and held in a cache shared by all Transform objects, bounded in memory by set_field_cache_limit.
+        
+        Raises:
+            RuntimeError: Raised if this Transform has not been registered.
+        """
+
+        if self.transformer is None:
+            raise RuntimeError(f"Only a registered Transform can be made lean.")
+
+        self.__dict__.update(self._get_lean_attributes())
+
+        self.phis = None
+        self.phiinvs = None
+        self.Aphis = None
+        self.phiinvAinvs = None
+        self.transformer = None
+        self._clear_cached_fields()
+
+
+    def _clear_cached_fields(self):
+        """Remove the position fields of this Transform from _field_cache."""
+
+        for deform_to in ['template', 'target']:
+            _field_cache.pop((self._field_cache_key, deform_to))
+            _field_cache.pop((self._field_cache_key, deform_to, 'uncropped'))
+
+
+    def _fold_template_crop_box(self, template_crop_box, template_shape, target_shape):
+        """Compose <template_crop_box>, a crop of the template of shape <template_shape> that was registered to the target of shape <target_shape>, 
+        into the crops of this Transform, relative to the templates and targets it was given."""
+
+        template_crop_box = np.asarray(template_crop_box, int)
+        if self._is_cropped():
+            self.template_crop_box = self.template_crop_box[:, :1] + template_crop_box
+        else:
+            self.uncropped_template_shape = tuple(template_shape)
+            self.uncropped_target_shape = tuple(target_shape)
+            self.template_crop_box = template_crop_box
+            self.target_crop_box = np.array([[0, axis_length] for axis_length in target_shape])
+
+
+    def _is_cropped(self):
+        """Returns whether this Transform was registered on crops of its template and target."""
+
+        return self.template_crop_box is not None
+
+
+    def _get_resolution(self, space):
+        """Returns the per-axis resolution of the template or target of a registered or lean Transform."""
+
+        if self.transformer is not None:
+            resolution = self.transformer.Ires if space == 'template' else self.transformer.Jres
+        else:
+            resolution = self.template_resolution if space == 'template' else self.target_resolution
+        return _validate_scalar_to_multi(resolution, size=3)
+
+
+    def _get_crop_offset(self, space, resolution=None):
+        """Returns the position of the center of the registered crop of the template or target 
+        in the centered coordinates of its uncropped grid, which is the translation from the coordinates of the crop to those of the uncropped grid."""
+
+        if space == 'template':
+            crop_box, uncropped_shape = self.template_crop_box, self.uncropped_template_shape
+        else:
+            crop_box, uncropped_shape = self.target_crop_box, self.uncropped_target_shape
+        if resolution is None:
+            resolution = self._get_resolution(space)
+        resolution = _validate_scalar_to_multi(resolution, size=3)
+        crop_box = np.asarray(crop_box)
+        return resolution * ((crop_box[:, 0] + crop_box[:, 1] - 1) / 2 - (np.asarray(uncropped_shape) - 1) / 2)
+
+
+    def _get_lean_attributes(self):
+        """Returns a dictionary of the attributes retained by a lean Transform, 
+        taken from the transformer if present."""
+
+        if self.transformer is None:
+            return dict(
+                affine=self.affine, 
+                v=self.v, 
+                template_shape=self.template_shape, 
+                template_resolution=self.template_resolution, 
+                target_shape=self.target_shape, 
+                target_resolution=self.target_resolution, 
+            )
+
+        transformer = self.transformer
+        return dict(
+            affine=transformer.A.cpu().numpy(), 
+            v=transformer.v.cpu().numpy(), 
+            template_shape=tuple(transformer.nxI), 
+            template_resolution=_validate_scalar_to_multi(transformer.Ires, size=3), 
+            target_shape=tuple(transformer.nxJ), 
+            target_resolution=_validate_scalar_to_multi(transformer.Jres, size=3), 
+        )
+
+
+    @staticmethod
+    def set_field_cache_limit(max_bytes=None, max_entries=None):
         """
-        Save the entire instance of this Transform object (self) to file.
+        Set the limits on the cache of deformation fields derived by lean Transform objects, 
+        evicting the least recently used fields as necessary.
+        
+        Keyword Arguments:
+            max_bytes {int, NoneType} -- The maximum total size of the cached fields. If None, it is unchanged. (default: {None})
+            max_entries {int, NoneType} -- The maximum number of cached fields. If None, it is unchanged. (default: {None})
+        """
+
+        _field_cache.resize(max_bytes=max_bytes, max_entries=max_entries)
+
+
+    def _get_lean_axes(self, space):
+        """Returns the list of per-axis coordinate tensors for the template or target of a lean Transform."""
+
+        device = 'cuda:0' if torch.cuda.is_available() else 'cpu'
+        if space == 'template':
+            return torch_compute_axes(self.template_shape, self.template_resolution, dtype=torch.float64, device=device)
+        elif space == 'target':
+            return torch_compute_axes(self.target_shape, self.target_resolution, dtype=torch.float64, device=device)
+        raise ValueError(f"space must be either 'template' or 'target'.\n"
+            f"space: {space}.")
+
+
+    def _get_deformation(self, deform_to):
+        """Returns the axes and position field for deforming to <deform_to> on its native grid, 
+        taken from the transformer or, for a lean Transform, derived from A and v and cached."""
+
+        if deform_to not in ['template', 'target']:
+            raise ValueError(f"deform_to must be either 'template' or 'target'.\n"
+                f"deform_to: {deform_to}.")
+
+        if self.transformer is not None:
+            if deform_to == 'template':
+                return self.transformer.xI, self.transformer.Aphi
+            else:
+                return self.transformer.xJ, self.transformer.phiiAi
+
+        if self.v is None:
+            raise RuntimeError(f"This Transform has neither been registered nor composed.")
+
+        axes = self._get_lean_axes(deform_to)
+        field = _field_cache.get((self._field_cache_key, deform_to))
+        if field is None:
+            template_axes = self._get_lean_axes('template')
+            target_axes = self._get_lean_axes('target')
+            dtype, device = template_axes[0].dtype, template_axes[0].device
+            A = torch_as_tensor(self.affine, dtype=dtype, device=device)
+            v = torch_as_tensor(self.v, dtype=dtype, device=device)
+            field = torch_compute_deformation(A, v, template_axes, target_axes, deform_to=deform_to)
+            _field_cache.put((self._field_cache_key, deform_to), field)
+        return axes, field
+
+
+    def _get_native_grid(self, deform_to):
+        """Returns the meshgrid of the native grid of <deform_to>, taken from the transformer or, 
+        for a lean Transform, from the cache of grids shared with Transformer objects."""
+
+        if self.transformer is not None:
+            return self.transformer.XI if deform_to == 'template' else self.transformer.XJ
+        axes = self._get_lean_axes(deform_to)
+        resolution = self.template_resolution if deform_to == 'template' else self.target_resolution
+        return _get_grid([len(axis) for axis in axes], resolution, axes[0].dtype, axes[0].device)[1]
+
+
+    def compose(self, other, output_resolution=None):
+        """
+        Compose this Transform with <other> into a single Transform, 
+        such that deforming to the template applies self and then other, 
+        and deforming to the target applies other and then self.
+        The template of self must be in the same space as the target of other.
+
+        The combined deformation is not computed here. 
+        It is built on the first call to apply_transform for each value of deform_to, 
+        by interpolating the displacement fields of each component into one another, 
+        so that the subject is resampled only once.
         
         Arguments:
-            file_path {str, Path} -- The full path to save self to.
+            other {Transform} -- The Transform to apply after self when deforming to the template.
+        
+        Keyword Arguments:
+            output_resolution {scalar, list, NoneType} -- Per-axis resolution of the output of the composed Transform. 
+                If None, the grid of the space being deformed to is used. (default: {None})
+        
+        Raises:
+            TypeError: Raised if <other> is not a Transform.
+        
+        Returns:
+            Transform -- A new Transform representing the composition of self and <other>.
+        """
+
+        if not isinstance(other, Transform):
+            raise TypeError(f"other must be of type Transform.\n"
+                f"type(other): {type(other)}.")
+
+        composed_transform = Transform()
+        composed_transform._composition = (self, other)
+        if output_resolution is not None:
+            composed_transform._output_resolution = _validate_scalar_to_multi(output_resolution, size=3)
+        # Aphi = A phi maps from template to target, so the affine of the composition is A_self A_other.
+        if self.affine is not None and other.affine is not None:
+            composed_transform.affine = np.matmul(self.affine, other.affine)
+
+        return composed_transform
+
+
+    def _get_axes(self, space):
+        """Returns the list of per-axis coordinate tensors for the template or target of this Transform."""
+
+        if self._composition is not None:
+            first, second = self._composition
+            if space == 'template':
+                return second._get_axes('template')
+            elif space == 'target':
+                return first._get_axes('target')
+        elif self._is_cropped():
+            if space in ['template', 'target']:
+                registered_axes = self.transformer.xI if self.transformer is not None else self._get_lean_axes('template')
+                uncropped_shape = self.uncropped_template_shape if space == 'template' else self.uncropped_target_shape
+                return torch_compute_axes(uncropped_shape, self._get_resolution(space), 
+                    dtype=registered_axes[0].dtype, device=registered_axes[0].device)
+        elif self.transformer is not None:
+            if space == 'template':
+                return self.transformer.xI
+            elif space == 'target':
+                return self.transformer.xJ
+        elif self.v is not None:
+            return self._get_lean_axes(space)
+        else:
+            raise RuntimeError(f"This Transform has neither been registered nor composed.")
+        raise ValueError(f"space must be either 'template' or 'target'.\n"
+            f"space: {space}.")
+
+
+    def _get_position_field(self, deform_to, points=None):
+        """
+        Returns the positions from which to sample an image in order to deform it to <deform_to>, 
+        evaluated at <points>, a tensor of shape (3, ...) of coordinates in the space of <deform_to>. 
+        If <points> is None, they are evaluated on the native grid of <deform_to>.
         """
 
-        io.save_pickled(self, file_path)
+        if self._composition is not None:
+            first, second = self._composition
+            if deform_to == 'template':
+                return first._get_position_field('template', second._get_position_field('template', points))
+            elif deform_to == 'target':
+                return second._get_position_field('target', first._get_position_field('target', points))
+        elif self._is_cropped():
+            if points is None:
+                # Evaluate on the uncropped grid of deform_to, once.
+                field_cache_key = (self._field_cache_key, deform_to, 'uncropped')
+                position_field = _field_cache.get(field_cache_key)
+                if position_field is None:
+                    position_field = self._get_position_field(deform_to, torch.stack(torch.meshgrid(self._get_axes(deform_to))))
+                    _field_cache.put(field_cache_key, position_field)
+                return position_field
+            return self._get_uncropped_position_field(deform_to, points)
+        else:
+            axes, field = self._get_deformation(deform_to)
+            if points is None:
+                return field
+            # Interpolate the displacement rather than the position to preserve accuracy at the borders.
+            return Transformer.interp3(axes, field - self._get_native_grid(deform_to), points) + points
+        raise ValueError(f"deform_to must be either 'template' or 'target'.\n"
+            f"deform_to: {deform_to}.")
 
 
-        """Loads an entire object instance from memory and transplants all of its writeable attributes into self."""
-    def load(self, file_path):
+    def _get_uncropped_position_field(self, deform_to, points):
+        """
+        Returns the positions in the uncropped space opposite <deform_to> from which to sample an image in order to deform it to <deform_to>, 
+        evaluated at <points> in the uncropped space of <deform_to>, for a Transform registered on crops. 
+        Points are translated into the crop of <deform_to>, and the resulting positions out of the crop of the other space. 
+        Beyond the crops, the affine part of the deformation is extended exactly and the rest is held at its value at the borders.
         """
-        Load an entire instance of a Transform object from memory, as from a file created with the save method, 
-        and transplants all of its writeable attributes into self.
+
+        axes, field = self._get_deformation(deform_to)
+        grid = self._get_native_grid(deform_to)
+        dtype, device = grid.dtype, grid.device
+
+        # Aphi maps the template to the target, and phiiAi applies the inverse affine first.
+        A = torch_as_tensor(self.affine, dtype=dtype, device=device)
+        if deform_to == 'target':
+            A = torch.inverse(A)
+        def apply_affine(X):
+            return torch.einsum('ij,j...->i...', A[:3, :3], X) + A[:3, 3].reshape(3, 1, 1, 1)
+
+        from_space = 'target' if deform_to == 'template' else 'template'
+        to_offset = torch.as_tensor(self._get_crop_offset(deform_to), dtype=dtype, device=device).reshape(3, 1, 1, 1)
+        from_offset = torch.as_tensor(self._get_crop_offset(from_space), dtype=dtype, device=device).reshape(3, 1, 1, 1)
+
+        cropped_points = points - to_offset
+        return Transformer.interp3(axes, field - apply_affine(grid), cropped_points) + apply_affine(cropped_points) + from_offset
+
+
+    def _apply_position_field(self, subject, deform_to):
+        """Deform <subject> with a single interpolation through the position field for <deform_to> 
+        of a composed or lean Transform."""
+
+        if deform_to not in ['template', 'target']:
+            raise ValueError(f"A composed or lean Transform can only deform to 'template' or 'target'.\n"
+                f"deform_to: {deform_to}.")
+
+        # The subject lives in the space opposite deform_to.
+        subject_axes = self._get_axes('target' if deform_to == 'template' else 'template')
+
+        if self._composition is None:
+            # This Transform is lean, its position field is held in _field_cache.
+            position_field = self._get_position_field(deform_to)
+        else:
+            # Build the combined position field once per deform_to.
+            if deform_to not in self._composed_fields:
+                points = None
+                if self._output_resolution is not None:
+                    output_axes = self._get_axes(deform_to)
+                    points = torch.stack(torch.meshgrid(
+                        _compute_axes_at_resolution(output_axes, self._output_resolution)))
+                self._composed_fields[deform_to] = self._get_position_field(deform_to, points)
+            position_field = self._composed_fields[deform_to]
+
+        subject = torch_as_tensor(subject, dtype=position_field.dtype, device=position_field.device)
+        deformed_subject = Transformer.interp3(subject_axes, subject, position_field)
+
+        return deformed_subject.cpu().numpy()
+
+
+    def save(self, file_path, compress=False, v_dtype=None):
+        """
+        Save the affine, velocity field, grid metadata, and registration parameters of this Transform object (self) 
+        to a versioned .npz file. Registration parameters that are arrays or tensors are saved as lists.
+        
+        Arguments:
+            file_path {str, Path} -- The full path to save self to, which must have the suffix '.npz'.
+        
+        Keyword Arguments:
+            compress {bool} -- If True, the arrays are compressed. Compressed arrays cannot be memory-mapped on loading. (default: {False})
+            v_dtype {type, NoneType} -- If provided, the velocity field is stored with this dtype, e.g. np.float16 or np.float32. (default: {None})
+        
+        Raises:
+            ValueError: Raised if the suffix of file_path is not '.npz'.
+            RuntimeError: Raised if self has not been registered.
+            NotImplementedError: Raised if self is a composed Transform.
+        """
+
+        file_path = Path(file_path)
+        if file_path.suffix != '.npz':
+            raise ValueError(f"file_path must have the suffix '.npz'.\n"
+                f"file_path: {file_path}.")
+        if self._composition is not None:
+            raise NotImplementedError(f"A composed Transform cannot be saved. Save each of its components instead.")
+        if self.transformer is None and self.v is None:
+            raise RuntimeError(f"Only a registered Transform can be saved.")
+
+        lean_attributes = self._get_lean_attributes()
+
+        v = lean_attributes['v']
+        if v_dtype is not None:
+            v = v.astype(v_dtype)
+
+        data = dict(
+            format_version=np.array(_transform_format_version), 
+            affine=np.asarray(lean_attributes['affine']), 
+            v=np.asarray(v), 
+            template_shape=np.array(lean_attributes['template_shape'], int), 
+            template_resolution=np.array(lean_attributes['template_resolution'], float), 
+            target_shape=np.array(lean_attributes['target_shape'], int), 
+            target_resolution=np.array(lean_attributes['target_resolution'], float), 
+            registration_parameters=np.array(_serialize_registration_parameters(self.registration_parameters)), 
+        )
+        if self._is_cropped():
+            data.update(
+                template_crop_box=np.asarray(self.template_crop_box, int), 
+                target_crop_box=np.asarray(self.target_crop_box, int), 
+                uncropped_template_shape=np.array(self.uncropped_template_shape, int), 
+                uncropped_target_shape=np.array(self.uncropped_target_shape, int), 
+            )
+        else:
+            # Files of Transform objects registered without cropping remain readable by versions supporting only format_version 1.
+            data.update(format_version=np.array(1))
+
+        io.save(data, file_path, compress=compress)
+
+
+    def load(self, file_path, mmap_mode=None):
+        """
+        Load a Transform from a file created with the save method into self, as a lean Transform. 
+        Files written by earlier versions, which pickled the entire Transform object, 
+        are also accepted, in which case all of its writeable attributes are transplanted into self.
         
         Arguments:
             file_path {str, Path} -- The full path that a Transform object was saved to.
+        
+        Keyword Arguments:
+            mmap_mode {str, NoneType} -- If provided, the velocity field is memory-mapped with this mode rather than read, 
+                unless it was saved with compression. (default: {None})
+        
+        Raises:
+            ValueError: Raised if the file was written in a newer format than this version of ardent supports.
         """
 
-        transform = io.load_pickled(file_path)
+        file_path = Path(file_path).expanduser().resolve()
+
+        if not zipfile.is_zipfile(file_path):
+            # file_path was written by pickling the Transform object.
+            transform = io.load_pickled(file_path)
+            self.__dict__.update(transform.__dict__)
+            return
+
+        data = io.load(file_path, mmap_mode=mmap_mode)
+
+        format_version = int(data['format_version'])
+        if format_version > _transform_format_version:
+            raise ValueError(f"file_path was saved in a newer format than is supported.\n"
+                f"format_version: {format_version}, supported format_version: {_transform_format_version}.")
 
-        self.__dict__.update(transform.__dict__)
\ No newline at end of file
+        self.__init__()
+        self.affine = np.array(data['affine'])
+        self.v = data['v']
+        self.template_shape = tuple(data['template_shape'].tolist())
+        self.template_resolution = np.array(data['template_resolution'])
+        self.target_shape = tuple(data['target_shape'].tolist())
+        self.target_resolution = np.array(data['target_resolution'])
+        self.registration_parameters = json.loads(str(data['registration_parameters']))
+        if 'template_crop_box' in data:
+            self.template_crop_box = np.array(data['template_crop_box'])
+            self.target_crop_box = np.array(data['target_crop_box'])
+            self.uncropped_template_shape = tuple(data['uncropped_template_shape'].tolist())
+            self.uncropped_target_shape = tuple(data['uncropped_target_shape'].tolist())
@@ -1,4 +1,10 @@
 import numpy as np
+import os
+import json
+import uuid
+import hashlib
+from pathlib import Path
+from collections import OrderedDict
 
 """
 Test _validate_scalar_to_multi
@@ -57,10 +63,14 @@ def _validate_scalar_to_multi(value, size=3, dtype=float):
 
 
 def _validate_ndarray(array, minimum_ndim=0, required_ndim=None, dtype=None, 
-forbid_object_dtype=True, broadcast_to_shape=None):
+forbid_object_dtype=True, broadcast_to_shape=None, copy=True):
     """Cast (a copy of) array to a np.ndarray if possible and return it 
     unless it is noncompliant with minimum_ndim, required_ndim, and dtype.
     
+    If copy == False, array is returned without copying if it is already a np.ndarray of dtype, 
+    and otherwise as a view where possible, so it may alias the input. 
+    In that case a broadcasted array is a read-only view.
+    
     Note:
     
     If required_ndim is None, _validate_ndarray will accept any object.
@@ -104,7 +114,10 @@ forbid_object_dtype=True, broadcast_to_shape=None):
     # Cast array to np.ndarray.
     # Validate compliance with dtype.
     try:
-        array = np.array(array, dtype) # Side effect: breaks alias.
+        if copy:
+            array = np.array(array, dtype) # Side effect: breaks alias.
+        else:
+            array = np.asarray(array, dtype)
     except TypeError:
         raise TypeError(f"array is of a type that is incompatible with dtype.\n"
             f"type(array): {type(array)}, dtype: {dtype}.")
@@ -121,7 +134,7 @@ forbid_object_dtype=True, broadcast_to_shape=None):
     if required_ndim is not None and array.ndim != required_ndim:
         # Upcast from ndim 0 to ndim 1 if appropriate.
         if array.ndim == 0 and required_ndim == 1:
-            array = np.array([array])
+            array = np.array([array]) if copy else array.reshape(1)
         else:
             raise ValueError(f"If required_ndim is not None, array.ndim must equal it unless array.ndim == 0 and required_ndin == 1.\n"
                 f"array.ndim: {array.ndim}, required_ndim: {required_ndim}.")
@@ -133,7 +146,223 @@ forbid_object_dtype=True, broadcast_to_shape=None):
     
     # Broadcast array if appropriate.
     if broadcast_to_shape is not None:
-        array = np.copy(np.broadcast_to(array=array, shape=broadcast_to_shape))
+        array = np.broadcast_to(array=array, shape=broadcast_to_shape)
+        if copy:
+            array = np.copy(array)
 
     return array
 
+
+# The floating point dtype produced from data that is not already floating point, as set by set_default_dtype.
+_default_dtype = np.dtype(np.float64)
+
+def set_default_dtype(dtype):
+    """
+    Set the floating point dtype that preprocessing, resampling, and io functions produce from data that is not already floating point,
+    such as integer microscopy data, and in which they compute when not given a dtype of their own.
+    Floating point data keeps its dtype, so with np.float32, float32 data is never upcast to float64.
+
+    Arguments:
+        dtype {type, str, np.dtype} -- A floating point dtype, such as np.float32 or np.float64.
+
+    Raises:
+        ValueError: Raised if dtype is not a floating point dtype.
+    """
+
+    global _default_dtype
+
+    dtype = np.dtype(dtype)
+    if not np.issubdtype(dtype, np.floating):
+        raise ValueError(f"dtype must be a floating point dtype.\n"
+            f"dtype: {dtype}.")
+
+    _default_dtype = dtype
+
+
+def get_default_dtype():
+    """Returns the floating point dtype set by set_default_dtype, np.float64 unless it has been set."""
+
+    return _default_dtype
+
+
+def _resolve_float_dtype(array_dtype, dtype=None):
+    """Returns np.dtype(dtype) if dtype is not None, otherwise array_dtype if it is a floating point type,
+    otherwise the default dtype set by set_default_dtype."""
+
+    if dtype is not None:
+        return np.dtype(dtype)
+    if array_dtype is not None and np.issubdtype(array_dtype, np.floating):
+        return np.dtype(array_dtype)
+    return _default_dtype
+
+
+
+def _compute_nbytes(value):
+    """Returns the number of bytes occupied by the np.ndarray and torch.Tensor objects in value, 
+    recursing into tuples, lists, and dicts. Other objects are counted as 0 bytes."""
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    # Check for torch.Tensor without requiring torch to be imported.
+    if hasattr(value, 'element_size') and hasattr(value, 'numel'):
+        return value.element_size() * value.numel()
+    if isinstance(value, (tuple, list)):
+        return sum(map(_compute_nbytes, value))
+    if isinstance(value, dict):
+        return sum(map(_compute_nbytes, value.values()))
+    return 0
+
+
+class _LRUCache():
+    """A least-recently-used cache whose contents are bounded in total size by max_bytes 
+    and optionally in number by max_entries. Values too large to fit are not stored."""
+
+    def __init__(self, max_bytes, max_entries=None):
+
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.nbytes = 0
+        self._entries = OrderedDict() # Maps key to (value, nbytes).
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the value stored at key and mark it as most recently used, or return default."""
+
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def put(self, key, value):
+        """Store value at key, evicting the least recently used entries as necessary."""
+
+        self.pop(key)
+        value_nbytes = _compute_nbytes(value)
+        if value_nbytes > self.max_bytes:
+            return
+        self._entries[key] = (value, value_nbytes)
+        self.nbytes += value_nbytes
+        self._evict()
+
+    def pop(self, key, default=None):
+        """Remove and return the value stored at key, or return default."""
+
+        if key not in self._entries:
+            return default
+        value, value_nbytes = self._entries.pop(key)
+        self.nbytes -= value_nbytes
+        return value
+
+    def clear(self):
+        """Remove all entries."""
+
+        self._entries.clear()
+        self.nbytes = 0
+
+    def resize(self, max_bytes=None, max_entries=None):
+        """Update max_bytes and max_entries if provided, evicting entries as necessary."""
+
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if max_entries is not None:
+            self.max_entries = max_entries
+        self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the limits are satisfied."""
+
+        while self._entries and (self.nbytes > self.max_bytes 
+            or (self.max_entries is not None and len(self._entries) > self.max_entries)):
+            _, (_, value_nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= value_nbytes
+
+
+def _compute_content_hash(array, chunk_bytes=2**26):
+    """Returns a hexadecimal digest of the shape, dtype, and contents of array. 
+    The contents are hashed in slabs along the first axis of about chunk_bytes each, 
+    so a np.memmap or any other array-like supporting slicing is never copied in full."""
+
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(repr((tuple(array.shape), np.dtype(array.dtype).str)).encode())
+
+    if len(array.shape) == 0:
+        hasher.update(np.ascontiguousarray(array))
+        return hasher.hexdigest()
+
+    slab_nbytes = max(1, int(np.prod(array.shape[1:], dtype=np.int64)) * np.dtype(array.dtype).itemsize)
+    slab_length = max(1, chunk_bytes // slab_nbytes)
+    for start in range(0, array.shape[0], slab_length):
+        hasher.update(np.ascontiguousarray(array[start:start + slab_length]))
+    return hasher.hexdigest()
+
+
+def _compute_file_hash(file_path, chunk_bytes=2**24):
+    """Returns a hexadecimal digest of the contents of the file at file_path, read in chunks of chunk_bytes."""
+
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_bytes), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class _DiskCache():
+    """A cache of dicts of np.ndarray objects stored as uncompressed .npz files in dir_path, 
+    named by a hash of their keys. Keys may be any JSON-serializable object, 
+    with other objects such as np.ndarray serialized by their str. 
+    Files are written to a temporary name and then renamed, so concurrent writers never expose partial files."""
+
+    def __init__(self, dir_path):
+
+        self.dir_path = Path(dir_path).expanduser().resolve()
+        self.dir_path.mkdir(parents=True, exist_ok=True)
+
+    def file_path(self, key):
+        """Returns the path of the file storing the value at key."""
+
+        serialized_key = json.dumps(key, sort_keys=True, default=str)
+        return self.dir_path / (hashlib.blake2b(serialized_key.encode(), digest_size=16).hexdigest() + '.npz')
+
+    def __contains__(self, key):
+        return self.file_path(key).exists()
+
+    def get(self, key, default=None):
+        """Return the dict of arrays stored at key, or return default."""
+
+        file_path = self.file_path(key)
+        if not file_path.exists():
+            return default
+        with np.load(file_path, allow_pickle=False) as npz_file:
+            return {name : npz_file[name] for name in npz_file.files}
+
+    def put(self, key, arrays):
+        """Store the dict arrays at key."""
+
+        file_path = self.file_path(key)
+        temporary_file_path = file_path.with_name(f'.{uuid.uuid4().hex}.npz')
+        try:
+            np.savez(temporary_file_path, **arrays)
+            os.replace(temporary_file_path, file_path)
+        finally:
+            if temporary_file_path.exists():
+                temporary_file_path.unlink()
+
+    def pop(self, key, default=None):
+        """Remove and return the dict of arrays stored at key, or return default."""
+
+        value = self.get(key, default)
+        file_path = self.file_path(key)
+        if file_path.exists():
+            file_path.unlink()
+        return value
+
+    def clear(self):
+        """Remove all entries."""
+
+        for file_path in self.dir_path.glob('*.npz'):
+            file_path.unlink()
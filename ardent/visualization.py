@@ -3,6 +3,10 @@ import matplotlib.pyplot as plt
 import nibabel as nib
 import nilearn.plotting as niplot
 
+from ardent.preprocessing.statistics import compute_quantiles
+from ardent.preprocessing.statistics import compute_mean
+from ardent.preprocessing.statistics import compute_standard_deviation
+
 def _scale_data(data, limit_mode=None, stdevs=4, quantile=0.01, limits=None):
     """Returns a copy of data scaled such that the bulk of the values are mapped to the range [0, 1].
     
@@ -63,8 +67,8 @@ def _scale_data(data, limit_mode=None, stdevs=4, quantile=0.01, limits=None):
                 raise ValueError(f"For limit_mode='stdev', <stdevs> must be non-negative.\n"
                     f"stdevs: {stdevs}.")
             # Choose limits equal to the mean +/- <stdevs> standard deviations.
-            stdev = np.std(data)
-            mean = np.mean(data)
+            mean = compute_mean(data)
+            stdev = compute_standard_deviation(data, mean=mean)
             lower_lim = mean - stdevs*stdev
             upper_lim = mean + stdevs*stdev
         elif limit_mode == 'quantile':
@@ -76,8 +80,8 @@ def _scale_data(data, limit_mode=None, stdevs=4, quantile=0.01, limits=None):
                 raise ValueError(f"For limit_mode='quantile', <quantile> must be in the interval [0, 1].\n"
                     f"quantile: {quantile}.")
             # Choose limits based on quantile.
-            lower_lim = np.quantile(data, min(quantile, 1 - quantile))
-            upper_lim = np.quantile(data, max(quantile, 1 - quantile))
+            # Both are selected together, without sorting a copy of data.
+            lower_lim, upper_lim = compute_quantiles(data, [min(quantile, 1 - quantile), max(quantile, 1 - quantile)])
         else:
             raise ValueError(f"Unrecognized value for limit_mode. Supported values include {supported_limit_modes}.\n"
                 f"limit_mode: {limit_mode}.")
@@ -85,7 +89,9 @@ def _scale_data(data, limit_mode=None, stdevs=4, quantile=0.01, limits=None):
 
     # TODO: make harmonious with quantiles approach so that it centers at the median.
     # Scale data such that the bulk lies approximately on [0, 1].
-    scaled_data = (data - lower_lim) / (upper_lim - lower_lim)
+    # The scaled copy is the only full-size array allocated.
+    scaled_data = np.subtract(data, lower_lim, dtype=float)
+    scaled_data /= upper_lim - lower_lim
     
     # Return scaled copy of data.
     return scaled_data
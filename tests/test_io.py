@@ -0,0 +1,158 @@
+import pytest
+
+import numpy as np
+import SimpleITK as sitk
+
+from ardent.io import save
+from ardent.io import load
+from ardent.io import ChunkedImage
+from ardent.io import save_multiscale
+from ardent.io import load_multiscale
+from ardent.io import load_stack
+from ardent.preprocessing.resampling import downsample_image
+
+"""
+Test save and load.
+"""
+
+def test_save_and_load_npz(tmp_path):
+
+    data = {'a':np.arange(24, dtype=float).reshape(2,3,4), 'b':np.array(5), 'c':np.array('text')}
+
+    # Test uncompressed round trip with memory-mapping.
+
+    file_path = tmp_path / 'data.npz'
+    save(data, file_path)
+    loaded_data = load(file_path, mmap_mode='r')
+    assert isinstance(loaded_data['a'], np.memmap)
+    for key, value in data.items():
+        assert np.array_equal(loaded_data[key], value)
+        assert loaded_data[key].dtype == value.dtype
+
+    # Test compressed round trip, for which memory-mapping is not possible.
+
+    file_path = tmp_path / 'compressed_data.npz'
+    save(data, file_path, compress=True)
+    loaded_data = load(file_path, mmap_mode='r')
+    assert not isinstance(loaded_data['a'], np.memmap)
+    for key, value in data.items():
+        assert np.array_equal(loaded_data[key], value)
+
+def test_load_memory_mapped_and_ordered(tmp_path):
+
+    image = np.arange(60, dtype=np.uint16).reshape(3,4,5)
+
+    # Test .npy with memory-mapping.
+
+    file_path = tmp_path / 'image.npy'
+    save(image, file_path)
+    loaded_image = load(file_path, mmap_mode='r')
+    assert isinstance(loaded_image, np.memmap)
+    assert np.array_equal(loaded_image, image)
+
+    # Test .raw with and without memory-mapping.
+
+    file_path = tmp_path / 'image.raw'
+    image.tofile(file_path)
+    loaded_image = load(file_path, mmap_mode='r', shape=image.shape, dtype=image.dtype)
+    assert isinstance(loaded_image, np.memmap)
+    assert np.array_equal(loaded_image, image)
+    loaded_image = load(file_path, shape=image.shape, dtype=image.dtype)
+    assert np.array_equal(loaded_image, image)
+
+    expected_exception = ValueError
+    match = "shape and dtype must be provided to load a .raw file."
+    with pytest.raises(expected_exception, match=match):
+        load(file_path)
+
+    # Test order for SimpleITK formats.
+
+    file_path = tmp_path / 'image.vtk'
+    save(image, file_path)
+    loaded_image = load(file_path)
+    assert np.array_equal(loaded_image, image)
+    assert loaded_image.flags['F_CONTIGUOUS']
+    loaded_image = load(file_path, order='C')
+    assert np.array_equal(loaded_image, image)
+    assert loaded_image.flags['C_CONTIGUOUS']
+
+    # Test dtype for formats other than .raw.
+
+    loaded_image = load(file_path, dtype=np.float32)
+    assert loaded_image.dtype == np.float32
+    assert np.array_equal(loaded_image, image)
+
+"""
+Test ChunkedImage, save_multiscale, and load_multiscale.
+"""
+
+def test_ChunkedImage(tmp_path):
+
+    image = np.arange(11*6*5, dtype=np.uint16).reshape(11,6,5)
+
+    chunked_image = ChunkedImage.create(tmp_path / 'chunked', shape=image.shape, dtype=image.dtype, chunks=4)
+    # Unwritten chunks read as 0.
+    assert np.array_equal(chunked_image[...], np.zeros_like(image))
+
+    # Test writing and reading unaligned regions.
+
+    chunked_image[...] = image
+    chunked_image[1:6, 2, 3:] = 0
+    image[1:6, 2, 3:] = 0
+    reopened_image = ChunkedImage(tmp_path / 'chunked')
+    assert reopened_image.shape == image.shape and reopened_image.dtype == image.dtype
+    assert np.array_equal(reopened_image[...], image)
+    assert np.array_equal(reopened_image[2:9:3, -1], image[2:9:3, -1])
+    assert np.array_equal(reopened_image[..., 4], image[..., 4])
+
+    expected_exception = ValueError
+    match = "Only positive slice steps are supported."
+    with pytest.raises(expected_exception, match=match):
+        reopened_image[::-1]
+
+
+def test_save_and_load_multiscale(tmp_path):
+
+    image = np.random.rand(20, 13, 9)
+
+    multiscale_image = save_multiscale(image, tmp_path / 'multiscale', xyz_resolution=[1, 2, 3], scale_factors=2, n_levels=3, chunks=5)
+    assert len(multiscale_image) == 3
+    assert np.array_equal(multiscale_image.xyz_resolutions[2], [4, 8, 12])
+    assert np.allclose(multiscale_image[1][...], downsample_image(image, 2))
+
+    level_image, level_resolution = load_multiscale(tmp_path / 'multiscale', xyz_resolution=[5, 9, 12])
+    assert np.array_equal(level_resolution, [4, 8, 12])
+    assert np.allclose(level_image, downsample_image(downsample_image(image, 2), 2))
+
+"""
+Test load_stack.
+"""
+
+def test_load_stack(tmp_path):
+
+    stack = np.random.randint(0, 1000, (9, 7, 11)).astype(np.uint16)
+    # Name planes such that lexicographic order differs from numeric order.
+    for plane_index in range(stack.shape[-1]):
+        sitk.WriteImage(sitk.GetImageFromArray(stack[..., plane_index].T), str(tmp_path / f'plane_{plane_index}.tif'))
+
+    loaded_stack = load_stack(tmp_path)
+    assert loaded_stack.dtype == stack.dtype
+    assert np.array_equal(loaded_stack, stack)
+
+    loaded_stack = load_stack(tmp_path / 'plane_*.tif', scale_factors=[2, 3, 4], mmap_path=tmp_path / 'stack.npy', n_workers=2)
+    assert isinstance(loaded_stack, np.memmap)
+    assert np.allclose(loaded_stack, downsample_image(stack, [2, 3, 4]))
+
+"""
+Perform tests.
+"""
+
+if __name__ == "__main__":
+    from pathlib import Path
+    from tempfile import TemporaryDirectory
+    with TemporaryDirectory() as tmp_dir:
+        test_save_and_load_npz(Path(tmp_dir))
+        test_load_memory_mapped_and_ordered(Path(tmp_dir))
+        test_ChunkedImage(Path(tmp_dir))
+        test_save_and_load_multiscale(Path(tmp_dir))
+        test_load_stack(Path(tmp_dir))
@@ -0,0 +1,197 @@
+import pytest
+
+import numpy as np
+import torch
+
+import ardent.lddmm.transformer as transformer_module
+from ardent.lddmm.transformer import Transformer
+from ardent.lddmm.transformer import _get_grid
+from ardent.lddmm.transformer import _geometry_cache
+
+def _make_weights_transformer(J, fAphiI, sigmaM, sigmaA, CA=None):
+    """Returns a Transformer with only the attributes used by weights set, without the images and grids that require torch.rfft."""
+
+    transformer = Transformer.__new__(Transformer)
+    transformer.dtype, transformer.device = torch.float64, 'cpu'
+    transformer.J = torch.as_tensor(J, dtype=torch.float64)
+    transformer.nxJ = transformer.J.shape
+    transformer.fAphiI = torch.as_tensor(fAphiI, dtype=torch.float64)
+    transformer.WM = torch.ones(transformer.nxJ, dtype=torch.float64)
+    transformer.sigmaM = sigmaM
+    transformer.set_artifact_classes(sigmaA, CA)
+    return transformer
+
+"""
+Test _get_grid, Transformer.compute_smoothing_kernels, and the cache they share.
+"""
+
+def test_geometry_cache():
+
+    Transformer.clear_cache()
+
+    # Test that grids are cached by shape and resolution.
+
+    axes, grid = _get_grid((4, 5, 6), [1, 1, 2], torch.float64, 'cpu')
+    assert grid.shape == (3, 4, 5, 6)
+    assert np.allclose(axes[2].numpy(), [-5, -3, -1, 1, 3, 5])
+    other_axes, other_grid = _get_grid((4, 5, 6), np.array([1, 1, 2]), torch.float64, 'cpu')
+    assert other_grid is grid and all(other_axis is axis for other_axis, axis in zip(other_axes, axes))
+    assert _get_grid((4, 5, 7), [1, 1, 2], torch.float64, 'cpu')[1] is not grid
+    assert _get_grid((4, 5, 6), [1, 1, 1], torch.float64, 'cpu')[1] is not grid
+    assert _get_grid((4, 5, 6), [1, 1, 2], torch.float32, 'cpu')[1] is not grid
+
+    # Test that the returned list of axes is a copy.
+
+    axes.append(None)
+    assert len(_get_grid((4, 5, 6), [1, 1, 2], torch.float64, 'cpu')[0]) == 3
+
+    # Test that smoothing kernels are cached by grid, a, and p.
+
+    def compute_smoothing_kernels(shape, resolution, a, p):
+        transformer = Transformer.__new__(Transformer)
+        transformer.dtype, transformer.device = torch.float64, 'cpu'
+        transformer.nxI, transformer.Ires, transformer.a, transformer.p = shape, resolution, a, p
+        transformer.dxI = torch.tensor(resolution, dtype=torch.float64)
+        transformer.compute_smoothing_kernels()
+        return transformer
+
+    transformer = compute_smoothing_kernels((4, 5, 6), [1, 1, 2], 2.0, 2.0)
+    assert transformer.Khat.shape == (4, 5, 6) and torch.allclose(transformer.Khat, 1.0/transformer.Lhat**2)
+    assert compute_smoothing_kernels((4, 5, 6), [1, 1, 2], 2, 2).Khat is transformer.Khat
+    assert compute_smoothing_kernels((4, 5, 6), [1, 1, 2], 3.0, 2.0).Khat is not transformer.Khat
+    assert compute_smoothing_kernels((4, 5, 6), [1, 1, 2], 2.0, 1.0).Khat is not transformer.Khat
+
+    # Test set_cache_limit and clear_cache.
+
+    try:
+        Transformer.set_cache_limit(max_bytes=grid.element_size() * grid.numel())
+        assert len(_geometry_cache) <= 1
+    finally:
+        Transformer.set_cache_limit(max_bytes=2**30)
+    Transformer.clear_cache()
+    assert len(_geometry_cache) == 0 and _geometry_cache.nbytes == 0
+    assert _get_grid((4, 5, 6), [1, 1, 2], torch.float64, 'cpu')[1] is not grid
+
+"""
+Test Transformer.crop_template.
+"""
+
+# Constructing a Transformer requires torch.rfft, which was removed in torch 1.8.
+@pytest.mark.skipif(not hasattr(torch, 'rfft'), reason="Transformer requires torch.rfft.")
+def test_crop_template():
+
+    template = np.random.rand(20, 22, 18)
+    target = np.random.rand(8, 9, 10)
+    affine = np.eye(4)
+    affine[:3, 3] = [-3, 2.5, 0]
+    transformer = Transformer(template, target, Ires=[1, 1, 1], Jres=[1, 1, 1], nt=2, A=affine)
+    old_A = transformer.A.clone()
+    old_XI = transformer.XI
+
+    # Test that the template is cropped to the footprint of the target, padded, with A updated to match.
+
+    assert transformer.crop_template(padding=2)
+    # The footprint of the target, at positions -3.5 to 3.5, -4 to 4, and -4.5 to 4.5, is translated by -affine[:3, 3], 
+    # spanning voxels 9 to 16, 4 to 12, and 4 to 13 of the template.
+    assert np.array_equal(transformer.template_crop_box, [[7, 19], [2, 15], [2, 16]])
+    crop_box = transformer.template_crop_box
+    crop = tuple(slice(start, stop) for start, stop in crop_box)
+    assert transformer.nxI == tuple(crop_box[:, 1] - crop_box[:, 0])
+    assert np.array_equal(transformer.I.numpy(), template[crop])
+    assert transformer.v.shape == (2, 3, *transformer.nxI) and transformer.Khat.shape == transformer.nxI
+    assert np.allclose([torch.mean(x).item() for x in transformer.xI], 0)
+    # Each voxel of the crop is mapped to the same position as before.
+    new_positions = torch.einsum('ij,j...->i...', transformer.A[:3, :3], transformer.XI) + transformer.A[:3, 3].reshape(3, 1, 1, 1)
+    old_positions = torch.einsum('ij,j...->i...', old_A[:3, :3], old_XI[(slice(None),) + crop]) + old_A[:3, 3].reshape(3, 1, 1, 1)
+    assert torch.allclose(new_positions, old_positions)
+
+    # Test that cropping again accumulates into template_crop_box, and that the grid is kept if it would not shrink.
+
+    assert transformer.crop_template(padding=1)
+    assert np.all(transformer.template_crop_box[:, 0] == crop_box[:, 0] + 1)
+    assert np.all(transformer.template_crop_box[:, 1] == crop_box[:, 1] - 1)
+    assert not transformer.crop_template(padding=1)
+
+"""
+Test Transformer.weights and Transformer.set_artifact_classes.
+"""
+
+def test_weights(monkeypatch):
+
+    J = np.random.rand(7, 5, 6)
+    J[1:3, 1:3] = 5
+    J[4:6, :, 2:4] = -3
+    fAphiI = J + np.random.normal(0, 0.2, J.shape)
+    fAphiI[1:3, 1:3] = np.random.rand(2, 2, 6)
+    fAphiI[4:6, :, 2:4] = np.random.rand(2, 5, 2)
+    # Evaluate the weights in slabs of 2 and a remainder along the first axis.
+    monkeypatch.setattr(transformer_module, '_weights_slab_size', 2 * 5 * 6)
+
+    # Test agreement with the original Gaussian mixture of the matching class and a single artifact class, over several updates.
+
+    transformer = _make_weights_transformer(J, fAphiI, sigmaM=0.5, sigmaA=2.0)
+    WM = transformer.WM
+    J, fAphiI = transformer.J, transformer.fAphiI
+    correct_WM = torch.full(J.shape, 0.9, dtype=torch.float64)
+    for _ in range(3):
+        CA = torch.mean(J*(1.0 - correct_WM))
+        assert torch.allclose(transformer.CA, CA.reshape(1))
+        fM = torch.exp((fAphiI - J)**2*(-1.0/2.0/0.5**2))/np.sqrt(2.0*np.pi*0.5**2)
+        fA = torch.exp((CA - J)**2*(-1.0/2.0/2.0**2))/np.sqrt(2.0*np.pi*2.0**2)
+        correct_WM = fM/(fM + fA)
+        transformer.weights()
+        assert torch.allclose(transformer.WM, correct_WM, rtol=0, atol=1e-12)
+        assert transformer.WM is WM
+    assert torch.allclose(transformer.CA, torch.mean(J*(1.0 - correct_WM)).reshape(1))
+
+    # Test two artifact classes, whose constants are updated to the means of J weighted by each class.
+
+    transformer = _make_weights_transformer(J, fAphiI, sigmaM=0.5, sigmaA=[1.0, 0.5], CA=[4.0, -2.0])
+    WM = transformer.WM
+    transformer.weights()
+    logfM = (fAphiI - J)**2*(-1.0/2.0/0.5**2) - 0.5*np.log(2.0*np.pi*0.5**2)
+    logfA = torch.stack([(4.0 - J)**2*(-1.0/2.0/1.0**2) - 0.5*np.log(2.0*np.pi*1.0**2), 
+        (-2.0 - J)**2*(-1.0/2.0/0.5**2) - 0.5*np.log(2.0*np.pi*0.5**2)])
+    fsum = torch.exp(logfM) + torch.sum(torch.exp(logfA), 0)
+    assert transformer.WM is WM
+    assert torch.allclose(transformer.WM, torch.exp(logfM)/fsum)
+    WA = torch.exp(logfA)/fsum
+    assert torch.allclose(transformer.CA, torch.sum(WA*J, (1, 2, 3))/torch.sum(WA, (1, 2, 3)))
+    assert transformer.CA[0] > 4.5 and transformer.CA[1] < -2.5
+    assert torch.all(transformer.WM[1:3, 1:3] < 1e-3) and torch.all(transformer.WM[4:6, :, 2:4] < 1e-3)
+
+    # Test that set_artifact_classes resets WM in place.
+
+    transformer.set_artifact_classes(2.0)
+    assert transformer.WM is WM and torch.all(transformer.WM == 0.9)
+    assert not transformer.CA_by_class and transformer.sigmaA.shape == (1,)
+
+    # Test that a scalar sigmaA is shared by every artifact class.
+
+    transformer.set_artifact_classes(2.0, CA=[4.0, -2.0])
+    assert transformer.CA_by_class and torch.equal(transformer.sigmaA, torch.tensor([2.0, 2.0], dtype=torch.float64))
+
+    # Test improper use.
+
+    kwargs = dict(sigmaA=[1.0, 0.5])
+    expected_exception = ValueError
+    match = "If CA is None, sigmaA must be a scalar."
+    with pytest.raises(expected_exception, match=match):
+        transformer.set_artifact_classes(**kwargs)
+
+    kwargs = dict(sigmaA=[1.0, 0.5, 2.0], CA=[4.0, -2.0])
+    expected_exception = ValueError
+    match = "sigmaA must be a scalar or have the same length as CA."
+    with pytest.raises(expected_exception, match=match):
+        transformer.set_artifact_classes(**kwargs)
+    assert torch.equal(transformer.CA, torch.tensor([4.0, -2.0], dtype=torch.float64))
+
+"""
+Perform tests.
+"""
+
+if __name__ == "__main__":
+    test_geometry_cache()
+    if hasattr(torch, 'rfft'):
+        test_crop_template()
+    test_weights(pytest.MonkeyPatch())
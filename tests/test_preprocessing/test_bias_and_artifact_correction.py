@@ -0,0 +1,210 @@
+import pytest
+
+import numpy as np
+import torch
+import tracemalloc
+import SimpleITK as sitk
+from scipy.ndimage import gaussian_filter
+
+from ardent.preprocessing.bias_and_artifact_correction import correct_bias_field
+from ardent.preprocessing.bias_and_artifact_correction import correct_bias_field_polynomial
+from ardent.preprocessing.bias_and_artifact_correction import estimate_bias_field
+from ardent.preprocessing.bias_and_artifact_correction import BiasField
+from ardent.preprocessing.bias_and_artifact_correction import remove_grid_artifact
+from ardent.preprocessing.bias_and_artifact_correction import _bias_field_cache
+
+def _make_biased_image(shape=(40, 30, 20)):
+    """Returns an image of 3 classes of tissue, each of constant intensity, multiplied by a smooth bias field, 
+    the labels of the classes, and the bias field."""
+
+    x, y, z = np.meshgrid(*[np.linspace(-1, 1, axis_length) for axis_length in shape], indexing='ij')
+    labels = (x**2 + y**2 + z**2 < 0.5).astype(int) + (np.abs(x) < 0.3)
+    bias = np.exp(0.1*x - 0.075*y*z + 0.05*z**2)
+    image = (np.choose(labels, [1.0, 1.5, 1.9]) * bias).astype(np.float32)
+    return image, labels, bias
+
+"""
+Test correct_bias_field_polynomial.
+"""
+
+def test_correct_bias_field_polynomial():
+
+    image, labels, bias = _make_biased_image()
+
+    # Test that the bias field is recovered, up to a constant, and that float32 is kept.
+
+    bias_corrected_image, bias_field = correct_bias_field_polynomial(image, n_classes=3, return_bias_field=True)
+    bias_correction = bias_field.evaluate()
+    assert isinstance(bias_corrected_image, np.ndarray) and bias_corrected_image.dtype == np.float32
+    assert np.allclose(bias_corrected_image, image * bias_correction)
+    assert np.std(bias_correction * bias) / np.mean(bias_correction * bias) < 1e-2
+    for label in range(3):
+        assert np.std(bias_corrected_image[labels == label]) < np.std(image[labels == label]) / 10
+
+    # Test torch.Tensor images, whose device and dtype are kept, and dispatch from correct_bias_field.
+
+    tensor_output = correct_bias_field_polynomial(torch.tensor(image, dtype=torch.float64))
+    assert isinstance(tensor_output, torch.Tensor) and tensor_output.dtype == torch.float64
+    assert np.allclose(tensor_output.numpy(), bias_corrected_image, atol=1e-4)
+    assert np.allclose(correct_bias_field(image, xyz_resolution=1, method='polynomial'), bias_corrected_image)
+
+    # Test that voxels outside mask do not inform the fit.
+
+    masked_image = image.copy()
+    masked_image[:8] = 100
+    mask = np.ones_like(image, bool)
+    mask[:8] = False
+    assert np.allclose(correct_bias_field_polynomial(masked_image, mask=mask)[8:], bias_corrected_image[8:], rtol=1e-2)
+
+    # Test improper use.
+
+    kwargs = dict(image=image, order=0)
+    expected_exception = ValueError
+    match = "order must be at least 1."
+    with pytest.raises(expected_exception, match=match):
+        correct_bias_field_polynomial(**kwargs)
+
+    kwargs = dict(image=image, xyz_resolution=1, method='not a method')
+    expected_exception = ValueError
+    match = "method must be one of"
+    with pytest.raises(expected_exception, match=match):
+        correct_bias_field(**kwargs)
+
+"""
+Test estimate_bias_field and BiasField.
+"""
+
+def test_estimate_bias_field():
+
+    image, labels, bias = _make_biased_image()
+    N4_kwargs = dict(maximumNumberOfIterations=[20, 20])
+
+    # Test that N4 reduces the bias, and that estimates are memoized regardless of n_threads.
+
+    _bias_field_cache.clear()
+    bias_field = estimate_bias_field(image, n_threads=1, **N4_kwargs)
+    assert isinstance(bias_field, BiasField) and len(_bias_field_cache) == 1
+    bias_correction = bias_field.evaluate()
+    assert np.std(bias_correction * bias) / np.mean(bias_correction * bias) < np.std(bias) / np.mean(bias)
+    assert np.array_equal(estimate_bias_field(image, n_threads=2, **N4_kwargs).evaluate(), bias_correction)
+    assert len(_bias_field_cache) == 1
+    estimate_bias_field(image, maximumNumberOfIterations=[10, 10])
+    assert len(_bias_field_cache) == 2
+
+    # Test applying a bias field to another channel, at another resolution, and to a torch.Tensor.
+
+    other_channel = image[::2, ::2, ::2] * 3
+    assert np.allclose(bias_field.apply(other_channel), other_channel * bias_field.evaluate(other_channel.shape))
+    assert np.allclose(bias_field.evaluate(other_channel.shape), bias_correction[::2, ::2, ::2], atol=2e-2)
+    assert bias_field.apply(image).dtype == np.float32
+    tensor_output = bias_field.apply(torch.tensor(image))
+    assert isinstance(tensor_output, torch.Tensor) and np.allclose(tensor_output.numpy(), bias_field.apply(image))
+    out = np.empty_like(image)
+    assert bias_field.apply(image, out=out) is out
+
+    # Test that correct_bias_field returns the bias field it applied.
+
+    bias_corrected_image, bias_field = correct_bias_field(image, xyz_resolution=1, return_bias_field=True, **N4_kwargs)
+    assert np.allclose(bias_corrected_image, bias_field.apply((image - image.min()) / (image.max() - image.min()) + 1))
+
+    # Test improper use.
+
+    kwargs = dict(image=image, method='not a method')
+    expected_exception = ValueError
+    match = "method must be one of"
+    with pytest.raises(expected_exception, match=match):
+        estimate_bias_field(**kwargs)
+
+    kwargs = dict(image=image, n_threads=0)
+    expected_exception = ValueError
+    match = "n_threads must be at least 1."
+    with pytest.raises(expected_exception, match=match):
+        estimate_bias_field(**kwargs)
+
+    kwargs = dict(image=image, not_a_parameter=1)
+    expected_exception = TypeError
+    match = "not_a_parameter is not a parameter of N4BiasFieldCorrection."
+    with pytest.raises(expected_exception, match=match):
+        estimate_bias_field(**kwargs)
+
+    kwargs = dict(shape=(10, 10))
+    expected_exception = ValueError
+    match = "shape must have as many dimensions as the image the bias field was estimated from."
+    with pytest.raises(expected_exception, match=match):
+        bias_field.evaluate(**kwargs)
+
+    kwargs = dict(shape=(10, 10), scale_factors=(2, 2))
+    expected_exception = ValueError
+    match = "Exactly one of log_correction and coefficients must be provided."
+    with pytest.raises(expected_exception, match=match):
+        BiasField(**kwargs)
+
+"""
+Test remove_grid_artifact.
+"""
+
+def test_remove_grid_artifact(tmp_path):
+
+    image = np.random.rand(30, 20, 25) + 1
+    mask = np.random.rand(*image.shape) > 0.3
+
+    # Test equivalence with projecting the full masked image, along each axis.
+
+    for z_axis in range(3):
+        masked_image = image * mask
+        mean_across_z = np.sum(masked_image, axis=z_axis) / np.sum(mask, axis=z_axis)
+        correct_output = masked_image * np.expand_dims(gaussian_filter(mean_across_z, 3) / mean_across_z, z_axis)
+        assert np.allclose(remove_grid_artifact(image, z_axis=z_axis, sigma=3, mask=mask), correct_output)
+
+    # Test that the Otsu mask matches sitk.OtsuThreshold, for bimodal data with no intensities near the threshold.
+
+    bimodal_image = image + 2 * (np.random.rand(*image.shape) > 0.5)
+    otsu_mask = sitk.GetArrayFromImage(sitk.OtsuThreshold(sitk.GetImageFromArray(bimodal_image)))
+    assert np.allclose(remove_grid_artifact(bimodal_image, sigma=3, mask='Otsu'), remove_grid_artifact(bimodal_image, sigma=3, mask=otsu_mask))
+
+    # Test writing in place into a np.memmap, in bounded memory.
+
+    correct_output = remove_grid_artifact(image)
+    memmap_image = np.memmap(tmp_path / 'image.dat', dtype=image.dtype, mode='w+', shape=image.shape)
+    memmap_image[:] = image
+    assert remove_grid_artifact(memmap_image, out=memmap_image) is memmap_image
+    assert np.allclose(np.memmap(tmp_path / 'image.dat', dtype=image.dtype, mode='r', shape=image.shape), correct_output)
+
+    large_image = np.random.rand(64, 64, 256).astype(np.float32) + 1
+    tracemalloc.start()
+    remove_grid_artifact(large_image, out=large_image)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < large_image.nbytes / 2
+
+    # Test improper use.
+
+    kwargs = dict(image=image, mask='not Otsu')
+    expected_exception = ValueError
+    match = "If mask is a str, it must be 'Otsu'."
+    with pytest.raises(expected_exception, match=match):
+        remove_grid_artifact(**kwargs)
+
+    kwargs = dict(image=image, mask=mask[0])
+    expected_exception = ValueError
+    match = "mask must have the shape of image."
+    with pytest.raises(expected_exception, match=match):
+        remove_grid_artifact(**kwargs)
+
+    kwargs = dict(image=image, out=image[0])
+    expected_exception = ValueError
+    match = "out must have the shape of the result."
+    with pytest.raises(expected_exception, match=match):
+        remove_grid_artifact(**kwargs)
+
+"""
+Perform tests.
+"""
+
+if __name__ == "__main__":
+    from pathlib import Path
+    from tempfile import TemporaryDirectory
+    test_correct_bias_field_polynomial()
+    test_estimate_bias_field()
+    with TemporaryDirectory() as tmp_dir:
+        test_remove_grid_artifact(Path(tmp_dir))
@@ -0,0 +1,66 @@
+import pytest
+
+import numpy as np
+
+from ardent.preprocessing.foreground import detect_foreground
+from ardent.preprocessing.foreground import compute_foreground_bounding_box
+from ardent.preprocessing.foreground import crop_to_foreground
+
+"""
+Test detect_foreground.
+"""
+
+def test_detect_foreground():
+
+    image = np.zeros((40, 30, 20))
+    image[8:16, 12:20, 4:8] = 1
+
+    foreground = detect_foreground(image, scale_factors=4)
+    assert foreground.shape == (10, 8, 5)
+    assert np.array_equal(np.argwhere(foreground).min(axis=0), [2, 3, 1])
+    assert np.array_equal(np.argwhere(foreground).max(axis=0), [3, 4, 1])
+
+    # Test an explicit threshold.
+
+    assert not np.any(detect_foreground(image, scale_factors=4, threshold=1))
+
+"""
+Test compute_foreground_bounding_box and crop_to_foreground.
+"""
+
+def test_crop_to_foreground():
+
+    image = np.random.rand(36, 30, 21) * 0.1
+    image[9:15, 12:21, 3:6] += 1
+
+    # Test that the padded bounding box contains the foreground and is clipped to the image.
+
+    bounding_box = compute_foreground_bounding_box(image, scale_factors=3, padding=[2, 0, 10])
+    assert np.array_equal(bounding_box, [[7, 17], [12, 21], [0, 16]])
+
+    # Test that the crop is a view of the bounding box.
+
+    cropped_image, bounding_box = crop_to_foreground(image, scale_factors=3, padding=1)
+    assert cropped_image.shape == tuple(bounding_box[:, 1] - bounding_box[:, 0])
+    assert np.shares_memory(cropped_image, image)
+    assert np.array_equal(cropped_image, image[tuple(slice(start, stop) for start, stop in bounding_box)])
+
+    # Test that an image with no foreground is not cropped.
+
+    assert np.array_equal(compute_foreground_bounding_box(np.ones((6, 6))), [[0, 6], [0, 6]])
+
+    # Test improper use.
+
+    kwargs = dict(image=image, padding=-1)
+    expected_exception = ValueError
+    match = "Every element of padding must be non-negative."
+    with pytest.raises(expected_exception, match=match):
+        compute_foreground_bounding_box(**kwargs)
+
+"""
+Perform tests.
+"""
+
+if __name__ == "__main__":
+    test_detect_foreground()
+    test_crop_to_foreground()
@@ -0,0 +1,77 @@
+import pytest
+
+import numpy as np
+
+from ardent.preprocessing.normalization import cast_to_typed_array
+from ardent.preprocessing.normalization import normalize_by_MAD
+from ardent.preprocessing.normalization import center_to_mean
+from ardent.preprocessing.normalization import pad
+
+"""
+Test cast_to_typed_array.
+"""
+
+def test_cast_to_typed_array():
+
+    data = np.arange(6, dtype=np.float32).reshape(2,3)
+
+    assert cast_to_typed_array(data, dtype=np.float32, copy=False) is data
+    assert cast_to_typed_array(data, dtype=np.float32) is not data
+    assert cast_to_typed_array(data, dtype=float, copy=False).dtype == float
+
+"""
+Test out for normalize_by_MAD, center_to_mean, and pad.
+"""
+
+def test_out():
+
+    data = np.random.rand(20, 15, 10)
+
+    # Test equivalence with allocating the output.
+
+    for function in [normalize_by_MAD, center_to_mean]:
+        correct_output = function(data)
+        out = np.empty_like(data)
+        assert function(data, out=out) is out
+        assert np.allclose(out, correct_output)
+
+    correct_output = pad(data, pad_width=[[1, 2], [0, 3], [4, 4]], constant_values=7)
+    out = np.empty(correct_output.shape)
+    assert pad(data, pad_width=[[1, 2], [0, 3], [4, 4]], constant_values=7, out=out) is out
+    assert np.array_equal(out, correct_output)
+    out = np.empty(np.add(data.shape, 4))
+    assert np.array_equal(pad(data, pad_width=2, mode='edge', out=out), pad(data, pad_width=2, mode='edge'))
+
+    # Test operating in place.
+
+    correct_output = center_to_mean(normalize_by_MAD(data))
+    assert center_to_mean(normalize_by_MAD(data, out=data), out=data) is data
+    assert np.allclose(data, correct_output)
+
+    # Test improper use.
+
+    kwargs = dict(data=data, out=np.empty((20, 15)))
+    expected_exception = ValueError
+    match = "out must have the shape of the result."
+    with pytest.raises(expected_exception, match=match):
+        center_to_mean(**kwargs)
+
+    kwargs = dict(data=data, pad_width=1, out=np.empty(data.shape))
+    expected_exception = ValueError
+    match = "out must have the shape of the result."
+    with pytest.raises(expected_exception, match=match):
+        pad(**kwargs)
+
+    kwargs = dict(data=data, out=data.tolist())
+    expected_exception = TypeError
+    match = "out must be of type np.ndarray."
+    with pytest.raises(expected_exception, match=match):
+        normalize_by_MAD(**kwargs)
+
+"""
+Perform tests.
+"""
+
+if __name__ == "__main__":
+    test_cast_to_typed_array()
+    test_out()
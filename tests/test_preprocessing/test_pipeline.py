@@ -0,0 +1,93 @@
+import pytest
+
+import numpy as np
+
+from ardent.preprocessing import preprocess
+from ardent.preprocessing.pipeline import PreprocessingPipeline
+from ardent.preprocessing.normalization import cast_to_typed_array
+from ardent.preprocessing.normalization import normalize_by_MAD
+from ardent.preprocessing.normalization import center_to_mean
+from ardent.preprocessing.normalization import pad
+from ardent.preprocessing.resampling import downsample_image
+
+"""
+Test PreprocessingPipeline.
+"""
+
+def test_PreprocessingPipeline():
+
+    image = np.random.randint(0, 1000, (20, 15, 10)).astype(np.uint16)
+
+    # Test equivalence with performing each step in turn, with fused steps.
+
+    pipeline = PreprocessingPipeline(['cast_to_typed_array', ('pad', dict(pad_width=3)), 'normalize_by_MAD', 'center_to_mean'], profile=True)
+    correct_output = center_to_mean(normalize_by_MAD(pad(cast_to_typed_array(image), pad_width=3)))
+    output = pipeline.apply(image)
+    assert output.dtype == float
+    assert np.allclose(output, correct_output)
+    assert [step_report['step'] for step_report in pipeline.report] == ['cast_to_typed_array+pad', 'normalize_by_MAD+center_to_mean']
+    assert all(step_report['peak_bytes'] >= 0 for step_report in pipeline.report)
+
+    # Test that a pad with per-side constant_values is not fused, and that the default pad_width is that of pad.
+
+    pipeline = PreprocessingPipeline(['cast_to_typed_array', ('pad', dict(pad_width=1, constant_values=(0, 5)))])
+    assert np.array_equal(pipeline.apply(np.ones((3, 4))), pad(cast_to_typed_array(np.ones((3, 4))), pad_width=1, constant_values=(0, 5)))
+    assert len(pipeline.report) == 2
+    assert np.array_equal(PreprocessingPipeline(['cast_to_typed_array', 'pad']).apply(np.ones((3, 4))), pad(np.ones((3, 4))))
+
+    # Test equivalence with unfused steps, including a callable, keeping float32.
+
+    pipeline = PreprocessingPipeline([('cast_to_typed_array', dict(dtype=np.float32)), 'normalize_by_MAD',
+        (downsample_image, dict(scale_factors=2)), 'center_to_mean'])
+    correct_output = center_to_mean(downsample_image(normalize_by_MAD(image.astype(np.float32)), 2))
+    output = pipeline(image)
+    assert output.dtype == np.float32
+    assert np.allclose(output, correct_output, atol=1e-5)
+    assert len(pipeline.report) == 4 and 'peak_bytes' not in pipeline.report[0]
+
+    # Test that data is modified only if inplace.
+
+    image = np.random.rand(10, 10)
+    image_copy = image.copy()
+    pipeline = PreprocessingPipeline(['normalize_by_MAD', 'center_to_mean'])
+    output = pipeline.apply(image)
+    assert np.array_equal(image, image_copy)
+    assert pipeline.apply(image, inplace=True) is image
+    assert np.allclose(image, output)
+
+    # Test preprocess, which chains its processes.
+
+    assert np.allclose(preprocess([image_copy, image_copy], ['normalize_by_MAD', 'center_to_mean'])[1], output)
+
+    # Test that definition identifies the steps and their kwargs.
+
+    assert PreprocessingPipeline([('pad', dict(pad_width=1))]).definition == PreprocessingPipeline([('pad', dict(pad_width=1))]).definition
+    assert PreprocessingPipeline([('pad', dict(pad_width=1))]).definition != PreprocessingPipeline([('pad', dict(pad_width=2))]).definition
+    assert 'downsample_image' in PreprocessingPipeline([(downsample_image, dict(scale_factors=2))]).definition
+
+    # Test improper use.
+
+    kwargs = dict(steps=['not a function'])
+    expected_exception = ValueError
+    match = "Process not a function not recognized."
+    with pytest.raises(expected_exception, match=match):
+        PreprocessingPipeline(**kwargs)
+
+    kwargs = dict(steps=[('pad', dict(not_a_kwarg=1))])
+    expected_exception = TypeError
+    match = "The kwargs of step pad are not accepted by its function."
+    with pytest.raises(expected_exception, match=match):
+        PreprocessingPipeline(**kwargs)
+
+    kwargs = dict(steps=[('pad', 5)])
+    expected_exception = TypeError
+    match = "A tuple step must be of the form"
+    with pytest.raises(expected_exception, match=match):
+        PreprocessingPipeline(**kwargs)
+
+"""
+Perform tests.
+"""
+
+if __name__ == "__main__":
+    test_PreprocessingPipeline()
@@ -0,0 +1,85 @@
+import pytest
+
+import numpy as np
+from unittest import mock
+
+import ardent.preprocessing.pyramid
+from ardent.preprocessing.pyramid import ImagePyramid
+from ardent.preprocessing.resampling import downsample_image
+from ardent.preprocessing.resampling import change_resolution_to
+
+"""
+Test ImagePyramid.
+"""
+
+def test_ImagePyramid(tmp_path):
+
+    image = np.random.rand(40, 30, 9)
+
+    # Test levels built by downsample_image.
+
+    pyramid = ImagePyramid(image, xyz_resolution=[1, 2, 3], scale_factors=[2, 2, 1], n_levels=5)
+    assert len(pyramid) == 5
+    assert np.array_equal(pyramid[0], image)
+    assert np.array_equal(pyramid[2], downsample_image(downsample_image(image, [2, 2, 1]), [2, 2, 1]))
+    assert np.array_equal(pyramid.xyz_resolutions[2], [4, 8, 3])
+    assert pyramid.level_nearest([5, 10, 3]) == 2
+    assert not pyramid[1].flags.writeable
+
+    # Test that fewer levels are built once a level is smaller than scale_factors.
+
+    assert len(ImagePyramid(image, scale_factors=4, n_levels=5)) == 2
+
+    # Test that a new ImagePyramid of the same image reuses the cached levels.
+
+    with mock.patch.object(ardent.preprocessing.pyramid, 'downsample_image', side_effect=AssertionError):
+        cached_pyramid = ImagePyramid(image.copy(), xyz_resolution=[1, 2, 3], scale_factors=[2, 2, 1], n_levels=5)
+        assert np.array_equal(cached_pyramid[2], pyramid[2])
+
+    # Test levels built by change_resolution_to and persisted to cache_dir.
+
+    kwargs = dict(image=image, xyz_resolution=1, xyz_resolutions=[2, [3, 4, 5]], cache_dir=tmp_path)
+    pyramid = ImagePyramid(**kwargs)
+    correct_output, correct_resolution = change_resolution_to(image, 1, [3, 4, 5], return_true_resolution=True)
+    assert np.array_equal(pyramid[1], correct_output)
+    assert np.array_equal(pyramid.xyz_resolutions[1], correct_resolution)
+
+    ImagePyramid.clear_cache()
+    with mock.patch.object(ardent.preprocessing.pyramid, 'change_resolution_to', side_effect=AssertionError):
+        cached_pyramid = ImagePyramid(**kwargs)
+        assert np.array_equal(cached_pyramid[1], correct_output)
+        assert np.array_equal(cached_pyramid.xyz_resolutions[1], correct_resolution)
+
+    # Test that different parameters are not confused.
+
+    assert ImagePyramid(image, scale_factors=3)[1].shape == (14, 10, 3)
+
+    # Test improper use.
+
+    kwargs = dict(image=image, n_levels=0)
+    expected_exception = ValueError
+    match = "n_levels must be at least 1."
+    with pytest.raises(expected_exception, match=match):
+        ImagePyramid(**kwargs)
+
+    kwargs = dict(image=image, scale_factors=0)
+    expected_exception = ValueError
+    match = "Every element of scale_factors must be at least 1."
+    with pytest.raises(expected_exception, match=match):
+        ImagePyramid(**kwargs)
+
+    kwargs = dict(image=image, method='nearest')
+    expected_exception = ValueError
+    match = "resample_kwargs are only used with xyz_resolutions."
+    with pytest.raises(expected_exception, match=match):
+        ImagePyramid(**kwargs)
+
+"""
+Perform tests.
+"""
+
+if __name__ == "__main__":
+    from pathlib import Path
+    from tempfile import TemporaryDirectory
+    with TemporaryDirectory() as tmp_dir:
+        test_ImagePyramid(Path(tmp_dir))
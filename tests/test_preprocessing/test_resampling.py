@@ -1,16 +1,22 @@
 import pytest
 
 import numpy as np
+import torch
 from scipy.interpolate import interpn
 
 from ardent.preprocessing.resampling import _validate_xyz_resolution
 from ardent.preprocessing.resampling import _compute_axes
 from ardent.preprocessing.resampling import _compute_coords
 from ardent.preprocessing.resampling import _resample
+from ardent.preprocessing.resampling import _compute_linear_interpolation_table
+from ardent.preprocessing.resampling import _resample_separable
 from ardent.preprocessing.resampling import _downsample_along_axis
 from ardent.preprocessing.resampling import downsample_image
+from ardent.preprocessing.resampling import downsample_image_blockwise
 from ardent.preprocessing.resampling import change_resolution_to
 from ardent.preprocessing.resampling import change_resolution_by
+from ardent.preprocessing.resampling import ResamplingPlan
+from ardent.preprocessing.resampling import fourier_resample
 
 """
 Test _validate_xyz_resolution.
@@ -200,6 +206,45 @@ def test__resample():
 # xyz_scales = 1/3
 # test__resample(image=image, resolution=resolution, xyz_scales=xyz_scales)
 
+"""
+Test _compute_linear_interpolation_table.
+"""
+
+def test__compute_linear_interpolation_table():
+
+    # Test proper use.
+
+    kwargs = dict(axis=[0, 1, 2], new_axis=[0, 0.25, 1.5, 2])
+    lower_indices, upper_indices, upper_weights = _compute_linear_interpolation_table(**kwargs)
+    assert np.array_equal(lower_indices, [0, 0, 1, 1])
+    assert np.array_equal(upper_indices, [1, 1, 2, 2])
+    assert np.allclose(upper_weights, [0, 0.25, 0.5, 1])
+
+    # Test clamping of points outside the bounds of axis.
+    kwargs = dict(axis=[-1, 1], new_axis=[-1 - 1e-12, 1 + 1e-12])
+    lower_indices, upper_indices, upper_weights = _compute_linear_interpolation_table(**kwargs)
+    assert np.array_equal(lower_indices, [0, 0])
+    assert np.allclose(upper_weights, [0, 1])
+
+    # Test single-point axis.
+    kwargs = dict(axis=[3], new_axis=[3, 3])
+    lower_indices, upper_indices, upper_weights = _compute_linear_interpolation_table(**kwargs)
+    assert np.array_equal(lower_indices, [0, 0]) and np.array_equal(upper_indices, [0, 0])
+
+"""
+Test _resample_separable.
+"""
+
+def test__resample_separable():
+
+    # Test equivalence with _resample.
+
+    image = np.random.rand(6, 7, 8)
+    real_axes = _compute_axes(shape=image.shape, xyz_resolution=[1, 2, 0.5])
+    new_real_axes = _compute_axes(shape=(4, 9, 3), xyz_resolution=[1.5, 1.5, 1.5])
+    correct_output = _resample(image, real_axes, np.stack(np.meshgrid(*new_real_axes, indexing='ij'), axis=-1))
+    assert np.allclose(_resample_separable(image, real_axes, new_real_axes), correct_output)
+
 """
 Test _downsample_along_axis.
 """
@@ -344,8 +389,34 @@ def test_downsample_image():
     )
     assert np.array_equal(downsample_image(**kwargs), correct_output)
 
+    # Test uneven downsample, with and without truncation.
+    image = np.random.rand(7, 10, 5)
+    for truncate in [False, True]:
+        kwargs = dict(image=image, scale_factors=[4, 3, 2], truncate=truncate)
+        correct_output = image
+        for axis, scale_factor in enumerate([4, 3, 2]):
+            correct_output = _downsample_along_axis(correct_output, axis, scale_factor, truncate)
+        assert np.allclose(downsample_image(**kwargs), correct_output)
+
+    # Test dtype preservation and dtype and out arguments.
+    image = np.random.randint(0, 2**16, (8, 9, 10)).astype(np.uint16)
+    assert downsample_image(image, 2).dtype == float
+    assert downsample_image(image.astype(np.float32), 2).dtype == np.float32
+    kwargs = dict(image=image, scale_factors=2, dtype=np.uint16)
+    correct_output = np.rint(downsample_image(image, 2)).astype(np.uint16)
+    assert np.array_equal(downsample_image(**kwargs), correct_output)
+    out = np.empty((4, 5, 5), np.float32)
+    assert downsample_image(image, 2, out=out) is out
+    assert np.allclose(out, downsample_image(image, 2))
+
     # Test improper use.
     
+    kwargs = dict(image=np.arange(3), scale_factors=2, out=np.empty(3))
+    expected_exception = ValueError
+    match = "out must have the shape of the downsampled image."
+    with pytest.raises(expected_exception, match=match):
+        downsample_image(**kwargs)
+
     kwargs = dict(image=np.arange(3), scale_factors=0.5, truncate=False)
     expected_exception = ValueError
     match = "Every element of scale_factors must be at least 1."
@@ -372,7 +443,7 @@ def test_change_resolution_to():
         return_true_resolution=False, 
     )
     correct_output = np.arange(3*4).reshape(3,4)
-    assert np.array_equal(change_resolution_to(**kwargs), correct_output)
+    assert np.allclose(change_resolution_to(**kwargs), correct_output)
 
     # Test identity with pad_to_match_res=False.
     kwargs = dict(
@@ -386,7 +457,7 @@ def test_change_resolution_to():
         return_true_resolution=False, 
     )
     correct_output = np.arange(3*4).reshape(3,4)
-    assert np.array_equal(change_resolution_to(**kwargs), correct_output)
+    assert np.allclose(change_resolution_to(**kwargs), correct_output)
 
     # Test basic downsampling resample.
     kwargs = dict(
@@ -404,7 +475,7 @@ def test_change_resolution_to():
         real_axes=_compute_axes(shape=(3,2), xyz_resolution=(1,2)), 
         new_real_coords=_compute_coords(shape=(2,2), xyz_resolution=(3/2,2))
     )
-    assert np.array_equal(change_resolution_to(**kwargs), correct_output)
+    assert np.allclose(change_resolution_to(**kwargs), correct_output)
         
     # Test larger downsampling resample.
     kwargs = dict(
@@ -422,7 +493,7 @@ def test_change_resolution_to():
         real_axes=_compute_axes(shape=(5,7), xyz_resolution=(2,2)), 
         new_real_coords=_compute_coords(shape=(4,6), xyz_resolution=(10/4,13/6))
     )
-    assert np.array_equal(change_resolution_to(**kwargs), correct_output)
+    assert np.allclose(change_resolution_to(**kwargs), correct_output)
 
     # Test downsampling resample with pad_to_match_res=True.
     kwargs = dict(
@@ -444,7 +515,7 @@ def test_change_resolution_to():
         real_axes=_compute_axes(shape=(7,6), xyz_resolution=(4,15)), 
         new_real_coords=_compute_coords(shape=(7,5), xyz_resolution=(3,17))
     )
-    assert np.array_equal(change_resolution_to(**kwargs), correct_output)
+    assert np.allclose(change_resolution_to(**kwargs), correct_output)
     
     # Test return_true_resolution=True.
     kwargs = dict(
@@ -463,7 +534,7 @@ def test_change_resolution_to():
         new_real_coords=_compute_coords(shape=(3,3,4), xyz_resolution=np.array([5,6,7])/(3,3,4))
     ), np.divide((5,6,7), (3,3,4))
     actual_output = change_resolution_to(**kwargs)
-    assert np.array_equal(correct_output[0], actual_output[0])
+    assert np.allclose(correct_output[0], actual_output[0])
     assert np.array_equal(correct_output[1], actual_output[1])
 
     # Test err_to_higher_res=False.
@@ -483,7 +554,7 @@ def test_change_resolution_to():
         new_real_coords=_compute_coords(shape=(2,3,3), xyz_resolution=np.array([5,6,7])/(2,3,3))
     ), np.divide((5,6,7), (2,3,3))
     actual_output = change_resolution_to(**kwargs)
-    assert np.array_equal(correct_output[0], actual_output[0])
+    assert np.allclose(correct_output[0], actual_output[0])
     assert np.array_equal(correct_output[1], actual_output[1])
 
     # Test average_on_downsample=False.
@@ -502,7 +573,7 @@ def test_change_resolution_to():
         real_axes=_compute_axes(shape=(10,13), xyz_resolution=1), 
         new_real_coords=_compute_coords(shape=(2,3), xyz_resolution=np.array([10,13])/(2,3))
     )
-    assert np.array_equal(change_resolution_to(**kwargs), correct_output)
+    assert np.allclose(change_resolution_to(**kwargs), correct_output)
 
     # Test nonuniform desired_xyz_resolution.
     kwargs = dict(
@@ -520,7 +591,7 @@ def test_change_resolution_to():
         real_axes=_compute_axes(shape=(10,13), xyz_resolution=1), 
         new_real_coords=_compute_coords(shape=(5,4), xyz_resolution=np.array([10,13])/(5,4))
     )
-    assert np.array_equal(change_resolution_to(**kwargs), correct_output)
+    assert np.allclose(change_resolution_to(**kwargs), correct_output)
 
     # Test warning.
 
@@ -571,6 +642,221 @@ def test_change_resolution_by():
     out=change_resolution_by(**kwargs)
     assert np.array_equal(change_resolution_by(**kwargs), correct_output)
 
+"""
+Test ResamplingPlan.
+"""
+
+def test_ResamplingPlan():
+
+    # Test equivalence with change_resolution_to for single images and batches.
+
+    images = np.random.rand(4, 20, 17, 9)
+    for kwargs in [
+        dict(xyz_resolution=1, desired_xyz_resolution=[2.5, 0.7, 3]), 
+        dict(xyz_resolution=[4, 3, 1], desired_xyz_resolution=[3, 17, 2.2], pad_to_match_res=True), 
+        dict(xyz_resolution=2, desired_xyz_resolution=[5, 4, 3], average_on_downsample=False), 
+        dict(xyz_resolution=1, desired_xyz_resolution=[3, 2, 1], pad_to_match_res=False, method='nearest'), 
+        ]:
+        plan = ResamplingPlan(images.shape[1:], **kwargs)
+        correct_outputs = [change_resolution_to(image, **kwargs, return_true_resolution=True) for image in images]
+        for image, (correct_output, true_resolution) in zip(images, correct_outputs):
+            assert np.array_equal(plan.apply(image), correct_output)
+            assert np.array_equal(plan.true_resolution, true_resolution)
+        assert np.allclose(plan.apply(images), [correct_output for correct_output, _ in correct_outputs])
+
+    # Test backend='torch' on a batch.
+
+    plan = ResamplingPlan(images.shape[1:], xyz_resolution=1, desired_xyz_resolution=[2.5, 0.7, 3])
+    torch_output = plan.apply(torch.tensor(images), backend='torch')
+    assert isinstance(torch_output, torch.Tensor)
+    assert np.allclose(torch_output.numpy(), plan.apply(images))
+
+    # Test writing into out, including with method='nearest' and through change_resolution_to.
+
+    for kwargs in [dict(xyz_resolution=1, desired_xyz_resolution=[2.5, 0.7, 3]), dict(xyz_resolution=1, desired_xyz_resolution=[3, 2, 1], method='nearest')]:
+        plan = ResamplingPlan(images.shape[1:], **kwargs)
+        correct_output = plan.apply(images)
+        out = np.empty_like(correct_output)
+        assert plan.apply(images, out=out) is out
+        assert np.array_equal(out, correct_output)
+        out = np.empty_like(correct_output[0])
+        assert change_resolution_to(images[0], **kwargs, out=out) is out
+        assert np.array_equal(out, correct_output[0])
+
+    # Test improper use.
+
+    kwargs = dict(image=images, out=np.empty(images.shape))
+    expected_exception = ValueError
+    match = "out must have the shape of the resampled image."
+    with pytest.raises(expected_exception, match=match):
+        plan.apply(**kwargs)
+
+    kwargs = dict(image=np.zeros((20, 17)))
+    expected_exception = ValueError
+    match = "image must have the shape of this plan"
+    with pytest.raises(expected_exception, match=match):
+        plan.apply(**kwargs)
+
+    plan = ResamplingPlan(images.shape[1:], xyz_resolution=1, desired_xyz_resolution=2, method='nearest')
+    kwargs = dict(image=images[0], backend='torch')
+    expected_exception = ValueError
+    match = "backend='torch' supports only linear interpolation"
+    with pytest.raises(expected_exception, match=match):
+        plan.apply(**kwargs)
+
+"""
+Test fourier_resample.
+"""
+
+def test_fourier_resample():
+
+    # Test exactness for band-limited images on the centered grids of _compute_axes.
+
+    def band_limited_image(shape, xyz_resolution, period, frequencies, phase):
+        coords = np.meshgrid(*_compute_axes(shape, xyz_resolution), indexing='ij')
+        return np.cos(2 * np.pi * sum(frequency * coord / length for frequency, coord, length in zip(frequencies, coords, period)) + phase)
+
+    for shape, new_shape, frequencies in [
+        ((5,), (10,), (2,)), 
+        ((10,), (5,), (2,)), 
+        ((6,), (9,), (2,)), 
+        ((8, 7, 6), (16, 5, 9), (3, -2, 2)), 
+        ]:
+        image = band_limited_image(shape, 1, shape, frequencies, 0.3)
+        correct_output = band_limited_image(new_shape, np.divide(shape, new_shape), shape, frequencies, 0.3)
+        assert np.allclose(fourier_resample(image, new_shape), correct_output)
+
+    # Test axes, dtype, and workers with a round trip of a velocity field shaped as by Transformer, (nt, 3, nx, ny, nz).
+
+    velocity_field = np.random.rand(2, 3, 7, 9, 5).astype(np.float32)
+    upsampled_velocity_field = fourier_resample(velocity_field, (14, 18, 10), axes=(2, 3, 4), workers=2)
+    assert upsampled_velocity_field.shape == (2, 3, 14, 18, 10)
+    assert upsampled_velocity_field.dtype == np.float32
+    assert np.allclose(fourier_resample(upsampled_velocity_field, (7, 9, 5), axes=(2, 3, 4)), velocity_field, atol=1e-5)
+
+    # Test that upsampling a velocity field shaped as by Transformer preserves the low-frequency content of each time and component.
+
+    shape, new_shape = (8, 10, 6), (16, 15, 12)
+    component_frequencies = [(1, 0, 1), (0, -2, 1), (2, 1, 0)]
+    velocity_field = np.stack([np.stack([(time + 1) * band_limited_image(shape, 1, shape, frequencies, 0.2 * component) 
+        for component, frequencies in enumerate(component_frequencies)]) for time in range(2)])
+    correct_output = np.stack([np.stack([(time + 1) * band_limited_image(new_shape, np.divide(shape, new_shape), shape, frequencies, 0.2 * component) 
+        for component, frequencies in enumerate(component_frequencies)]) for time in range(2)])
+    assert np.allclose(fourier_resample(velocity_field, new_shape, axes=(2, 3, 4)), correct_output)
+
+    # Test complex images and origin='zero'.
+
+    image = np.random.rand(7, 9) + 1j * np.random.rand(7, 9)
+    assert np.allclose(fourier_resample(fourier_resample(image, (14, 18)), (7, 9)), image)
+    image = np.random.rand(10)
+    assert np.allclose(fourier_resample(image, (20,), origin='zero')[::2], image)
+
+    # Test improper use.
+
+    kwargs = dict(image=np.zeros((4, 4)), new_shape=(8,))
+    expected_exception = ValueError
+    match = "new_shape must have a length for each of axes."
+    with pytest.raises(expected_exception, match=match):
+        fourier_resample(**kwargs)
+
+    kwargs = dict(image=np.zeros((4, 4)), new_shape=(8, 0))
+    expected_exception = ValueError
+    match = "Every element of new_shape must be at least 1."
+    with pytest.raises(expected_exception, match=match):
+        fourier_resample(**kwargs)
+
+    kwargs = dict(image=np.zeros((4, 4)), new_shape=(8, 8), origin='not an origin')
+    expected_exception = NotImplementedError
+    match = "origin must be one of these supported values"
+    with pytest.raises(expected_exception, match=match):
+        fourier_resample(**kwargs)
+
+"""
+Test backend='torch'.
+"""
+
+def test_torch_backend():
+
+    # Test equivalence with backend='numpy' for downsample_image.
+
+    image = np.random.rand(10, 13, 7)
+    for scale_factors, truncate in [((2, 3, 4), False), ((3, 2, 4), True), ((1, 20, 1), False)]:
+        correct_output = downsample_image(image, scale_factors, truncate=truncate)
+        torch_output = downsample_image(torch.tensor(image), scale_factors, truncate=truncate, backend='torch')
+        assert isinstance(torch_output, torch.Tensor)
+        assert np.allclose(torch_output.numpy(), correct_output)
+
+    # Test equivalence with backend='numpy' for change_resolution_to.
+
+    image = np.random.rand(20, 17, 9)
+    for kwargs in [
+        dict(xyz_resolution=1, desired_xyz_resolution=[2.5, 0.7, 3]), 
+        dict(xyz_resolution=[4, 3, 1], desired_xyz_resolution=[3, 17, 2.2], pad_to_match_res=True), 
+        ]:
+        correct_output = change_resolution_to(image, **kwargs)
+        torch_output = change_resolution_to(torch.tensor(image), backend='torch', **kwargs)
+        assert isinstance(torch_output, torch.Tensor)
+        assert np.allclose(torch_output.numpy(), correct_output)
+
+    # Test improper use.
+
+    kwargs = dict(image=image, xyz_resolution=1, desired_xyz_resolution=2, backend='torch', method='nearest')
+    expected_exception = ValueError
+    match = "backend='torch' supports only linear interpolation"
+    with pytest.raises(expected_exception, match=match):
+        change_resolution_to(**kwargs)
+
+    kwargs = dict(image=image, scale_factors=2, backend='not a backend')
+    expected_exception = ValueError
+    match = "backend must be one of"
+    with pytest.raises(expected_exception, match=match):
+        downsample_image(**kwargs)
+
+"""
+Test downsample_image_blockwise.
+"""
+
+def test_downsample_image_blockwise(tmp_path):
+
+    # Test identity with downsample_image for tiles of various sizes.
+
+    image = np.random.rand(23, 10, 17)
+    for scale_factors, truncate in [(2, False), ((3, 1, 4), False), ((3, 4, 5), True), ((5, 5, 5), False)]:
+        correct_output = downsample_image(image, scale_factors, truncate=truncate)
+        for max_block_bytes in [1, 2000, 2**27]:
+            output = downsample_image_blockwise(image, scale_factors, truncate=truncate, max_block_bytes=max_block_bytes, n_workers=2)
+            assert np.array_equal(output, correct_output)
+
+    # Test memory-mapped input and output.
+
+    np.save(tmp_path / 'image.npy', image)
+    image_memmap = np.load(tmp_path / 'image.npy', mmap_mode='r')
+    output = downsample_image_blockwise(image_memmap, 3, mmap_path=tmp_path / 'output', max_block_bytes=5000)
+    assert isinstance(output, np.memmap)
+    assert np.array_equal(np.load(tmp_path / 'output.npy'), downsample_image(image, 3))
+
+    # Test dtype and out.
+
+    image = np.random.randint(0, 1000, (9, 8, 7)).astype(np.uint16)
+    correct_output = downsample_image(image, 2, dtype=np.uint16)
+    out = np.empty((5, 4, 4), np.uint16)
+    assert downsample_image_blockwise(image, 2, dtype=np.uint16, out=out, max_block_bytes=100) is out
+    assert np.array_equal(out, correct_output)
+
+    # Test improper use.
+
+    kwargs = dict(image=np.arange(3), scale_factors=2, out=np.empty(3))
+    expected_exception = ValueError
+    match = "out must have the shape of the downsampled image."
+    with pytest.raises(expected_exception, match=match):
+        downsample_image_blockwise(**kwargs)
+
+    kwargs = dict(image=np.arange(3), scale_factors=0)
+    expected_exception = ValueError
+    match = "Every element of scale_factors must be at least 1."
+    with pytest.raises(expected_exception, match=match):
+        downsample_image_blockwise(**kwargs)
+
 """
 Perform tests.
 """
@@ -580,7 +866,16 @@ if __name__ == "__main__":
     test__compute_axes()
     test__compute_coords
     test__resample()
+    test__compute_linear_interpolation_table()
+    test__resample_separable()
     test__downsample_along_axis()
     test_downsample_image()
     test_change_resolution_to()
     test_change_resolution_by()
+    test_ResamplingPlan()
+    test_fourier_resample()
+    test_torch_backend()
+    from tempfile import TemporaryDirectory
+    from pathlib import Path
+    with TemporaryDirectory() as tmp_dir:
+        test_downsample_image_blockwise(Path(tmp_dir))
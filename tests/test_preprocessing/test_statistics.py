@@ -0,0 +1,119 @@
+import pytest
+
+import numpy as np
+
+from ardent.preprocessing.statistics import _select_ranks
+from ardent.preprocessing.statistics import compute_quantiles
+from ardent.preprocessing.statistics import compute_median
+from ardent.preprocessing.statistics import compute_mean
+from ardent.preprocessing.statistics import compute_standard_deviation
+from ardent.preprocessing.statistics import compute_mean_absolute_deviation
+from ardent.preprocessing.statistics import compute_otsu_threshold
+
+"""
+Test _select_ranks.
+"""
+
+def test__select_ranks():
+
+    # Test exact selection when values must be narrowed over several passes, including negative zero and repeated values.
+
+    data = np.concatenate([np.random.normal(size=1000), np.random.normal(size=1000) * 1e-300, [0.0, -0.0, 1, 1, 1]])
+    ranks = [0, 1, 500, 1000, 1001, 2004]
+    assert np.array_equal(_select_ranks(data, ranks, bins=4, max_candidates=2), np.sort(data)[ranks])
+
+    # Test that NaN is propagated.
+
+    assert np.all(np.isnan(_select_ranks(np.array([1, np.nan, 3]), [0, 1])))
+
+"""
+Test compute_quantiles.
+"""
+
+def test_compute_quantiles(tmp_path):
+
+    # Test equivalence with np.quantile for various dtypes and shapes.
+
+    quantiles = [0, 0.01, 0.25, 0.5, 0.9, 1]
+    for data in [np.random.normal(size=(20, 15, 10)), np.random.randint(-5, 5, 1001).astype(np.int16),
+        np.round(np.random.rand(10, 7), 1).astype(np.float32), np.array(2.5)]:
+        assert np.allclose(compute_quantiles(data, quantiles), np.quantile(data.astype(float), quantiles))
+    assert isinstance(compute_median(np.arange(10)), float)
+    assert compute_median(np.arange(10)) == 4.5
+
+    # Test np.memmap data.
+
+    data = np.memmap(tmp_path / 'data.dat', dtype=np.float32, mode='w+', shape=(50, 40, 30))
+    data[:] = np.random.rand(*data.shape)
+    assert np.isclose(compute_median(data), np.median(data))
+
+    # Test that sampled estimates are bounded.
+
+    estimates, lower_bounds, upper_bounds = compute_quantiles(data, [0.1, 0.5], sample_size=10000, confidence=0.9999, random_state=0, return_bounds=True)
+    assert np.all(lower_bounds <= estimates) and np.all(estimates <= upper_bounds)
+    assert np.all(lower_bounds <= np.quantile(data, [0.1, 0.5])) and np.all(np.quantile(data, [0.1, 0.5]) <= upper_bounds)
+    assert np.all(upper_bounds - lower_bounds < 0.1)
+
+    # Test improper use.
+
+    kwargs = dict(data=np.array([]), quantiles=0.5)
+    expected_exception = ValueError
+    match = "data must not be empty."
+    with pytest.raises(expected_exception, match=match):
+        compute_quantiles(**kwargs)
+
+    kwargs = dict(data=np.arange(10), quantiles=[0.5, 2])
+    expected_exception = ValueError
+    match = r"Every element of quantiles must be in the interval \[0, 1\]."
+    with pytest.raises(expected_exception, match=match):
+        compute_quantiles(**kwargs)
+
+"""
+Test compute_mean, compute_standard_deviation, and compute_mean_absolute_deviation.
+"""
+
+def test_compute_moments():
+
+    data = np.random.rand(200, 30, 20).astype(np.float32)
+
+    assert np.isclose(compute_mean(data), np.mean(data, dtype=float))
+    assert np.isclose(compute_standard_deviation(data), np.std(data, dtype=float))
+    assert np.isclose(compute_mean_absolute_deviation(data), np.mean(np.abs(data - np.median(data)), dtype=float))
+    assert np.isclose(compute_mean_absolute_deviation(data, center=0), np.mean(data, dtype=float))
+    assert np.isclose(compute_mean_absolute_deviation(data, sample_size=10000, random_state=0), 0.25, rtol=0.05)
+
+"""
+Test compute_otsu_threshold.
+"""
+
+def test_compute_otsu_threshold():
+
+    # Test agreement with SimpleITK for bimodal data with well-separated modes.
+
+    import SimpleITK as sitk
+
+    rng = np.random.default_rng(0)
+    data = np.concatenate([rng.uniform(0, 1, 5000), rng.uniform(3, 4, 3000)]).reshape(80, 100)
+    otsu_filter = sitk.OtsuThresholdImageFilter()
+    otsu_filter.SetNumberOfHistogramBins(128)
+    otsu_filter.Execute(sitk.GetImageFromArray(data))
+    assert np.isclose(compute_otsu_threshold(data), otsu_filter.GetThreshold(), atol=np.ptp(data) / 128)
+    assert 1 < compute_otsu_threshold(data) < 3
+    assert np.array_equal(data > compute_otsu_threshold(data), data > otsu_filter.GetThreshold())
+
+    # Test constant data.
+
+    assert compute_otsu_threshold(np.full((5, 5), 2.0)) == 2.0
+
+"""
+Perform tests.
+"""
+
+if __name__ == "__main__":
+    from pathlib import Path
+    from tempfile import TemporaryDirectory
+    test__select_ranks()
+    with TemporaryDirectory() as tmp_dir:
+        test_compute_quantiles(Path(tmp_dir))
+    test_compute_moments()
+    test_compute_otsu_threshold()
@@ -0,0 +1,58 @@
+import pytest
+
+import numpy as np
+
+from ardent.presets.batch_preprocessing import basic_preprocessing
+from ardent.presets.batch_preprocessing import batch_preprocess
+from ardent.io import load
+
+"""
+Test batch_preprocess.
+"""
+
+def test_batch_preprocess(tmp_path):
+
+    images = [np.random.rand(10, 8, 6) * scale for scale in range(1, 4)]
+    file_paths = [tmp_path / f'image_{index}.npy' for index in range(len(images))]
+    for image, file_path in zip(images, file_paths):
+        np.save(file_path, image)
+    cache_dir = tmp_path / 'cache'
+
+    # Test equivalence with basic_preprocessing across processes.
+
+    result_paths = batch_preprocess(file_paths, cache_dir, n_workers=2)
+    for result_path, image in zip(result_paths, images):
+        assert np.allclose(load(result_path, mmap_mode='r')['data'], basic_preprocessing(image))
+
+    # Test that unchanged inputs are skipped on rerun.
+
+    modification_times = [result_path.stat().st_mtime_ns for result_path in result_paths]
+    assert batch_preprocess(file_paths, cache_dir, n_workers=1) == result_paths
+    assert [result_path.stat().st_mtime_ns for result_path in result_paths] == modification_times
+
+    # Test that changed inputs and processes are not confused with cached results.
+
+    np.save(file_paths[0], images[0] + 1)
+    changed_result_paths = batch_preprocess(file_paths, cache_dir, n_workers=1)
+    assert changed_result_paths[0] != result_paths[0] and changed_result_paths[1:] == result_paths[1:]
+    centered_result_paths = batch_preprocess(file_paths, cache_dir, processes=[('pad', dict(pad_width=1))], n_workers=1)
+    assert not set(centered_result_paths) & set(changed_result_paths)
+    assert load(centered_result_paths[1])['data'].shape == (12, 10, 8)
+
+    # Test improper use.
+
+    kwargs = dict(file_paths=file_paths, cache_dir=cache_dir, n_workers=0)
+    expected_exception = ValueError
+    match = "n_workers must be at least 1."
+    with pytest.raises(expected_exception, match=match):
+        batch_preprocess(**kwargs)
+
+"""
+Perform tests.
+"""
+
+if __name__ == "__main__":
+    from pathlib import Path
+    from tempfile import TemporaryDirectory
+    with TemporaryDirectory() as tmp_dir:
+        test_batch_preprocess(Path(tmp_dir))
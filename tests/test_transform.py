@@ -0,0 +1,395 @@
+import pytest
+
+import numpy as np
+import torch
+
+from ardent import io
+from ardent.transform import Transform
+from ardent.transform import _field_cache
+from ardent.lddmm.transformer import Transformer
+from ardent.lddmm.transformer import _get_grid
+from ardent.lddmm.transformer import torch_compute_deformation
+
+def _make_registered_transform(affine, template_shape, target_shape, template_resolution=(1, 1, 1), target_resolution=(1, 1, 1)):
+    """Returns a Transform in the state left by registering with the affine <affine> and a zero velocity field, without registering."""
+
+    transformer = Transformer.__new__(Transformer)
+    transformer.dtype, transformer.device = torch.float64, 'cpu'
+    transformer.Ires, transformer.Jres = list(template_resolution), list(target_resolution)
+    transformer.nxI, transformer.nxJ = tuple(template_shape), tuple(target_shape)
+    transformer.xI, transformer.XI = _get_grid(template_shape, template_resolution, torch.float64, 'cpu')
+    transformer.xJ, transformer.XJ = _get_grid(target_shape, target_resolution, torch.float64, 'cpu')
+    transformer.A = torch.tensor(affine, dtype=torch.float64)
+    transformer.v = torch.zeros((2, 3, *template_shape), dtype=torch.float64)
+    transformer.Aphi = torch_compute_deformation(transformer.A, transformer.v, transformer.xI, transformer.xJ, deform_to='template')
+    transformer.phiiAi = torch_compute_deformation(transformer.A, transformer.v, transformer.xI, transformer.xJ, deform_to='target')
+
+    transform = Transform()
+    transform.transformer = transformer
+    transform.affine = np.array(affine, float)
+    return transform
+
+def _make_affine(linear=np.eye(3), translation=(0, 0, 0)):
+    """Returns the 4x4 affine with the given linear part and translation."""
+
+    affine = np.eye(4)
+    affine[:3, :3] = linear
+    affine[:3, 3] = translation
+    return affine
+
+def _make_lean_transform(affine, template_shape, target_shape):
+    """Returns a lean Transform with the affine <affine> and a zero velocity field between grids with unit resolution."""
+
+    transform = _make_registered_transform(affine, template_shape, target_shape)
+    transform.make_lean()
+    return transform
+
+def _compute_grid(shape, resolution=(1, 1, 1)):
+    """Returns the meshgrid of the centered coordinates of a grid, as a np.ndarray of shape (3, *shape)."""
+
+    return np.stack(np.meshgrid(*[np.arange(n) * d - np.mean(np.arange(n) * d) for n, d in zip(shape, resolution)], indexing='ij'))
+
+def _apply_affine_to_points(affine, points):
+    """Returns <points>, of shape (3, ...), mapped by <affine>."""
+
+    return np.einsum('ij,j...->i...', affine[:3, :3], points) + affine[:3, 3].reshape(3, 1, 1, 1)
+
+"""
+Test make_lean.
+"""
+
+def test_make_lean():
+
+    template = np.random.rand(10, 12, 8)
+    target = np.random.rand(9, 11, 13)
+    transform = _make_registered_transform(_make_affine(np.diag([1.1, 0.9, 1]), [0.5, -1, 0.25]), template.shape, target.shape,
+        template_resolution=(1, 1, 2), target_resolution=(1, 1, 1.5))
+
+    # Test that deforming with a lean Transform matches deforming with the registered one, from a field derived once.
+
+    deformed_template = transform.apply_transform(template, deform_to='target')
+    deformed_target = transform.apply_transform(target, deform_to='template')
+    transform.make_lean()
+    assert transform.transformer is None
+    assert transform.template_shape == template.shape and transform.target_shape == target.shape
+    assert np.allclose(transform.apply_transform(template, deform_to='target'), deformed_template)
+    assert np.allclose(transform.apply_transform(target, deform_to='template'), deformed_target)
+    field = _field_cache.get((transform._field_cache_key, 'target'))
+    assert field is not None
+    transform.apply_transform(template, deform_to='target')
+    assert _field_cache.get((transform._field_cache_key, 'target')) is field
+
+    # Test improper use.
+
+    kwargs = dict()
+    expected_exception = RuntimeError
+    match = "Only a registered Transform can be made lean."
+    with pytest.raises(expected_exception, match=match):
+        transform.make_lean(**kwargs)
+
+def _make_registration_images():
+    """Returns a smooth template and a deformed, shifted, and partial copy of it as the target, for registrations."""
+
+    grid = _compute_grid((20, 18, 16))
+    template = np.exp(-np.sum((grid / np.reshape([5, 4, 4], (3, 1, 1, 1)))**2, 0)) + 0.5 * np.exp(-np.sum(((grid - np.reshape([4, 3, 0], (3, 1, 1, 1))) / 2)**2, 0))
+    target_grid = _compute_grid((16, 15, 14)) + np.reshape([1, -0.5, 0.5], (3, 1, 1, 1))
+    target = np.exp(-np.sum((target_grid / np.reshape([5.5, 4, 3.5], (3, 1, 1, 1)))**2, 0)) + 0.5 * np.exp(-np.sum(((target_grid - np.reshape([4, 3, 0], (3, 1, 1, 1))) / 2.5)**2, 0))
+    return template, target
+
+# Registering requires torch.rfft, which was removed in torch 1.8.
+requires_registration = pytest.mark.skipif(not hasattr(torch, 'rfft'), reason="Registering requires torch.rfft.")
+
+"""
+Test register with make_lean.
+"""
+
+@requires_registration
+def test_register_and_make_lean():
+
+    template, target = _make_registration_images()
+    transform = Transform()
+    transform.register(template, target, sigmaR=1e1, eV=1e-1, eL=1e-4, eT=1e-3, niter=4, naffine=1, nt=2)
+
+    # Test that the deformation of a registered Transform reflects its final affine and velocity field, as does that of a lean Transform.
+
+    deformed_template = transform.apply_transform(template, deform_to='target')
+    deformed_target = transform.apply_transform(target, deform_to='template')
+    transform.make_lean()
+    assert np.allclose(transform.apply_transform(template, deform_to='target'), deformed_template, rtol=0, atol=1e-12)
+    assert np.allclose(transform.apply_transform(target, deform_to='template'), deformed_target, rtol=0, atol=1e-12)
+
+"""
+Test compose.
+"""
+
+def test_compose():
+
+    rotation = np.array([[np.cos(0.3), -np.sin(0.3), 0], [np.sin(0.3), np.cos(0.3), 0], [0, 0, 1]])
+    translation_affine = _make_affine(translation=[1.5, -2, 0.5])
+    linear_affine = _make_affine(rotation * 1.05, [-1, 0.5, 0])
+    # first deforms from shape_0 to shape_1 and second from shape_1 to shape_2 when deforming to the template.
+    shape_0, shape_1, shape_2 = (16, 14, 12), (14, 16, 14), (12, 14, 16)
+
+    # Test that the position field deforming to the template applies second's affine and then first's. 
+    # first is a translation, whose constant displacement is interpolated exactly.
+
+    first = _make_lean_transform(translation_affine, shape_1, shape_0)
+    second = _make_lean_transform(linear_affine, shape_2, shape_1)
+    composed_transform = first.compose(second)
+    correct_positions = _apply_affine_to_points(translation_affine @ linear_affine, _compute_grid(shape_2))
+    assert np.allclose(composed_transform._get_position_field('template').numpy(), correct_positions)
+    assert not np.allclose(correct_positions, _apply_affine_to_points(linear_affine @ translation_affine, _compute_grid(shape_2)))
+    assert np.allclose(composed_transform.affine, translation_affine @ linear_affine)
+
+    # Test that the subject is resampled once, and approximately as by applying first and then second.
+
+    subject = np.sin(_compute_grid(shape_0)[0] / 4) + np.cos(_compute_grid(shape_0)[1] / 5)
+    deformed_subject = composed_transform.apply_transform(subject, deform_to='template')
+    assert deformed_subject.shape == shape_2
+    single_resampling = Transformer.interp3(first._get_axes('target'), torch.as_tensor(subject), torch.as_tensor(correct_positions)).numpy()
+    assert np.allclose(deformed_subject, single_resampling)
+    sequential_resampling = second.apply_transform(first.apply_transform(subject, deform_to='template'), deform_to='template')
+    assert np.allclose(deformed_subject[3:-3, 3:-3, 3:-3], sequential_resampling[3:-3, 3:-3, 3:-3], atol=0.2)
+
+    # Test that the position field deforming to the target applies the inverse of first's affine and then that of second's. 
+    # second is a translation.
+
+    first = _make_lean_transform(linear_affine, shape_1, shape_0)
+    second = _make_lean_transform(translation_affine, shape_2, shape_1)
+    composed_transform = first.compose(second)
+    correct_positions = _apply_affine_to_points(np.linalg.inv(linear_affine @ translation_affine), _compute_grid(shape_0))
+    assert np.allclose(composed_transform._get_position_field('target').numpy(), correct_positions)
+
+    subject = np.sin(_compute_grid(shape_2)[0] / 4) + np.cos(_compute_grid(shape_2)[1] / 5)
+    deformed_subject = composed_transform.apply_transform(subject, deform_to='target')
+    assert deformed_subject.shape == shape_0
+    sequential_resampling = first.apply_transform(second.apply_transform(subject, deform_to='target'), deform_to='target')
+    assert np.allclose(deformed_subject[3:-3, 3:-3, 3:-3], sequential_resampling[3:-3, 3:-3, 3:-3], atol=0.2)
+
+    # Test output_resolution, spanning the extent of the grid deformed to. 
+    # Both are translations, since the points of the coarser grid are interpolated through each.
+
+    other_translation_affine = _make_affine(translation=[-0.5, 1, 2])
+    first = _make_lean_transform(translation_affine, shape_1, shape_0)
+    second = _make_lean_transform(other_translation_affine, shape_2, shape_1)
+    composed_transform = first.compose(second, output_resolution=[2, 3, 1])
+    subject = np.random.rand(*shape_0)
+    deformed_subject = composed_transform.apply_transform(subject, deform_to='template')
+    output_shape = (6, 5, 16)
+    assert deformed_subject.shape == output_shape
+    correct_positions = _apply_affine_to_points(translation_affine @ other_translation_affine, _compute_grid(output_shape, [2, 3, 1]))
+    single_resampling = Transformer.interp3(first._get_axes('target'), torch.as_tensor(subject), torch.as_tensor(correct_positions)).numpy()
+    assert np.allclose(deformed_subject, single_resampling)
+
+    # Test improper use.
+
+    kwargs = dict(other=np.eye(4))
+    expected_exception = TypeError
+    match = "other must be of type Transform."
+    with pytest.raises(expected_exception, match=match):
+        first.compose(**kwargs)
+
+"""
+Test registering on crops.
+"""
+
+def test_crops():
+
+    uncropped_template_shape, uncropped_target_shape = (12, 14, 10), (11, 12, 13)
+    template_crop_box = np.array([[2, 10], [3, 12], [0, 8]])
+    target_crop_box = np.array([[1, 10], [0, 12], [4, 13]])
+    affine = _make_affine(np.diag([1.1, 0.9, 1]) + 0.02, [0.5, -1, 0.25])
+
+    # Test the offsets of the centers of the crops in the uncropped grids.
+
+    template_offset = ((template_crop_box[:, 0] + template_crop_box[:, 1] - 1) / 2 - (np.array(uncropped_template_shape) - 1) / 2)
+    target_offset = ((target_crop_box[:, 0] + target_crop_box[:, 1] - 1) / 2 - (np.array(uncropped_target_shape) - 1) / 2)
+    assert np.array_equal(template_offset, [0, 0.5, -1]) and np.array_equal(target_offset, [0, 0, 2])
+
+    # Build the Transform registered between the crops that is equivalent to affine between the uncropped grids.
+
+    cropped_affine = affine.copy()
+    cropped_affine[:3, 3] += affine[:3, :3] @ template_offset - target_offset
+    transform = _make_lean_transform(cropped_affine, tuple(template_crop_box[:, 1] - template_crop_box[:, 0]), 
+        tuple(target_crop_box[:, 1] - target_crop_box[:, 0]))
+    transform._fold_template_crop_box(template_crop_box, uncropped_template_shape, uncropped_target_shape)
+    transform.target_crop_box = target_crop_box
+    assert np.array_equal(transform._get_crop_offset('template'), template_offset)
+    assert np.array_equal(transform._get_crop_offset('target'), target_offset)
+
+    # Test that the positions match affine on the uncropped grids, inside and outside the crops.
+
+    template_grid = _compute_grid(uncropped_template_shape)
+    target_grid = _compute_grid(uncropped_target_shape)
+    assert np.allclose(transform._get_position_field('template').numpy(), _apply_affine_to_points(affine, template_grid))
+    assert np.allclose(transform._get_position_field('target').numpy(), _apply_affine_to_points(np.linalg.inv(affine), target_grid))
+    assert np.allclose(transform._get_uncropped_position_field('template', torch.as_tensor(template_grid[:, :3, :3, :3])).numpy(), 
+        _apply_affine_to_points(affine, template_grid[:, :3, :3, :3]))
+    assert transform.apply_transform(np.random.rand(*uncropped_target_shape), deform_to='template').shape == uncropped_template_shape
+
+    # Test that a crop of the registered template accumulates into the crop of the template.
+
+    transform._fold_template_crop_box([[1, 6], [0, 9], [2, 7]], tuple(template_crop_box[:, 1] - template_crop_box[:, 0]), 
+        tuple(target_crop_box[:, 1] - target_crop_box[:, 0]))
+    assert np.array_equal(transform.template_crop_box, [[3, 8], [3, 12], [2, 7]])
+    assert np.array_equal(transform.target_crop_box, target_crop_box)
+    assert transform.uncropped_template_shape == uncropped_template_shape
+
+    # Test that a crop of the registered template of an uncropped Transform spans the whole target.
+
+    transform = _make_lean_transform(affine, (5, 9, 5), uncropped_target_shape)
+    transform._fold_template_crop_box([[1, 6], [0, 9], [2, 7]], uncropped_template_shape, uncropped_target_shape)
+    assert np.array_equal(transform.template_crop_box, [[1, 6], [0, 9], [2, 7]])
+    assert np.array_equal(transform.target_crop_box, [[0, 11], [0, 12], [0, 13]])
+    assert transform.uncropped_template_shape == uncropped_template_shape and transform.uncropped_target_shape == uncropped_target_shape
+
+"""
+Test save and load.
+"""
+
+def test_save_and_load(tmp_path):
+
+    template_shape, target_shape = (10, 12, 8), (9, 11, 13)
+    transform = _make_lean_transform(_make_affine(np.diag([1.1, 0.9, 1]), [0.5, -1, 0.25]), template_shape, target_shape)
+    transform.v = np.random.rand(2, 3, *template_shape) * 0.2
+    transform.registration_parameters = dict(sigmaR=1.0, niter=5)
+    subject = np.random.rand(*template_shape)
+    deformed_subject = transform.apply_transform(subject, deform_to='target')
+
+    # Test an uncompressed round trip in format_version 1, with the velocity field memory-mapped.
+
+    file_path = tmp_path / 'transform.npz'
+    transform.save(file_path)
+    assert int(np.load(file_path)['format_version']) == 1
+    loaded_transform = Transform()
+    loaded_transform.load(file_path, mmap_mode='r')
+    assert isinstance(loaded_transform.v, np.memmap)
+    assert np.array_equal(loaded_transform.affine, transform.affine) and np.array_equal(loaded_transform.v, transform.v)
+    assert loaded_transform.template_shape == template_shape and loaded_transform.target_shape == target_shape
+    assert np.array_equal(loaded_transform.template_resolution, [1, 1, 1]) and np.array_equal(loaded_transform.target_resolution, [1, 1, 1])
+    assert loaded_transform.registration_parameters == transform.registration_parameters
+    assert loaded_transform.template_crop_box is None
+    assert np.allclose(loaded_transform.apply_transform(subject, deform_to='target'), deformed_subject)
+
+    # Test a compressed round trip with the velocity field stored as float16, which cannot be memory-mapped.
+
+    transform.save(file_path, compress=True, v_dtype=np.float16)
+    loaded_transform = Transform()
+    loaded_transform.load(file_path, mmap_mode='r')
+    assert not isinstance(loaded_transform.v, np.memmap)
+    assert loaded_transform.v.dtype == np.float16
+    assert np.allclose(loaded_transform.v, transform.v, atol=1e-3)
+
+    # Test that array and tensor registration parameters are saved as lists and unserializable ones are dropped.
+
+    registration_parameters = transform.registration_parameters
+    transform.registration_parameters = dict(sigmaR=np.float64(1.0), sigmaA=np.array([2.0, 3.0]), 
+        CA=torch.tensor([0.5, 1.5], dtype=torch.float64), sigmaM=[1, 2], callback=object())
+    with pytest.warns(UserWarning, match="The registration parameter callback cannot be serialized and is not saved."):
+        transform.save(file_path)
+    loaded_transform = Transform()
+    loaded_transform.load(file_path)
+    assert loaded_transform.registration_parameters == dict(sigmaR=1.0, sigmaA=[2.0, 3.0], CA=[0.5, 1.5], sigmaM=[1, 2])
+    transform.registration_parameters = registration_parameters
+
+    # Test a round trip in format_version 2, with crop boxes.
+
+    transform.template_crop_box = np.array([[1, 11], [0, 12], [2, 10]])
+    transform.target_crop_box = np.array([[0, 9], [3, 14], [0, 13]])
+    transform.uncropped_template_shape = (12, 12, 12)
+    transform.uncropped_target_shape = (9, 14, 13)
+    uncropped_subject = np.random.rand(12, 12, 12)
+    deformed_subject = transform.apply_transform(uncropped_subject, deform_to='target')
+    transform.save(file_path)
+    assert int(np.load(file_path)['format_version']) == 2
+    loaded_transform = Transform()
+    loaded_transform.load(file_path)
+    assert np.array_equal(loaded_transform.template_crop_box, transform.template_crop_box)
+    assert np.array_equal(loaded_transform.target_crop_box, transform.target_crop_box)
+    assert loaded_transform.uncropped_template_shape == (12, 12, 12) and loaded_transform.uncropped_target_shape == (9, 14, 13)
+    assert deformed_subject.shape == (9, 14, 13)
+    assert np.allclose(loaded_transform.apply_transform(uncropped_subject, deform_to='target'), deformed_subject)
+
+    # Test loading a Transform pickled by earlier versions.
+
+    legacy_file_path = tmp_path / 'legacy_transform.pkl'
+    io.save_pickled(transform, legacy_file_path)
+    loaded_transform = Transform()
+    loaded_transform.load(legacy_file_path)
+    assert np.array_equal(loaded_transform.affine, transform.affine) and np.array_equal(loaded_transform.v, transform.v)
+    assert np.array_equal(loaded_transform.template_crop_box, transform.template_crop_box)
+    assert np.allclose(loaded_transform.apply_transform(uncropped_subject, deform_to='target'), deformed_subject)
+
+    # Test improper use.
+
+    kwargs = dict(file_path=tmp_path / 'transform.pkl')
+    expected_exception = ValueError
+    match = "file_path must have the suffix '.npz'."
+    with pytest.raises(expected_exception, match=match):
+        transform.save(**kwargs)
+
+    newer_file_path = tmp_path / 'newer_transform.npz'
+    io.save(dict(np.load(file_path), format_version=np.array(3)), newer_file_path)
+    kwargs = dict(file_path=newer_file_path)
+    expected_exception = ValueError
+    match = "file_path was saved in a newer format than is supported."
+    with pytest.raises(expected_exception, match=match):
+        Transform().load(**kwargs)
+
+    kwargs = dict(file_path=tmp_path / 'unregistered_transform.npz')
+    expected_exception = RuntimeError
+    match = "Only a registered Transform can be saved."
+    with pytest.raises(expected_exception, match=match):
+        Transform().save(**kwargs)
+
+    kwargs = dict(file_path=tmp_path / 'composed_transform.npz')
+    expected_exception = NotImplementedError
+    match = "A composed Transform cannot be saved."
+    with pytest.raises(expected_exception, match=match):
+        transform.compose(transform).save(**kwargs)
+
+"""
+Test register with crops, save, and load.
+"""
+
+@requires_registration
+def test_register_and_save_and_load(tmp_path):
+
+    template, target = _make_registration_images()
+    # Surround template and target with background for crop_to_foreground to remove.
+    template, target = np.pad(template, 6), np.pad(target, [(4, 6), (5, 3), (2, 7)])
+    transform = Transform()
+    transform.register(template, target, sigmaR=1e1, eV=1e-1, eL=1e-4, eT=1e-3, niter=4, naffine=1, nt=2, 
+        crop_to_foreground=dict(scale_factors=1, padding=2), crop_template=True)
+    assert transform.template_crop_box is not None and transform.target_crop_box is not None
+
+    # Test that a cropped and registered Transform is deformed identically after a round trip.
+
+    deformed_template = transform.apply_transform(template, deform_to='target')
+    deformed_target = transform.apply_transform(target, deform_to='template')
+    assert deformed_template.shape == target.shape and deformed_target.shape == template.shape
+    file_path = tmp_path / 'transform.npz'
+    transform.save(file_path)
+    loaded_transform = Transform()
+    loaded_transform.load(file_path)
+    assert np.array_equal(loaded_transform.template_crop_box, transform.template_crop_box)
+    assert np.array_equal(loaded_transform.target_crop_box, transform.target_crop_box)
+    assert np.allclose(loaded_transform.apply_transform(template, deform_to='target'), deformed_template, rtol=0, atol=1e-12)
+    assert np.allclose(loaded_transform.apply_transform(target, deform_to='template'), deformed_target, rtol=0, atol=1e-12)
+
+"""
+Perform tests.
+"""
+
+if __name__ == "__main__":
+    from pathlib import Path
+    from tempfile import TemporaryDirectory
+    test_make_lean()
+    if hasattr(torch, 'rfft'):
+        test_register_and_make_lean()
+    test_compose()
+    test_crops()
+    with TemporaryDirectory() as tmp_dir:
+        test_save_and_load(Path(tmp_dir))
+        if hasattr(torch, 'rfft'):
+            test_register_and_save_and_load(Path(tmp_dir))
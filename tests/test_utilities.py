@@ -4,6 +4,12 @@ import numpy as np
 
 from ardent.utilities import _validate_scalar_to_multi
 from ardent.utilities import _validate_ndarray
+from ardent.utilities import _LRUCache
+from ardent.utilities import _compute_content_hash
+from ardent.utilities import _compute_file_hash
+from ardent.utilities import _DiskCache
+from ardent.utilities import set_default_dtype
+from ardent.utilities import get_default_dtype
 
 """
 Test _validate_scalar_to_multi.
@@ -103,6 +109,15 @@ def test__validate_ndarray():
     correct_output = np.array([7])
     assert np.array_equal(_validate_ndarray(**kwargs), correct_output)
 
+    # Test that copy=False returns array itself, or a view of it, where it already complies.
+
+    array = np.arange(3, dtype=float)
+    assert _validate_ndarray(array, dtype=float, copy=False) is array
+    assert _validate_ndarray(array, dtype=float) is not array
+    assert not np.shares_memory(_validate_ndarray(array, dtype=int, copy=False), array)
+    broadcast_array = _validate_ndarray(array, broadcast_to_shape=(2,3), copy=False)
+    assert np.shares_memory(broadcast_array, array) and not broadcast_array.flags.writeable
+
     # Test improper use.
 
     # Validate arguments.
@@ -169,6 +184,182 @@ def test__validate_ndarray():
     with pytest.raises(expected_exception, match=match):
         _validate_ndarray(**kwargs)
 
+"""
+Test _LRUCache.
+"""
+
+def test__LRUCache():
+
+    # Test eviction by max_bytes.
+
+    cache = _LRUCache(max_bytes=200)
+    cache.put('a', np.zeros(10)) # 80 bytes.
+    cache.put('b', np.zeros(10)) # 80 bytes.
+    # Access 'a' so that 'b' is the least recently used.
+    assert cache.get('a') is not None
+    cache.put('c', np.zeros(10)) # 80 bytes.
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert cache.nbytes == 160
+
+    # Test that values larger than max_bytes are not stored.
+
+    cache.put('d', np.zeros(100))
+    assert 'd' not in cache
+    assert len(cache) == 2
+
+    # Test eviction by max_entries.
+
+    cache.resize(max_entries=1)
+    assert len(cache) == 1 and 'c' in cache
+    assert cache.get('a', 'default') == 'default'
+
+    # Test pop and clear.
+
+    assert cache.pop('c') is not None
+    assert cache.nbytes == 0
+    cache.put('e', [np.zeros(2), np.zeros(3)])
+    assert cache.nbytes == 40
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
+
+"""
+Test _compute_content_hash.
+"""
+
+def test__compute_content_hash():
+
+    array = np.arange(60, dtype=float).reshape(3, 4, 5)
+    content_hash = _compute_content_hash(array)
+
+    # Test that the hash does not depend on memory layout or slab size.
+
+    assert _compute_content_hash(np.asfortranarray(array)) == content_hash
+    assert _compute_content_hash(array, chunk_bytes=1) == content_hash
+
+    # Test that the hash depends on contents, shape, and dtype.
+
+    modified_array = array.copy()
+    modified_array[2, 3, 4] += 1
+    assert _compute_content_hash(modified_array) != content_hash
+    assert _compute_content_hash(array.reshape(4, 3, 5)) != content_hash
+    assert _compute_content_hash(array.astype(np.float32)) != _compute_content_hash(array.astype(np.float32).view(np.int32))
+
+"""
+Test _compute_file_hash.
+"""
+
+def test__compute_file_hash(tmp_path):
+
+    file_path = tmp_path / 'file.bin'
+    file_path.write_bytes(bytes(range(256)) * 10)
+    file_hash = _compute_file_hash(file_path)
+
+    # Test that the hash does not depend on chunk size but does depend on contents.
+
+    assert _compute_file_hash(file_path, chunk_bytes=7) == file_hash
+    file_path.write_bytes(bytes(range(256)) * 9)
+    assert _compute_file_hash(file_path) != file_hash
+
+"""
+Test _DiskCache.
+"""
+
+def test__DiskCache(tmp_path):
+
+    cache = _DiskCache(tmp_path / 'cache')
+    key = ('hash', dict(b=[1, 2], a=0.5), 3)
+    arrays = dict(image=np.random.rand(3, 4), resolution=np.array([1., 2.]))
+
+    assert cache.get(key, 'default') == 'default'
+    cache.put(key, arrays)
+    assert key in cache
+    # Keys are compared by their JSON serialization, independent of dict ordering.
+    assert ('hash', dict(a=0.5, b=[1, 2]), 3) in cache
+    assert ('hash', dict(a=0.5, b=[1, 2]), 4) not in cache
+    for name, array in _DiskCache(tmp_path / 'cache').get(key).items():
+        assert np.array_equal(array, arrays[name])
+
+    assert cache.pop(key) is not None
+    assert key not in cache
+    cache.put(key, arrays)
+    cache.clear()
+    assert key not in cache
+
+"""
+Test set_default_dtype.
+"""
+
+def _measure_peak_bytes(function, *args, **kwargs):
+    """Returns the result of function and the peak memory it allocated beyond that result, as measured by tracemalloc."""
+
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        result = function(*args, **kwargs)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, peak_bytes - result.nbytes
+
+def test_set_default_dtype():
+
+    from ardent.preprocessing.normalization import cast_to_typed_array
+    from ardent.preprocessing.normalization import normalize_by_MAD
+    from ardent.preprocessing.normalization import center_to_mean
+    from ardent.preprocessing.pipeline import PreprocessingPipeline
+    from ardent.preprocessing.resampling import downsample_image
+    from ardent.preprocessing.resampling import ResamplingPlan
+    from ardent.preprocessing.resampling import fourier_resample
+
+    image = np.random.randint(0, 2**16, (128, 128, 64)).astype(np.uint16)
+    full_float64_nbytes = image.size * np.dtype(np.float64).itemsize
+    plan = ResamplingPlan(image.shape, xyz_resolution=1, desired_xyz_resolution=2)
+
+    assert get_default_dtype() == np.float64
+    try:
+        set_default_dtype(np.float32)
+
+        # Test that 16-bit data becomes float32, allocating less than a single float64 array of its size beyond the result.
+
+        for function, kwargs in [
+            (cast_to_typed_array, dict()), 
+            (normalize_by_MAD, dict()), 
+            (center_to_mean, dict()), 
+            (PreprocessingPipeline(['cast_to_typed_array', 'normalize_by_MAD', 'center_to_mean']).apply, dict()), 
+            (downsample_image, dict(scale_factors=2)), 
+            (plan.apply, dict()), 
+        ]:
+            output, peak_bytes = _measure_peak_bytes(function, image, **kwargs)
+            assert output.dtype == np.float32
+            assert peak_bytes < full_float64_nbytes
+
+        # Test that float32 data is not upcast, even for resampling by FFT.
+
+        _, float64_peak_bytes = _measure_peak_bytes(fourier_resample, image.astype(np.float64), [64, 64, 32])
+        output, peak_bytes = _measure_peak_bytes(fourier_resample, image.astype(np.float32), [64, 64, 32])
+        assert output.dtype == np.float32
+        assert peak_bytes < float64_peak_bytes * 0.6
+        assert fourier_resample(image, [64, 64, 32]).dtype == np.float32
+
+        # Test that per-call dtypes take precedence.
+
+        assert normalize_by_MAD(image, dtype=np.float64).dtype == np.float64
+        assert downsample_image(image, 2, dtype=np.float64).dtype == np.float64
+
+    finally:
+        set_default_dtype(np.float64)
+
+    assert normalize_by_MAD(image).dtype == np.float64
+
+    # Test improper use.
+
+    kwargs = dict(dtype=int)
+    expected_exception = ValueError
+    match = "dtype must be a floating point dtype."
+    with pytest.raises(expected_exception, match=match):
+        set_default_dtype(**kwargs)
+
 """
 Perform tests.
 """
@@ -176,3 +367,11 @@ Perform tests.
 if __name__ == "__main__":
     test__validate_scalar_to_multi()
     test__validate_ndarray()
+    test__LRUCache()
+    test__compute_content_hash()
+    test_set_default_dtype()
+    from pathlib import Path
+    from tempfile import TemporaryDirectory
+    with TemporaryDirectory() as tmp_dir:
+        test__compute_file_hash(Path(tmp_dir))
+        test__DiskCache(Path(tmp_dir))